@@ -1,16 +1,19 @@
 """
 Feedback and user interaction endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy import text
 from typing import List
 
 from app.core.database import get_db, Base, engine
+from app.core.responses import ORJSONResponse
 from app.core.security import get_current_user_id
 from app.models.interaction import UserInteraction
-from app.models.vehicle import Vehicle
 from app.schemas.interaction import InteractionCreate, InteractionResponse
 from app.schemas.vehicle import VehicleResponse
+from app.services.interaction_events import schedule_interaction_updates
+from app.services.vehicle_search import VEHICLE_ROWS_SQL, VEHICLE_SELECT, rows_to_dicts
 
 router = APIRouter()
 
@@ -21,6 +24,7 @@ Base.metadata.create_all(bind=engine)
 @router.post("/feedback", response_model=InteractionResponse, status_code=status.HTTP_201_CREATED)
 async def submit_feedback(
     interaction: InteractionCreate,
+    background_tasks: BackgroundTasks,
     user_id: str = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 ):
@@ -38,28 +42,32 @@ async def submit_feedback(
     db.commit()
     db.refresh(db_interaction)
     
+    # Fold into the co-occurrence table and popularity counters after the response is sent
+    schedule_interaction_updates(
+        background_tasks, user_id, db_interaction.vehicle_id,
+        db_interaction.interaction_type, db_interaction.interaction_score
+    )
+    
     return InteractionResponse.from_orm(db_interaction)
 
 
-@router.get("/favorites", response_model=List[VehicleResponse])
+@router.get("/favorites", response_model=List[VehicleResponse], response_class=ORJSONResponse)
 async def get_favorites(
     user_id: str = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 ):
     """Get user favorites"""
-    # Get all favorite interactions
-    favorite_interactions = db.query(UserInteraction).filter(
-        UserInteraction.user_id == user_id,
-        UserInteraction.interaction_type == "favorite"
-    ).all()
-    
-    # Get unique vehicle IDs
-    vehicle_ids = list(set([int(i.vehicle_id) for i in favorite_interactions]))
-    
-    # Fetch vehicles
-    vehicles = db.query(Vehicle).filter(Vehicle.id.in_(vehicle_ids)).all()
+    # Fetch vehicles of all favorite interactions, used or new
+    rows = db.execute(text(f"""
+        SELECT {VEHICLE_SELECT}
+        FROM {VEHICLE_ROWS_SQL} v
+        WHERE v.vehicle_id IN (
+            SELECT vehicle_id FROM gold.user_interactions
+            WHERE user_id = :user_id AND interaction_type = 'favorite'
+        )
+    """), {'user_id': user_id})
     
-    return [VehicleResponse.from_orm(v) for v in vehicles]
+    return ORJSONResponse(rows_to_dicts(rows))
 
 
 @router.post("/favorites/{vehicle_id}", status_code=status.HTTP_201_CREATED)
@@ -1,7 +1,7 @@
 """
 User interaction tracking endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from typing import List
 from uuid import UUID
@@ -9,9 +9,15 @@ from uuid import UUID
 from app.core.database import get_db
 from app.core.security import get_current_user_id
 from app.models.interaction import UserInteraction, UserFavorite, UserSearch
+from app.services import sessions
+from app.services.interaction_events import schedule_interaction_updates
+from app.services.listings import fetch_listings
+from app.services.interaction_weights import INTERACTION_TYPE_WEIGHTS
 from app.schemas.interaction import (
     InteractionCreate,
     InteractionResponse,
+    SessionEventCreate,
+    SessionEventResponse,
     FavoriteCreate,
     FavoriteResponse,
     SearchHistoryCreate,
@@ -24,6 +30,7 @@ router = APIRouter()
 @router.post("/track", response_model=InteractionResponse, status_code=status.HTTP_201_CREATED)
 async def track_interaction(
     interaction: InteractionCreate,
+    background_tasks: BackgroundTasks,
     user_id: str = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 ):
@@ -41,9 +48,53 @@ async def track_interaction(
     db.commit()
     db.refresh(db_interaction)
     
+    # Into the session window right away, so the next /reco/session call sees it
+    sessions.record_event(
+        interaction.session_id, db_interaction.vehicle_id,
+        db_interaction.interaction_type, db_interaction.interaction_score
+    )
+    
+    # Fold into the co-occurrence table and popularity counters after the response is sent
+    schedule_interaction_updates(
+        background_tasks, user_id, db_interaction.vehicle_id,
+        db_interaction.interaction_type, db_interaction.interaction_score
+    )
+    
     return InteractionResponse.from_orm(db_interaction)
 
 
+@router.post("/session", response_model=SessionEventResponse, status_code=status.HTTP_202_ACCEPTED)
+def track_session_event(
+    event: SessionEventCreate,
+    db: Session = Depends(get_db)
+):
+    """
+    Track an anonymous interaction: kept in the session's in-memory window
+    only, nothing is written to the database or the popularity counters
+    """
+    if event.interaction_type not in INTERACTION_TYPE_WEIGHTS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"interaction_type must be one of: {', '.join(INTERACTION_TYPE_WEIGHTS)}"
+        )
+    
+    if not fetch_listings(db, [event.vehicle_id]):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle not found"
+        )
+    
+    sessions.record_event(
+        event.session_id, event.vehicle_id,
+        event.interaction_type, event.interaction_score
+    )
+    
+    return {
+        'session_id': event.session_id,
+        'events': len(sessions.session_window.events(event.session_id))
+    }
+
+
 @router.get("/history", response_model=List[InteractionResponse])
 async def get_interaction_history(
     user_id: str = Depends(get_current_user_id),
@@ -66,6 +117,7 @@ async def get_interaction_history(
 @router.post("/favorites", response_model=FavoriteResponse, status_code=status.HTTP_201_CREATED)
 async def add_favorite(
     favorite: FavoriteCreate,
+    background_tasks: BackgroundTasks,
     user_id: str = Depends(get_current_user_id),
     db: Session = Depends(get_db)
 ):
@@ -101,6 +153,11 @@ async def add_favorite(
     db.commit()
     db.refresh(db_favorite)
     
+    schedule_interaction_updates(
+        background_tasks, user_id, db_interaction.vehicle_id,
+        db_interaction.interaction_type, db_interaction.interaction_score
+    )
+    
     return FavoriteResponse.from_orm(db_favorite)
 
 
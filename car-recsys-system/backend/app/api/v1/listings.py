@@ -1,71 +1,131 @@
 """
 Listing endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import text
+from typing import List, Optional
 
+from app.core.config import settings
 from app.core.database import get_db
-from app.models.vehicle import Vehicle
-from app.schemas.vehicle import VehicleResponse
+from app.core.responses import ORJSONResponse
+from app.schemas.vehicle import ListingBatchRequest, ListingBatchResponse, VehicleFullResponse, VehicleResponse
+from app.services import listings
+from app.services.vehicle_search import VEHICLE_SELECT, rows_to_dicts
 
 router = APIRouter()
 
 
-@router.get("/listing/{vehicle_id}", response_model=VehicleResponse)
-async def get_listing(vehicle_id: int, db: Session = Depends(get_db)):
-    """Get vehicle listing details"""
-    vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
-    
-    if not vehicle:
+# Caches may keep the payload but must revalidate it, which the ETag makes a 304
+LISTING_CACHE_CONTROL = "public, no-cache"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check; weak validators compare equal to the strong tag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or any(tag.removeprefix('W/') == etag for tag in candidates)
+
+
+@router.get("/listing/{vehicle_id}", response_model=VehicleResponse, response_class=ORJSONResponse)
+def get_listing(
+    vehicle_id: str,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Get vehicle listing details. Carries a strong ETag; If-None-Match gets a 304."""
+    detail = listings.get_listing_detail(db, vehicle_id)
+
+    if detail is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle not found"
+        )
+
+    etag, body = detail
+    headers = {'ETag': etag, 'Cache-Control': LISTING_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/listing/{vehicle_id}/full", response_model=VehicleFullResponse, response_class=ORJSONResponse)
+def get_listing_full(vehicle_id: str, db: Session = Depends(get_db)):
+    """
+    Everything a vehicle page shows (listing, specs, images, features,
+    reviews, seller) in one call, with the nested lists capped
+    """
+    full = listings.get_listing_full(db, vehicle_id)
+
+    if full is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Vehicle not found"
         )
-    
-    return VehicleResponse.from_orm(vehicle)
+
+    return ORJSONResponse(full)
 
 
-@router.get("/listings", response_model=List[VehicleResponse])
+def _batch_ids(ids: List[str]) -> List[str]:
+    """Flatten repeated and comma-separated ids, enforcing the batch limit"""
+    flat = [vehicle_id.strip() for value in ids for vehicle_id in value.split(',') if vehicle_id.strip()]
+    if len(flat) > settings.LISTING_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.LISTING_BATCH_MAX_SIZE} ids per batch"
+        )
+    return flat
+
+
+@router.get("/listings/batch", response_model=ListingBatchResponse, response_class=ORJSONResponse)
+def get_listings_batch(
+    ids: List[str] = Query(..., description="Vehicle ids, comma-separated or repeated"),
+    db: Session = Depends(get_db)
+):
+    """Get several listings in one call (compare page, favorites), in requested order"""
+    return ORJSONResponse(listings.get_listings_batch(db, _batch_ids(ids)))
+
+
+@router.post("/listings/batch", response_model=ListingBatchResponse, response_class=ORJSONResponse)
+def post_listings_batch(
+    batch: ListingBatchRequest,
+    db: Session = Depends(get_db)
+):
+    """Same as GET /listings/batch, for id lists too long for a URL"""
+    return ORJSONResponse(listings.get_listings_batch(db, _batch_ids(batch.ids)))
+
+
+@router.get("/listings", response_model=List[VehicleResponse], response_class=ORJSONResponse)
 async def get_listings(
     limit: int = 10,
     offset: int = 0,
     db: Session = Depends(get_db)
 ):
     """Get featured/latest vehicle listings"""
-    vehicles = db.query(Vehicle).order_by(Vehicle.id.desc()).offset(offset).limit(limit).all()
-    return [VehicleResponse.from_orm(v) for v in vehicles]
+    rows = db.execute(text(f"""
+        SELECT {VEHICLE_SELECT}
+        FROM raw.used_vehicles v
+        ORDER BY v.created_at DESC NULLS LAST, v.vehicle_id DESC
+        LIMIT :limit OFFSET :offset
+    """), {'limit': limit, 'offset': offset})
 
+    return ORJSONResponse(rows_to_dicts(rows))
 
-@router.get("/listings/similar/{vehicle_id}", response_model=List[VehicleResponse])
-async def get_similar_vehicles(
-    vehicle_id: int,
-    limit: int = 6,
+
+@router.get("/listings/similar/{vehicle_id}", response_model=List[VehicleResponse], response_class=ORJSONResponse)
+def get_similar_vehicles(
+    vehicle_id: str,
+    limit: int = Query(6, ge=1, le=50),
     db: Session = Depends(get_db)
 ):
-    """Get similar vehicles based on brand, model, price range"""
-    # Get the reference vehicle
-    vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
-    
-    if not vehicle:
+    """Get the most similar vehicles (price, mileage, year, ratings, brand, drivetrain, ...)"""
+    similar = listings.similar_listings(db, vehicle_id, limit)
+
+    if similar is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Vehicle not found"
         )
-    
-    # Find similar vehicles
-    query = db.query(Vehicle).filter(Vehicle.id != vehicle_id)
-    
-    # Same brand
-    if vehicle.brand:
-        query = query.filter(Vehicle.brand == vehicle.brand)
-    
-    # Similar price range (±30%)
-    if vehicle.price:
-        price_min = vehicle.price * 0.7
-        price_max = vehicle.price * 1.3
-        query = query.filter(Vehicle.price.between(price_min, price_max))
-    
-    similar_vehicles = query.limit(limit).all()
-    
-    return [VehicleResponse.from_orm(v) for v in similar_vehicles]
+
+    return ORJSONResponse([listing for listing, _ in similar])
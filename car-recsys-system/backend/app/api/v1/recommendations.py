@@ -1,21 +1,126 @@
 """
 Recommendation endpoints
 """
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.responses import ORJSONResponse
+from app.core.security import get_current_user_optional
+from app.schemas.recommendation import (
+    CandidateResponse, HybridResponse, PopularVehiclesResponse, SessionRecommendationResponse, SimilarVehiclesResponse
+)
+from app.services import cooccurrence, hybrid, listings, popularity, sessions
 
 router = APIRouter()
 
-@router.get("/candidate")
-async def get_candidates():
-    """Get recommendation candidates"""
-    return {"message": "Candidate recommendation endpoint - to be implemented"}
+@router.get("/candidate", response_model=CandidateResponse, response_class=ORJSONResponse)
+def get_candidates(
+    vehicle_id: Optional[List[str]] = Query(None, description="Seed vehicles; defaults to the user's history"),
+    limit: int = Query(settings.CANDIDATE_SIZE, ge=1, le=settings.CANDIDATE_SIZE),
+    user_id: Optional[str] = Depends(get_current_user_optional),
+    db: Session = Depends(get_db)
+):
+    """
+    Get recommendation candidates from item-item co-occurrence. Anonymous
+    callers without seeds, and users without history, get popular vehicles.
+    """
+    if not vehicle_id and not user_id:
+        popular = popularity.popular_vehicles(limit)
+        if popular is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Provide vehicle_id seeds or authenticate"
+            )
+        return ORJSONResponse({
+            'seeds': [],
+            'results': [{'vehicle_id': vid, 'score': score} for vid, score in popular]
+        })
+
+    found = cooccurrence.find_candidates(db, limit, vehicle_ids=vehicle_id, user_id=user_id)
+    if found is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Co-occurrence table not built"
+        )
+
+    seeds, candidates = found
+    if not seeds:
+        # Cold start: nothing to co-occur with yet
+        candidates = popularity.popular_vehicles(limit) or []
+    return ORJSONResponse({
+        'seeds': seeds,
+        'results': [{'vehicle_id': vid, 'score': score} for vid, score in candidates]
+    })
+
+@router.get("/popular", response_model=PopularVehiclesResponse, response_class=ORJSONResponse)
+def get_popular_vehicles(
+    brand: Optional[str] = Query(None),
+    segment: Optional[str] = Query(None, description="Drivetrain, e.g. awd"),
+    limit: int = Query(settings.TOP_K, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Get the most popular vehicles by time-decayed views, favorites and contacts"""
+    popular = listings.popular_listings(db, limit, brand, segment)
+    if popular is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Popularity not loaded"
+        )
+
+    return ORJSONResponse({
+        'brand': brand,
+        'segment': segment,
+        'results': [{'vehicle': listing, 'score': score} for listing, score in popular]
+    })
+
+@router.get("/hybrid", response_model=HybridResponse, response_class=ORJSONResponse)
+async def get_hybrid_recommendations(
+    vehicle_id: Optional[List[str]] = Query(None, description="Seed vehicles; defaults to the user's history"),
+    q: Optional[str] = Query(None, description="Text query; reranks the fused candidates with the cross-encoder"),
+    fusion: str = Query('rrf', pattern="^(rrf|weighted)$", description="Reciprocal rank or weighted score fusion"),
+    limit: int = Query(settings.TOP_K, ge=1, le=settings.CANDIDATE_SIZE),
+    user_id: Optional[str] = Depends(get_current_user_optional),
+    db: Session = Depends(get_db)
+):
+    """
+    Get hybrid recommendations: co-occurrence, embedding and popularity
+    candidates retrieved concurrently, fused, optionally reranked, with
+    per-stage timings
+    """
+    return ORJSONResponse(await hybrid.recommend(db, limit, user_id=user_id, vehicle_ids=vehicle_id, query=q, fusion=fusion))
+
+@router.get("/session/{session_id}", response_model=SessionRecommendationResponse, response_class=ORJSONResponse)
+async def get_session_recommendations(
+    session_id: str,
+    limit: int = Query(settings.TOP_K, ge=1, le=settings.CANDIDATE_SIZE)
+):
+    """
+    Get candidates for a browsing session from its recent vehicles and the
+    precomputed item neighbors, without a database read. Works for anonymous
+    sessions (see POST /interactions/session); empty sessions get popular
+    vehicles.
+    """
+    return ORJSONResponse(sessions.recommend(session_id, limit))
+
+@router.get("/similar/{vehicle_id}", response_model=SimilarVehiclesResponse, response_class=ORJSONResponse)
+def get_similar_vehicles(
+    vehicle_id: str,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """Get similar vehicles with their cosine similarity, from the precomputed kNN table"""
+    similar = listings.similar_listings(db, vehicle_id, limit)
 
-@router.get("/hybrid")
-async def get_hybrid_recommendations():
-    """Get hybrid recommendations"""
-    return {"message": "Hybrid recommendation endpoint - to be implemented"}
+    if similar is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle not found"
+        )
 
-@router.get("/similar/{vehicle_id}")
-async def get_similar_vehicles(vehicle_id: str):
-    """Get similar vehicles"""
-    return {"message": f"Similar vehicles for {vehicle_id} - to be implemented"}
+    return ORJSONResponse({
+        'vehicle_id': vehicle_id,
+        'results': [{'vehicle': listing, 'score': score} for listing, score in similar]
+    })
@@ -1,22 +1,30 @@
 """
 Search endpoints
 """
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 from typing import Optional
-import math
 
+from app.core.config import settings
 from app.core.database import get_db
-from app.schemas.vehicle import VehicleResponse, VehicleSearchResponse
+from app.core.responses import ORJSONResponse
+from app.schemas.vehicle import (
+    BatchSearchRequest,
+    BatchSearchResponse,
+    SearchFacetsResponse,
+    SuggestResponse,
+    VehicleSearchRequest,
+    VehicleSearchResponse
+)
+from app.services import facets, suggest, vehicle_search
 
 router = APIRouter()
 
 
-@router.get("/search", response_model=VehicleSearchResponse)
-async def search_vehicles(
+@router.get("/search", response_model=VehicleSearchResponse, response_class=ORJSONResponse)
+def search_vehicles(
     query: Optional[str] = Query(None, description="Search query for title, brand, model"),
-    condition: Optional[str] = Query(None, description="Vehicle condition: used or new"),
+    condition: Optional[str] = Query(None, description="Vehicle condition: used, new or any"),
     brand: Optional[str] = Query(None),
     model: Optional[str] = Query(None),
     year_min: Optional[int] = Query(None),
@@ -28,152 +36,131 @@ async def search_vehicles(
     transmission: Optional[str] = Query(None),
     body_type: Optional[str] = Query(None),
     location: Optional[str] = Query(None),
-    sort_by: str = Query("id", description="Sort field: price, year, mileage, id"),
+    sort_by: str = Query("id", description="Sort field: price, year, mileage, id, relevance (ranks the text query)"),
     sort_order: str = Query("desc", description="Sort order: asc, desc"),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque keyset cursor from a previous response's next_cursor"),
+    count: Optional[str] = Query(None, pattern="^(exact|estimated|capped)$", description="Total count strategy: exact, estimated, capped"),
+    engine: Optional[str] = Query(None, pattern="^(sql|memory)$", description="Search engine: sql or memory (in-process catalog)"),
     db: Session = Depends(get_db)
 ):
     """
-    Search vehicles with filters using raw SQL for reliability
-    """
-    # Determine which table to query based on condition
-    table_name = "raw.new_vehicles" if condition and condition.lower() == "new" else "raw.used_vehicles"
-    
-    # Build WHERE conditions
-    conditions = []
-    params = {}
-    
-    if query:
-        conditions.append("(title ILIKE :query OR brand ILIKE :query OR model ILIKE :query)")
-        params['query'] = f"%{query}%"
-    
-    if brand:
-        conditions.append("brand ILIKE :brand")
-        params['brand'] = f"%{brand}%"
-    
-    if model:
-        conditions.append("model ILIKE :model")
-        params['model'] = f"%{model}%"
-    
-    if year_min:
-        conditions.append("year >= :year_min")
-        params['year_min'] = year_min
-    
-    if year_max:
-        conditions.append("year <= :year_max")
-        params['year_max'] = year_max
-    
-    if price_min:
-        conditions.append("price >= :price_min")
-        params['price_min'] = price_min
-    
-    if price_max:
-        conditions.append("price <= :price_max")
-        params['price_max'] = price_max
-    
-    if mileage_max:
-        conditions.append("mileage <= :mileage_max")
-        params['mileage_max'] = mileage_max
-    
-    if fuel_type:
-        conditions.append("fuel_type ILIKE :fuel_type")
-        params['fuel_type'] = f"%{fuel_type}%"
-    
-    if transmission:
-        conditions.append("transmission ILIKE :transmission")
-        params['transmission'] = f"%{transmission}%"
-    
-    if body_type:
-        conditions.append("body_type ILIKE :body_type")
-        params['body_type'] = f"%{body_type}%"
-    
-    if location:
-        conditions.append("location ILIKE :location")
-        params['location'] = f"%{location}%"
-    
-    where_clause = " AND ".join(conditions) if conditions else "1=1"
-    
-    # Get total count
-    count_sql = f"SELECT COUNT(*) FROM {table_name} WHERE {where_clause}"
-    total = db.execute(text(count_sql), params).scalar()
-    
-    # Build ORDER BY
-    # Map id to vehicle_id since that's the actual column name
-    sort_column_map = {
-        'id': 'vehicle_id',
-        'price': 'price',
-        'mileage': 'mileage'
-    }
-    sort_column = sort_column_map.get(sort_by, 'vehicle_id')
-    order = 'ASC' if sort_order.lower() == 'asc' else 'DESC'
-    
-    # Get paginated results
-    offset = (page - 1) * page_size
-    params['limit'] = page_size
-    params['offset'] = offset
-    
-    query_sql = f"""
-        SELECT 
-            vehicle_id, 
-            vehicle_url, 
-            title, 
-            price::text, 
-            brand, 
-            car_model, 
-            '' as year, 
-            mileage::text, 
-            fuel_type, 
-            transmission, 
-            '' as body_type, 
-            exterior_color, 
-            '' as seats, 
-            '' as origin, 
-            '' as location, 
-            '' as description, 
-            '' as image_url, 
-            '' as seller_name, 
-            '' as seller_phone, 
-            created_at::text as posted_date
-        FROM {table_name} 
-        WHERE {where_clause}
-        ORDER BY {sort_column} {order} NULLS LAST
-        LIMIT :limit OFFSET :offset
+    Search vehicles with filters using raw SQL for reliability.
+
+    Pass `next_cursor` from a previous response as `cursor` for keyset
+    pagination; deep pages then cost the same as the first one.
     """
-    
-    result = db.execute(text(query_sql), params)
-    vehicles = []
-    
-    for row in result:
-        vehicles.append(VehicleResponse(
-            id=row[0],
-            url=row[1],
-            title=row[2],
-            price=row[3],
-            brand=row[4],
-            model=row[5],
-            year=row[6],
-            mileage=row[7],
-            fuel_type=row[8],
-            transmission=row[9],
-            body_type=row[10],
-            color=row[11],
-            seats=row[12],
-            origin=row[13],
-            location=row[14],
-            description=row[15],
-            image_url=row[16],
-            seller_name=row[17],
-            seller_phone=row[18],
-            posted_date=row[19]
-        ))
-    
-    total_pages = math.ceil(total / page_size) if total > 0 else 0
-    
-    return VehicleSearchResponse(
-        results=vehicles,
-        total=total,
+    search = VehicleSearchRequest(
+        query=query,
+        condition=condition,
+        brand=brand,
+        model=model,
+        year_min=year_min,
+        year_max=year_max,
+        price_min=price_min,
+        price_max=price_max,
+        mileage_max=mileage_max,
+        fuel_type=fuel_type,
+        transmission=transmission,
+        body_type=body_type,
+        location=location,
+        sort_by=sort_by,
+        sort_order=sort_order,
         page=page,
         page_size=page_size,
-        total_pages=total_pages
+        cursor=cursor,
+        count_strategy=count,
+        engine=engine
+    )
+
+    try:
+        return ORJSONResponse(vehicle_search.search_vehicles(db, search))
+    except vehicle_search.InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/search/batch", response_model=BatchSearchResponse, response_class=ORJSONResponse)
+def search_vehicles_batch(
+    batch: BatchSearchRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Run several searches in one request (comparison widgets, recommendation
+    rows). Results come back in request order, each with its own timing.
+    """
+    if len(batch.searches) > settings.SEARCH_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.SEARCH_BATCH_MAX_SIZE} searches per batch"
+        )
+
+    for search in batch.searches:
+        if search.page < 1 or not 1 <= search.page_size <= 100:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="page must be >= 1 and page_size between 1 and 100"
+            )
+
+    return ORJSONResponse(vehicle_search.search_vehicles_batch(db, batch.searches))
+
+
+@router.get("/search/facets", response_model=SearchFacetsResponse)
+def search_facets(
+    query: Optional[str] = Query(None, description="Search query for title, brand, model"),
+    condition: Optional[str] = Query(None, description="Vehicle condition: used, new or any"),
+    brand: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+    year_min: Optional[int] = Query(None),
+    year_max: Optional[int] = Query(None),
+    price_min: Optional[float] = Query(None),
+    price_max: Optional[float] = Query(None),
+    mileage_max: Optional[float] = Query(None),
+    fuel_type: Optional[str] = Query(None),
+    transmission: Optional[str] = Query(None),
+    body_type: Optional[str] = Query(None),
+    location: Optional[str] = Query(None),
+    engine: Optional[str] = Query(None, pattern="^(sql|memory)$", description="Search engine: sql or memory (in-process catalog)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Facet counts (brand, fuel_type, transmission, drivetrain, price bucket)
+    for the same filters as /search, computed in a single pass
+    """
+    search = VehicleSearchRequest(
+        query=query,
+        condition=condition,
+        brand=brand,
+        model=model,
+        year_min=year_min,
+        year_max=year_max,
+        price_min=price_min,
+        price_max=price_max,
+        mileage_max=mileage_max,
+        fuel_type=fuel_type,
+        transmission=transmission,
+        body_type=body_type,
+        location=location,
+        engine=engine
     )
+
+    return facets.compute_facets(db, search)
+
+
+@router.get("/search/suggest", response_model=SuggestResponse, response_class=ORJSONResponse)
+def search_suggest(
+    prefix: str = Query(..., max_length=100, description="What the user has typed so far"),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """
+    Typeahead suggestions (brands, models, title terms) ranked by listing
+    count and popularity, served from an in-process prefix index
+    """
+    index = suggest.get_suggest_index()
+    return ORJSONResponse({
+        'prefix': prefix,
+        'suggestions': index.suggest(prefix, limit)
+    })
@@ -27,6 +27,37 @@ class Settings(BaseSettings):
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
     CACHE_TTL: int = 3600  # 1 hour
     
+    # Listing detail cache: in-process LRU entries, plus Redis as a shared second tier when enabled
+    LISTING_CACHE_SIZE: int = int(os.getenv("LISTING_CACHE_SIZE", "10000"))
+    LISTING_CACHE_REDIS: bool = os.getenv("LISTING_CACHE_REDIS", "False").lower() == "true"
+    
+    # LISTEN for the ETL's `NOTIFY data_reload` and drop caches / rebuild indexes on it
+    DATA_RELOAD_LISTENER: bool = os.getenv("DATA_RELOAD_LISTENER", "True").lower() == "true"
+    
+    # Search result counts: exact, estimated (planner row estimate) or capped
+    SEARCH_COUNT_STRATEGY: str = os.getenv("SEARCH_COUNT_STRATEGY", "exact")
+    SEARCH_COUNT_CAP: int = int(os.getenv("SEARCH_COUNT_CAP", "10000"))
+    SEARCH_COUNT_CACHE_TTL: int = int(os.getenv("SEARCH_COUNT_CACHE_TTL", "60"))
+    SEARCH_COUNT_CACHE_SIZE: int = 2048
+    # Uncached counts run concurrently with the page query on this many extra connections
+    SEARCH_COUNT_CONCURRENCY: int = int(os.getenv("SEARCH_COUNT_CONCURRENCY", "4"))
+    
+    # Batch search: max searches per request and how many run concurrently
+    SEARCH_BATCH_MAX_SIZE: int = int(os.getenv("SEARCH_BATCH_MAX_SIZE", "20"))
+    SEARCH_BATCH_CONCURRENCY: int = int(os.getenv("SEARCH_BATCH_CONCURRENCY", "4"))
+    
+    # Nested list caps for /listing/{id}/full
+    LISTING_MAX_IMAGES: int = int(os.getenv("LISTING_MAX_IMAGES", "50"))
+    LISTING_MAX_FEATURES: int = int(os.getenv("LISTING_MAX_FEATURES", "200"))
+    LISTING_MAX_REVIEWS: int = int(os.getenv("LISTING_MAX_REVIEWS", "20"))
+    
+    # Max vehicle ids per /listings/batch request
+    LISTING_BATCH_MAX_SIZE: int = int(os.getenv("LISTING_BATCH_MAX_SIZE", "200"))
+    
+    # Search engine: sql, or memory (in-process columnar catalog loaded at startup)
+    SEARCH_ENGINE: str = os.getenv("SEARCH_ENGINE", "sql")
+    CATALOG_IN_MEMORY: bool = os.getenv("CATALOG_IN_MEMORY", "False").lower() == "true"
+    
     # Security
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
@@ -52,9 +83,47 @@ class Settings(BaseSettings):
         "cross-encoder/ms-marco-MiniLM-L-6-v2"
     )
     
+    # Cross-encoder reranking: pairs from concurrent requests share micro-batches
+    RERANKER_ENABLED: bool = os.getenv("RERANKER_ENABLED", "true").lower() == "true"
+    RERANK_MAX_BATCH: int = int(os.getenv("RERANK_MAX_BATCH", "32"))
+    RERANK_MAX_WAIT_MS: float = float(os.getenv("RERANK_MAX_WAIT_MS", "5"))
+    RERANK_BUDGET_MS: float = float(os.getenv("RERANK_BUDGET_MS", "150"))
+    RERANK_CACHE_SIZE: int = int(os.getenv("RERANK_CACHE_SIZE", "50000"))
+    
     # Recommendation parameters
     CANDIDATE_SIZE: int = 100
     TOP_K: int = 20
+    # /reco/hybrid: sources still retrieving after this are left out of the response
+    HYBRID_RETRIEVAL_BUDGET_MS: float = float(os.getenv("HYBRID_RETRIEVAL_BUDGET_MS", "100"))
+    
+    # Per-user ranking cache: fresh for RECO_CACHE_TTL s, served stale (and refreshed) up to RECO_CACHE_MAX_STALE s
+    RECO_CACHE_ENABLED: bool = os.getenv("RECO_CACHE_ENABLED", "True").lower() == "true"
+    RECO_CACHE_SIZE: int = int(os.getenv("RECO_CACHE_SIZE", "100000"))
+    RECO_CACHE_TTL: int = int(os.getenv("RECO_CACHE_TTL", "900"))
+    RECO_CACHE_MAX_STALE: int = int(os.getenv("RECO_CACHE_MAX_STALE", "86400"))
+    RECO_CACHE_REDIS: bool = os.getenv("RECO_CACHE_REDIS", "False").lower() == "true"
+    # Background materialization for users active in the last RECO_CACHE_ACTIVE_DAYS days
+    RECO_CACHE_REFRESH_SECONDS: float = float(os.getenv("RECO_CACHE_REFRESH_SECONDS", "300"))
+    RECO_CACHE_ACTIVE_DAYS: int = int(os.getenv("RECO_CACHE_ACTIVE_DAYS", "7"))
+    RECO_CACHE_MAX_USERS: int = int(os.getenv("RECO_CACHE_MAX_USERS", "10000"))
+    
+    # /reco/session: last SESSION_WINDOW_SIZE events per session, LRU-evicted past SESSION_MAX_SESSIONS or when idle
+    SESSION_WINDOW_SIZE: int = int(os.getenv("SESSION_WINDOW_SIZE", "20"))
+    SESSION_MAX_SESSIONS: int = int(os.getenv("SESSION_MAX_SESSIONS", "100000"))
+    SESSION_IDLE_SECONDS: float = float(os.getenv("SESSION_IDLE_SECONDS", "1800"))
+    
+    # Offline recommendation artifacts (neighbor tables, embeddings, factors)
+    MODEL_DIR: str = os.getenv("MODEL_DIR", "data/models")
+    SIMILAR_NEIGHBORS_K: int = int(os.getenv("SIMILAR_NEIGHBORS_K", "50"))
+    # float16 halves the embedding matrix; scores are computed in float32 either way
+    EMBEDDING_DTYPE: str = os.getenv("EMBEDDING_DTYPE", "float32")
+    # Vector search backend: exact, ivfpq or qdrant (see app/services/vector_index.py)
+    VECTOR_INDEX: str = os.getenv("VECTOR_INDEX", "exact")
+    VECTOR_INDEX_NPROBE: int = int(os.getenv("VECTOR_INDEX_NPROBE", "16"))
+    
+    # Popularity: interaction counters decaying with this half-life, flushed to gold.vehicle_popularity
+    POPULARITY_HALF_LIFE_HOURS: float = float(os.getenv("POPULARITY_HALF_LIFE_HOURS", "72"))
+    POPULARITY_FLUSH_SECONDS: float = float(os.getenv("POPULARITY_FLUSH_SECONDS", "30"))
     
     # Rate limiting
     RATE_LIMIT_PER_MINUTE: int = 60
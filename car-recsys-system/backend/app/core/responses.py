@@ -0,0 +1,21 @@
+"""
+Fast JSON response class for list endpoints
+"""
+from typing import Any
+from fastapi.responses import JSONResponse
+import orjson
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response encoded with orjson.
+
+    Endpoints returning this directly skip FastAPI's response_model
+    validation/serialization pass, so payloads must already match the
+    declared schema (plain dicts built from SQL rows or catalog columns).
+    NumPy scalars and arrays are serialized natively.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
@@ -16,6 +16,9 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
+# Same scheme without the 401 on a missing token, for endpoints open to anonymous users
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login", auto_error=False)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
@@ -70,7 +73,7 @@ async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> str:
     return user_id
 
 
-async def get_current_user_optional(token: Optional[str] = Depends(oauth2_scheme)) -> Optional[str]:
+async def get_current_user_optional(token: Optional[str] = Depends(oauth2_scheme_optional)) -> Optional[str]:
     """Get current user ID if authenticated, otherwise None (for anonymous users)"""
     if not token:
         return None
@@ -3,13 +3,20 @@ Car Recommendation System - FastAPI Application
 Main entry point
 """
 from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import time
 import logging
 
 from app.core.config import settings
+from app.core.responses import ORJSONResponse
 from app.api.v1 import auth, search, listings, recommendations, feedback, interactions
+from app.services import (
+    als, catalog, cooccurrence, data_reload, embedding_store, popularity, reco_cache, similarity, suggest, vector_index
+)
+from app.services.reranker import reranker
 
 # Configure logging
 logging.basicConfig(
@@ -55,6 +62,14 @@ async def add_process_time_header(request: Request, call_next):
     return response
 
 # Exception handlers
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    # Errors echo the rejected input; orjson writes NaN/inf as null where json.dumps raises
+    return ORJSONResponse(
+        status_code=422,
+        content={"detail": jsonable_encoder(exc.errors())}
+    )
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Global error handler: {exc}", exc_info=True)
@@ -105,8 +120,72 @@ async def startup_event():
     # Initialize connections (database, redis, etc.)
     # This will be implemented in the services
     
+    # Load the in-memory search catalog
+    if settings.CATALOG_IN_MEMORY or settings.SEARCH_ENGINE == "memory":
+        try:
+            catalog.load_catalog()
+        except Exception as e:
+            logger.error(f"Failed to load in-memory catalog, searches will use SQL: {e}")
+    
+    # Precomputed similar-vehicles table (build_similarity_index.py)
+    try:
+        similarity.load_similarity_index()
+    except Exception as e:
+        logger.error(f"Failed to load similar-vehicles table, using price-based fallback: {e}")
+    
+    # Precomputed co-occurrence table (build_cooccurrence_index.py)
+    try:
+        cooccurrence.load_cooccurrence_index()
+    except Exception as e:
+        logger.error(f"Failed to load co-occurrence table, /reco/candidate is unavailable: {e}")
+    
+    # Memory-mapped ALS factors (train_als.py)
+    try:
+        als.load_als_model()
+    except Exception as e:
+        logger.error(f"Failed to map ALS factors, hybrid recommendations skip them: {e}")
+    
+    # Decayed popularity counters, the cold-start fallback
+    try:
+        popularity.load_popularity()
+        popularity.start_flusher()
+    except Exception as e:
+        logger.error(f"Failed to load vehicle popularity, cold-start fallback is unavailable: {e}")
+    
+    # Memory-mapped vehicle embeddings, shared by all workers
+    try:
+        embedding_store.load_embedding_store()
+        vector_index.load_vector_index()
+    except Exception as e:
+        logger.error(f"Failed to open vehicle embeddings or vector index: {e}")
+    
+    # Typeahead index (already built when the catalog loaded)
+    if catalog.get_catalog() is None:
+        try:
+            suggest.build_suggest_index_from_db()
+        except Exception as e:
+            logger.error(f"Failed to build suggest index: {e}")
+    
+    # Cross-encoder worker; the model loads in the background
+    if reranker.available:
+        reranker.start()
+    else:
+        logger.info("Reranker disabled or sentence-transformers missing; keeping first-stage order")
+    
+    # Precompute cached recommendations of active users
+    if settings.RECO_CACHE_ENABLED:
+        reco_cache.start_materializer()
+    
+    # Drop caches and rebuild indexes whenever the ETL reloads the data
+    if settings.DATA_RELOAD_LISTENER:
+        data_reload.start_listener()
+    
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down application")
+    data_reload.stop_listener()
+    popularity.stop_flusher()
+    reco_cache.stop_materializer()
+    reranker.stop()
     # Close connections gracefully
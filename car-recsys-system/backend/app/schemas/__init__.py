@@ -2,11 +2,26 @@
 Pydantic schemas for request/response validation
 """
 from app.schemas.user import UserCreate, UserLogin, UserResponse, Token
-from app.schemas.vehicle import VehicleResponse, VehicleSearchRequest, VehicleSearchResponse
-from app.schemas.interaction import InteractionCreate, InteractionResponse
+from app.schemas.vehicle import (
+    VehicleResponse, VehicleSearchRequest, VehicleSearchResponse, FacetValue, SearchFacetsResponse,
+    BatchSearchRequest, BatchSearchItem, BatchSearchResponse, ListingBatchRequest, ListingBatchResponse,
+    Suggestion, SuggestResponse, VehicleFullResponse
+)
+from app.schemas.interaction import InteractionCreate, InteractionResponse, SessionEventCreate, SessionEventResponse
+from app.schemas.recommendation import (
+    RecommendedVehicle, SimilarVehiclesResponse, PopularVehiclesResponse, HybridRecommendation, HybridSource,
+    HybridResponse, Candidate, CandidateResponse, SessionCandidate, SessionRecommendationResponse
+)
 
 __all__ = [
     'UserCreate', 'UserLogin', 'UserResponse', 'Token',
     'VehicleResponse', 'VehicleSearchRequest', 'VehicleSearchResponse',
-    'InteractionCreate', 'InteractionResponse'
+    'BatchSearchRequest', 'BatchSearchItem', 'BatchSearchResponse',
+    'ListingBatchRequest', 'ListingBatchResponse',
+    'FacetValue', 'SearchFacetsResponse', 'Suggestion', 'SuggestResponse',
+    'VehicleFullResponse',
+    'InteractionCreate', 'InteractionResponse', 'SessionEventCreate', 'SessionEventResponse',
+    'RecommendedVehicle', 'SimilarVehiclesResponse', 'PopularVehiclesResponse',
+    'HybridRecommendation', 'HybridSource', 'HybridResponse', 'Candidate', 'CandidateResponse',
+    'SessionCandidate', 'SessionRecommendationResponse'
 ]
@@ -58,3 +58,14 @@ class SearchHistoryResponse(BaseModel):
     class Config:
         from_attributes = True
 
+
+class SessionEventCreate(BaseModel):
+    session_id: str = Field(..., min_length=1, max_length=128)
+    vehicle_id: str = Field(..., min_length=1, max_length=64)
+    interaction_type: str = Field(..., description="Type: view, click, favorite, compare, contact")
+    interaction_score: float = Field(1.0, ge=0, le=10, allow_inf_nan=False)
+
+
+class SessionEventResponse(BaseModel):
+    session_id: str
+    events: int  # events now in the session's window
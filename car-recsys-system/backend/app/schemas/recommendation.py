@@ -0,0 +1,65 @@
+"""
+Recommendation schemas
+"""
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+from app.schemas.vehicle import VehicleResponse
+
+
+class RecommendedVehicle(BaseModel):
+    vehicle: VehicleResponse
+    score: Optional[float] = None  # higher is better; scale depends on the source
+
+
+class SimilarVehiclesResponse(BaseModel):
+    vehicle_id: str
+    results: List[RecommendedVehicle]
+
+
+class PopularVehiclesResponse(BaseModel):
+    brand: Optional[str] = None
+    segment: Optional[str] = None  # drivetrain
+    results: List[RecommendedVehicle]
+
+
+class HybridRecommendation(BaseModel):
+    vehicle: VehicleResponse
+    score: float  # fused score (RRF or weighted)
+    rerank_score: Optional[float] = None  # cross-encoder score when a query was given
+    sources: List[str]  # retrievers that proposed the vehicle
+
+
+class HybridSource(BaseModel):
+    status: str  # ok, timeout, unavailable or error
+    count: int
+
+
+class HybridResponse(BaseModel):
+    seeds: List[str]
+    fusion: str
+    reranked: bool
+    cache: Optional[str] = None  # hit, stale or miss for a cached user feed
+    results: List[HybridRecommendation]
+    sources: Dict[str, HybridSource]  # empty when served from the cache
+    timings: Dict[str, float]  # milliseconds per stage and per source (retrieve.<source>)
+
+
+class Candidate(BaseModel):
+    vehicle_id: str
+    score: float
+
+
+class CandidateResponse(BaseModel):
+    seeds: List[str]  # vehicles the candidates were generated from
+    results: List[Candidate]
+
+
+class SessionCandidate(Candidate):
+    sources: List[str]  # cooccurrence, similarity and/or popularity
+
+
+class SessionRecommendationResponse(BaseModel):
+    session_id: str
+    seeds: List[str]  # the session's recent vehicles, most recent first
+    results: List[SessionCandidate]
@@ -2,7 +2,7 @@
 Vehicle schemas
 """
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Optional, List, Dict
 from datetime import datetime
 
 
@@ -34,6 +34,7 @@ class VehicleResponse(BaseModel):
 
 class VehicleSearchRequest(BaseModel):
     query: Optional[str] = None
+    condition: Optional[str] = None  # used, new, any
     brand: Optional[str] = None
     model: Optional[str] = None
     year_min: Optional[int] = None
@@ -45,15 +46,117 @@ class VehicleSearchRequest(BaseModel):
     transmission: Optional[str] = None
     body_type: Optional[str] = None
     location: Optional[str] = None
-    sort_by: Optional[str] = "posted_date"  # price, year, mileage, posted_date
+    sort_by: Optional[str] = "posted_date"  # price, year, mileage, posted_date, relevance
     sort_order: Optional[str] = "desc"  # asc, desc
     page: int = 1
     page_size: int = 20
+    cursor: Optional[str] = None  # opaque keyset cursor, overrides page
+    count_strategy: Optional[str] = None  # exact, estimated, capped (default from settings)
+    engine: Optional[str] = None  # sql, memory (default from settings)
 
 
 class VehicleSearchResponse(BaseModel):
     results: List[VehicleResponse]
     total: int
+    total_relation: str = "eq"  # eq: exact, gte: capped ("10,000+"), approx: planner estimate
     page: int
     page_size: int
     total_pages: int
+    next_cursor: Optional[str] = None  # pass back as `cursor` to fetch the next page
+
+
+class BatchSearchRequest(BaseModel):
+    searches: List[VehicleSearchRequest]
+
+
+class BatchSearchItem(BaseModel):
+    response: Optional[VehicleSearchResponse] = None
+    error: Optional[str] = None  # set instead of response when this search failed
+    took_ms: float
+
+
+class BatchSearchResponse(BaseModel):
+    results: List[BatchSearchItem]  # in request order
+    took_ms: float
+
+
+class VehicleImage(BaseModel):
+    image_order: Optional[int] = None
+    image_url: Optional[str] = None
+
+
+class VehicleFeature(BaseModel):
+    category: Optional[str] = None
+    name: Optional[str] = None
+
+
+class VehicleReview(BaseModel):
+    title: Optional[str] = None
+    overall_rating: Optional[float] = None
+    review_time: Optional[str] = None
+    user_name: Optional[str] = None
+    user_location: Optional[str] = None
+    review_text: Optional[str] = None
+
+
+class SellerInfo(BaseModel):
+    seller_key: str
+    seller_name: Optional[str] = None
+    seller_link: Optional[str] = None
+    phone_new: Optional[str] = None
+    phone_used: Optional[str] = None
+    destination: Optional[str] = None
+    sales_hours: Optional[str] = None
+    seller_rating: Optional[float] = None
+    seller_rating_count: Optional[float] = None
+    price: Optional[float] = None  # this vehicle's price at the seller
+    stock_number: Optional[str] = None
+
+
+class VehicleFullResponse(BaseModel):
+    vehicle: VehicleResponse
+    specs: Dict[str, Any]  # drivetrain, engine, mpg, ratings, history flags, ...
+    images: List[VehicleImage]  # capped at LISTING_MAX_IMAGES
+    image_count: int  # total, may exceed len(images)
+    features: List[VehicleFeature]  # capped at LISTING_MAX_FEATURES
+    feature_count: int
+    reviews: List[VehicleReview]  # newest first, capped at LISTING_MAX_REVIEWS
+    review_count: int
+    average_rating: Optional[float] = None
+    seller: Optional[SellerInfo] = None
+
+
+class ListingBatchRequest(BaseModel):
+    ids: List[str]
+
+
+class ListingBatchResponse(BaseModel):
+    results: List[VehicleResponse]  # in requested order
+    missing: List[str]  # requested ids that do not exist
+
+
+class FacetValue(BaseModel):
+    value: str  # normalized (lowercase) value, usable as the filter parameter
+    label: Optional[str] = None  # display spelling
+    count: int
+    price_min: Optional[float] = None  # price buckets only
+    price_max: Optional[float] = None
+
+
+class SearchFacetsResponse(BaseModel):
+    total: int
+    facets: Dict[str, List[FacetValue]]
+
+
+class Suggestion(BaseModel):
+    text: str  # display text
+    kind: str  # brand, model, term
+    value: str  # normalized value: brand/model filter or query term
+    brand: Optional[str] = None  # normalized brand of a model suggestion
+    count: int  # matching listings
+    score: float  # listing count plus weighted interaction popularity
+
+
+class SuggestResponse(BaseModel):
+    prefix: str
+    suggestions: List[Suggestion]
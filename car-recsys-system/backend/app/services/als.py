@@ -0,0 +1,351 @@
+"""
+Implicit-feedback matrix factorization (ALS).
+
+The user x vehicle matrix holds the same log-damped interaction weights as
+the co-occurrence table. Each observed pair becomes a preference of 1 with
+confidence 1 + ALPHA * weight; unobserved pairs are preferences of 0 with
+confidence 1 (Hu, Koren & Volinsky, 2008). Alternating least squares fixes
+one side's factors and solves every row of the other side, in blocks:
+
+    (YᵀY + Yᵀ(Cᵤ - I)Y + λI) xᵤ = YᵀCᵤpᵤ
+
+either with a few conjugate-gradient steps started from the previous
+factors (the normal equations of a whole block are never formed), or
+exactly, stacking the block's f x f systems into one batched solve. Blocks
+are sharded over a process pool; workers memory-map the fixed side from a
+scratch file instead of receiving it with every task.
+
+train_als.py writes the factors to MODEL_DIR/als/ as .npy files plus a JSON
+of ids and parameters, and warm-starts from the previous ones. The API maps
+them read-only and scores vehicles by dot product, folding the seeds (a
+user's current history, or explicit vehicles) into a user vector with one
+f x f solve, so interactions since training already count.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence, Tuple
+import json
+import logging
+import math
+import os
+import tempfile
+import time
+import numpy as np
+import scipy.sparse as sp
+
+from app.core.config import settings
+from app.services.similarity import top_k
+
+logger = logging.getLogger(__name__)
+
+USER_FACTORS_FILE = 'user_factors.npy'
+ITEM_FACTORS_FILE = 'item_factors.npy'
+META_FILE = 'model.json'
+
+# Training defaults (see train_als.py)
+FACTORS = 64
+ITERATIONS = 15
+REGULARIZATION = 0.1
+# Confidence added per unit of damped interaction weight
+ALPHA = 10.0
+CG_STEPS = 3
+# Rows per solved block; a block is also the unit of work of a pool worker
+BLOCK_SIZE = 4096
+
+# Observed pairs whose f x f outer products are held at once by the exact solver
+EXACT_MAX_NNZ = 4096
+
+# Residual (squared norm) below which a row's conjugate-gradient solve stops early
+CG_TOLERANCE = 1e-10
+
+# Scale of the random initial factors
+INIT_SCALE = 0.01
+
+
+def _rowwise_dot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.einsum('ij,ij->i', a, b)
+
+
+def _cg_block(fixed: np.ndarray, gram: np.ndarray, block: sp.csr_matrix, x0: np.ndarray, steps: int) -> np.ndarray:
+    """
+    `steps` conjugate-gradient iterations for every row of the block at
+    once, from x0. A·p costs one product with the Gram matrix plus one pass
+    over the block's observed pairs.
+    """
+    rows = np.repeat(np.arange(block.shape[0]), np.diff(block.indptr))
+    neighbors = np.asarray(fixed[block.indices], dtype=np.float32)
+    weighted = sp.csr_matrix((1 + block.data, block.indices, block.indptr), shape=block.shape)
+    b = np.asarray(weighted @ fixed, dtype=np.float32)
+
+    def product(p: np.ndarray) -> np.ndarray:
+        data = _rowwise_dot(neighbors, p[rows]) * block.data
+        observed = sp.csr_matrix((data, block.indices, block.indptr), shape=block.shape)
+        return p @ gram + np.asarray(observed @ fixed, dtype=np.float32)
+
+    x = np.array(x0, dtype=np.float32)
+    r = b - product(x)
+    p = r.copy()
+    rs = _rowwise_dot(r, r)
+    for _ in range(steps):
+        if rs.max(initial=0.0) < CG_TOLERANCE:
+            break
+        ap = product(p)
+        pap = _rowwise_dot(p, ap)
+        step = np.divide(rs, pap, out=np.zeros_like(rs), where=pap > 0)
+        x += step[:, None] * p
+        r -= step[:, None] * ap
+        rs_new = _rowwise_dot(r, r)
+        p = r + np.divide(rs_new, rs, out=np.zeros_like(rs), where=rs > 0)[:, None] * p
+        rs = rs_new
+    return x
+
+
+def _exact_block(fixed: np.ndarray, gram: np.ndarray, block: sp.csr_matrix) -> np.ndarray:
+    """Every row's normal equations, built from outer products of its observed pairs and solved as one batch"""
+    n = block.shape[0]
+    a = np.repeat(gram[None].astype(np.float64), n, axis=0)
+    weighted = sp.csr_matrix((1 + block.data, block.indices, block.indptr), shape=block.shape)
+    b = np.asarray(weighted @ fixed, dtype=np.float64)
+    counts = np.diff(block.indptr)
+
+    start = 0
+    while start < n:
+        # At least one row, then as many as fit in EXACT_MAX_NNZ pairs
+        stop = max(start + 1, int(np.searchsorted(block.indptr, block.indptr[start] + EXACT_MAX_NNZ, side='right')) - 1)
+        stop = min(stop, n)
+        lo, hi = block.indptr[start], block.indptr[stop]
+        if hi > lo:
+            y = np.asarray(fixed[block.indices[lo:hi]], dtype=np.float64)
+            outer = np.einsum('ni,nj->nij', y * block.data[lo:hi, None], y)
+            nonempty = counts[start:stop] > 0
+            a[start:stop][nonempty] += np.add.reduceat(outer, block.indptr[start:stop][nonempty] - lo, axis=0)
+        start = stop
+    return np.linalg.solve(a, b[..., None])[..., 0].astype(np.float32)
+
+
+def solve_block(
+    fixed: np.ndarray,
+    gram: np.ndarray,
+    block: sp.csr_matrix,
+    x0: np.ndarray,
+    solver: str = 'cg',
+    cg_steps: int = CG_STEPS
+) -> np.ndarray:
+    """New factors of the block's rows (confidence - 1 values) given the other side's factors"""
+    if solver == 'exact':
+        return _exact_block(fixed, gram, block)
+    return _cg_block(fixed, gram, block, x0, cg_steps)
+
+
+# Worker side: the fixed factors of the current half-iteration, mapped once per scratch file
+_mapped: Tuple[Optional[str], Optional[np.ndarray]] = (None, None)
+
+
+def _solve_shard(path: str, gram: np.ndarray, block: sp.csr_matrix, x0: np.ndarray, solver: str, cg_steps: int) -> np.ndarray:
+    global _mapped
+    if _mapped[0] != path:
+        _mapped = (path, np.load(path, mmap_mode='r'))
+    return solve_block(_mapped[1], gram, block, x0, solver, cg_steps)
+
+
+def _solve_side(
+    matrix: sp.csr_matrix,
+    fixed: np.ndarray,
+    x: np.ndarray,
+    regularization: float,
+    solver: str,
+    cg_steps: int,
+    block_size: int,
+    executor: Optional[ProcessPoolExecutor],
+    scratch: Optional[str]
+) -> None:
+    """Solve every row of `x` in place, one block per task"""
+    gram = (fixed.T.astype(np.float64) @ fixed + regularization * np.eye(fixed.shape[1])).astype(np.float32)
+    starts = range(0, matrix.shape[0], block_size)
+    if executor is None:
+        for start in starts:
+            stop = min(start + block_size, matrix.shape[0])
+            x[start:stop] = solve_block(fixed, gram, matrix[start:stop], x[start:stop], solver, cg_steps)
+        return
+
+    path = os.path.join(scratch, f'fixed-{time.monotonic_ns()}.npy')
+    np.save(path, fixed)
+    try:
+        futures = {
+            executor.submit(
+                _solve_shard, path, gram, matrix[start:start + block_size], x[start:start + block_size], solver, cg_steps
+            ): start
+            for start in starts
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            start = futures[future]
+            x[start:start + len(result)] = result
+    finally:
+        os.remove(path)
+
+
+def init_factors(n: int, factors: int, rng: np.random.Generator) -> np.ndarray:
+    return (rng.standard_normal((n, factors)) * INIT_SCALE).astype(np.float32)
+
+
+def train(
+    matrix: sp.csr_matrix,
+    factors: int = FACTORS,
+    iterations: int = ITERATIONS,
+    regularization: float = REGULARIZATION,
+    alpha: float = ALPHA,
+    solver: str = 'cg',
+    cg_steps: int = CG_STEPS,
+    workers: int = 1,
+    block_size: int = BLOCK_SIZE,
+    user_factors: Optional[np.ndarray] = None,
+    item_factors: Optional[np.ndarray] = None,
+    seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (user factors, item factors) of a users x items matrix of damped
+    weights. Given initial factors, training continues from them.
+    """
+    rng = np.random.default_rng(seed)
+    n_users, n_items = matrix.shape
+    x = init_factors(n_users, factors, rng) if user_factors is None else np.array(user_factors, dtype=np.float32)
+    y = init_factors(n_items, factors, rng) if item_factors is None else np.array(item_factors, dtype=np.float32)
+
+    confidence = sp.csr_matrix(matrix, dtype=np.float32) * alpha
+    confidence_t = confidence.T.tocsr()
+
+    # Enough blocks to keep every worker busy on small matrices
+    user_block = max(1, min(block_size, math.ceil(n_users / (workers * 4))))
+    item_block = max(1, min(block_size, math.ceil(n_items / (workers * 4))))
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    scratch = tempfile.mkdtemp(prefix='als-') if executor is not None else None
+    try:
+        for iteration in range(1, iterations + 1):
+            start_time = time.time()
+            _solve_side(confidence, y, x, regularization, solver, cg_steps, user_block, executor, scratch)
+            _solve_side(confidence_t, x, y, regularization, solver, cg_steps, item_block, executor, scratch)
+            logger.info(f"ALS iteration {iteration}/{iterations} in {time.time() - start_time:.2f}s")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+            os.rmdir(scratch)
+    return x, y
+
+
+def warm_start(ids: Sequence[str], previous_ids: Sequence[str], previous: np.ndarray, initial: np.ndarray) -> np.ndarray:
+    """`initial` with the rows of ids the previous model knew replaced by their previous factors"""
+    rows = {vehicle_id: i for i, vehicle_id in enumerate(previous_ids)}
+    pairs = [(i, rows[k]) for i, k in enumerate(ids) if k in rows]
+    factors = np.array(initial, dtype=np.float32)
+    if pairs:
+        new_rows, old_rows = map(np.array, zip(*pairs))
+        factors[new_rows] = previous[old_rows]
+    return factors
+
+
+class AlsModel:
+    """Memory-mapped user and item factors plus their id maps and training parameters"""
+
+    def __init__(self, users: List[str], items: List[str], user_factors: np.ndarray, item_factors: np.ndarray, params: Dict):
+        self.users = users
+        self.items = items
+        self.user_to_row = {user_id: i for i, user_id in enumerate(users)}
+        self.item_to_row = {vehicle_id: i for i, vehicle_id in enumerate(items)}
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.params = params
+        self.regularization = float(params.get('regularization', REGULARIZATION))
+        self.alpha = float(params.get('alpha', ALPHA))
+        self._gram: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @property
+    def factors(self) -> int:
+        return self.item_factors.shape[1]
+
+    def save(self, directory: str) -> None:
+        """Write under temporary names and rename into place; mapped readers keep the old files"""
+        os.makedirs(directory, exist_ok=True)
+        files = [
+            (USER_FACTORS_FILE, lambda f: np.save(f, np.asarray(self.user_factors, dtype=np.float32))),
+            (ITEM_FACTORS_FILE, lambda f: np.save(f, np.asarray(self.item_factors, dtype=np.float32))),
+            (META_FILE, lambda f: f.write(json.dumps({**self.params, 'users': self.users, 'items': self.items}).encode())),
+        ]
+        for name, write in files:
+            with open(os.path.join(directory, name + '.tmp'), 'wb') as f:
+                write(f)
+        for name, _ in files:
+            os.replace(os.path.join(directory, name + '.tmp'), os.path.join(directory, name))
+
+    @classmethod
+    def load(cls, directory: str) -> "AlsModel":
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+        users, items = meta.pop('users'), meta.pop('items')
+        user_factors = np.load(os.path.join(directory, USER_FACTORS_FILE), mmap_mode='r')
+        item_factors = np.load(os.path.join(directory, ITEM_FACTORS_FILE), mmap_mode='r')
+        if len(user_factors) != len(users) or len(item_factors) != len(items):
+            raise ValueError(f"{directory}: factor rows do not match the ids")
+        return cls(users, items, user_factors, item_factors, meta)
+
+    @property
+    def gram(self) -> np.ndarray:
+        """YᵀY + λI, computed on first use"""
+        if self._gram is None:
+            y = np.asarray(self.item_factors, dtype=np.float64)
+            self._gram = y.T @ y + self.regularization * np.eye(self.factors)
+        return self._gram
+
+    def fold_in(self, weights: Dict[str, float]) -> Optional[np.ndarray]:
+        """
+        User vector of {vehicle_id: damped weight}, solved exactly against the
+        item factors; None if no vehicle is known to the model
+        """
+        known = [(self.item_to_row[vehicle_id], weight) for vehicle_id, weight in weights.items() if vehicle_id in self.item_to_row]
+        if not known:
+            return None
+        rows, values = zip(*known)
+        y = np.asarray(self.item_factors[np.array(rows)], dtype=np.float64)
+        confidence = self.alpha * np.asarray(values, dtype=np.float64)
+        a = self.gram + (y * confidence[:, None]).T @ y
+        b = (1 + confidence) @ y
+        return np.linalg.solve(a, b).astype(np.float32)
+
+    def candidates(self, seeds: Dict[str, float], limit: int, exclude: Sequence[str] = ()) -> List[Tuple[str, float]]:
+        """(vehicle_id, predicted preference) best first; seeds and `exclude` are never returned"""
+        vector = self.fold_in(seeds)
+        if vector is None:
+            return []
+        scores = (np.asarray(self.item_factors) @ vector)[None, :]
+        excluded = [self.item_to_row[v] for v in (*seeds, *exclude) if v in self.item_to_row]
+        scores[0, excluded] = -np.inf
+        columns, values = top_k(scores, limit)
+        return [(self.items[c], float(v)) for c, v in zip(columns[0], values[0]) if np.isfinite(v)]
+
+
+_model: Optional[AlsModel] = None
+
+
+def model_dir() -> str:
+    return os.path.join(settings.MODEL_DIR, 'als')
+
+
+def get_als_model() -> Optional[AlsModel]:
+    return _model
+
+
+def load_als_model(directory: Optional[str] = None) -> Optional[AlsModel]:
+    """Map the factors if the trainer has written them"""
+    global _model
+    directory = directory or model_dir()
+    if not os.path.exists(os.path.join(directory, META_FILE)):
+        logger.info(f"No ALS factors in {directory}; run train_als.py")
+        return None
+    start_time = time.time()
+    _model = AlsModel.load(directory)
+    logger.info(f"Mapped ALS factors: {len(_model.users):,} users, {len(_model):,} vehicles, "
+                f"{_model.factors} factors in {time.time() - start_time:.2f}s")
+    return _model
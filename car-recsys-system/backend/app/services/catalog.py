@@ -0,0 +1,412 @@
+"""
+In-memory columnar vehicle catalog.
+
+Loads raw.used_vehicles and raw.new_vehicles into NumPy column arrays and
+answers the same filter/sort/page contract as the SQL search with
+vectorized boolean masks, so a search costs no database round trip.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+import math
+import re
+import time
+import numpy as np
+
+from app.core.database import SessionLocal
+from app.schemas.vehicle import VehicleSearchRequest
+from app.services.text_index import BM25Index, InvertedIndex
+from app.services.vehicle_search import (
+    VEHICLE_FIELDS,
+    VEHICLE_SELECT,
+    decode_cursor,
+    encode_cursor,
+    normalize_facet,
+    resolve_sort,
+    tokenize
+)
+
+logger = logging.getLogger(__name__)
+
+# Condition codes, in load order
+CONDITION_TABLES = (
+    ('used', 'raw.used_vehicles'),
+    ('new', 'raw.new_vehicles'),
+)
+
+# Columns filtered by range through sorted arrays
+RANGE_COLUMNS = ('price', 'mileage', 'year')
+
+# Facets matched by equality, dictionary-encoded to integer codes
+CODED_COLUMNS = ('brand', 'fuel_type', 'transmission', 'model', 'drivetrain')
+
+# Sort columns as resolved by vehicle_search.resolve_sort, with precomputed
+# ranks; 'relevance' is ranked per query instead
+SORT_COLUMNS = ('vehicle_id', 'price', 'mileage')
+
+# Feature names per vehicle, as one text field for relevance ranking
+FEATURES_SQL = """
+    SELECT vehicle_id, string_agg(feature_name, ' ') AS features
+    FROM raw.vehicle_features
+    WHERE feature_name IS NOT NULL
+    GROUP BY vehicle_id
+"""
+
+# Same expression as vehicle_search.TITLE_YEAR_SQL
+YEAR_RE = re.compile(r'^\s*([0-9]{4})(?![0-9])')
+
+
+def _to_float(value) -> float:
+    return float(value) if value is not None else np.nan
+
+
+def _title_year(title: Optional[str]) -> float:
+    match = YEAR_RE.match(title or '')
+    return float(match.group(1)) if match else np.nan
+
+
+def _dictionary_encode(values) -> Tuple[np.ndarray, Dict[str, int], List[str]]:
+    """
+    Encode normalized values as int32 codes; -1 marks NULL/empty.
+    Also returns a display label per code (the smallest original spelling).
+    """
+    dictionary: Dict[str, int] = {}
+    labels: List[str] = []
+    codes = np.full(len(values), -1, dtype=np.int32)
+    for i, value in enumerate(values):
+        if value:
+            code = dictionary.setdefault(normalize_facet(value), len(dictionary))
+            if code == len(labels):
+                labels.append(value)
+            elif value < labels[code]:
+                labels[code] = value
+            codes[i] = code
+    return codes, dictionary, labels
+
+
+class VehicleCatalog:
+    """Column arrays for every listing, plus the indexes search needs"""
+
+    def __init__(self, rows, features: Optional[Dict[str, str]] = None):
+        features = features or {}
+        self.size = len(rows)
+        self.fields = VEHICLE_FIELDS
+
+        # Display values exactly as the SQL projection returns them
+        self.display = {
+            field: np.array([row[field] for row in rows], dtype=object)
+            for field in self.fields
+        }
+        self.ids = self.display['id']
+        self.id_to_row = {vehicle_id: i for i, vehicle_id in enumerate(self.ids)}
+        self.condition = np.array([row['condition_code'] for row in rows], dtype=np.int8)
+
+        self.numeric = {
+            'price': np.array([_to_float(row['price_value']) for row in rows], dtype=np.float64),
+            'mileage': np.array([_to_float(row['mileage_value']) for row in rows], dtype=np.float64),
+            'year': np.array([_title_year(row['title']) for row in rows], dtype=np.float64),
+        }
+
+        # Sorted (values, row ids) per range column; NULLs never match a range
+        self.range_index = {}
+        for column in RANGE_COLUMNS:
+            values = self.numeric[column]
+            order = np.argsort(values, kind='stable')
+            n_valid = int(np.count_nonzero(~np.isnan(values)))
+            self.range_index[column] = (values[order[:n_valid]], order[:n_valid])
+
+        self.codes = {}
+        self.dictionaries = {}
+        self.labels = {}
+        for column in CODED_COLUMNS:
+            self.codes[column], self.dictionaries[column], self.labels[column] = _dictionary_encode(
+                [row[column] for row in rows]
+            )
+
+        # Same fields as the search_tsv column
+        self.text_index = InvertedIndex([
+            tokenize(row['title']) + tokenize(row['brand']) + tokenize(row['model'])
+            for row in rows
+        ])
+
+        # Relevance ranks over more text than the filter matches on
+        self.relevance_index = BM25Index([
+            tokenize(row['title']) + tokenize(row['brand']) + tokenize(row['model'])
+            + tokenize(row['engine']) + tokenize(features.get(row['id']))
+            for row in rows
+        ])
+
+        # Rows arrive sorted by vehicle_id in codepoint order (see from_db), so
+        # position is the id rank and self.ids is searchable with searchsorted.
+        # Precompute the rank of every row for each sort order (NULLS LAST,
+        # vehicle_id tie-breaker) once at load time.
+        id_rank = np.arange(self.size, dtype=np.int64)
+        self.sort_rank = {}
+        for column in SORT_COLUMNS:
+            for order in ('ASC', 'DESC'):
+                if column == 'vehicle_id':
+                    perm = id_rank if order == 'ASC' else id_rank[::-1]
+                else:
+                    values = self.numeric[column]
+                    if order == 'ASC':
+                        perm = np.lexsort((id_rank, values))
+                    else:
+                        perm = np.lexsort((-id_rank, -values))
+                rank = np.empty(self.size, dtype=np.int64)
+                rank[perm] = id_rank
+                self.sort_rank[(column, order)] = rank
+
+    @classmethod
+    def from_db(cls, db: Session) -> "VehicleCatalog":
+        """
+        Load both vehicle tables in vehicle_id order. Rows are sorted in Python
+        rather than by ORDER BY, so the order is codepoint order whatever the
+        database collation; it matches SQL under C and musl (postgres:15-alpine)
+        locales, which also compare codepoints.
+        """
+        selects = [
+            f"""SELECT {VEHICLE_SELECT},
+                    v.price::float8 AS price_value,
+                    v.mileage::float8 AS mileage_value,
+                    v.drivetrain AS drivetrain,
+                    v.engine AS engine,
+                    {code} AS condition_code
+                FROM {table} v"""
+            for code, (_, table) in enumerate(CONDITION_TABLES)
+        ]
+        sql = " UNION ALL ".join(selects)
+        rows = sorted((row._mapping for row in db.execute(text(sql))), key=lambda row: row['id'])
+        features = {row.vehicle_id: row.features for row in db.execute(text(FEATURES_SQL))}
+        return cls(rows, features)
+
+    def _range_mask(self, column: str, low: Optional[float], high: Optional[float]) -> np.ndarray:
+        values, rows = self.range_index[column]
+        start = np.searchsorted(values, low, side='left') if low is not None else 0
+        stop = np.searchsorted(values, high, side='right') if high is not None else len(values)
+        mask = np.zeros(self.size, dtype=bool)
+        mask[rows[start:stop]] = True
+        return mask
+
+    def _code_mask(self, column: str, value: str) -> np.ndarray:
+        code = self.dictionaries[column].get(normalize_facet(value))
+        if code is None:
+            return np.zeros(self.size, dtype=bool)
+        return self.codes[column] == code
+
+    def filter_mask(self, search: VehicleSearchRequest, text_index: Optional[InvertedIndex] = None) -> np.ndarray:
+        """
+        Boolean row mask for the search filters, mirroring build_where_clause.
+        `text_index` replaces the search_tsv fields for the free-text match.
+        """
+        condition = (search.condition or '').lower()
+        if condition == 'any':
+            mask = np.ones(self.size, dtype=bool)
+        else:
+            mask = self.condition == (1 if condition == 'new' else 0)
+
+        if search.query:
+            tokens = tokenize(search.query)
+            if tokens:
+                mask &= (text_index or self.text_index).match_all_prefixes(tokens)
+
+        if search.brand:
+            mask &= self._code_mask('brand', search.brand)
+
+        if search.model:
+            # Substring match evaluated once per distinct model, not per row
+            needle = search.model.lower()
+            matching = [code for value, code in self.dictionaries['model'].items() if needle in value]
+            mask &= np.isin(self.codes['model'], matching)
+
+        if search.year_min or search.year_max:
+            mask &= self._range_mask('year', search.year_min or None, search.year_max or None)
+
+        if search.price_min or search.price_max:
+            mask &= self._range_mask('price', search.price_min or None, search.price_max or None)
+
+        if search.mileage_max:
+            mask &= self._range_mask('mileage', None, search.mileage_max)
+
+        if search.fuel_type:
+            mask &= self._code_mask('fuel_type', search.fuel_type)
+
+        if search.transmission:
+            mask &= self._code_mask('transmission', search.transmission)
+
+        if search.body_type or search.location:
+            # Not present in the vehicle tables, so nothing can match
+            mask[:] = False
+
+        return mask
+
+    def facet_counts(
+        self,
+        search: VehicleSearchRequest,
+        columns: Sequence[str],
+        price_edges: Sequence[float]
+    ) -> Tuple[int, Dict[str, List[Tuple[str, str, int]]], Dict[int, int]]:
+        """
+        Facet histograms for the filtered rows in one vectorized pass.
+        Returns (total, {column: [(value, label, count)]}, {price_bucket: count})
+        with price buckets numbered like SQL width_bucket().
+        """
+        mask = self.filter_mask(search)
+        total = int(np.count_nonzero(mask))
+
+        counts = {}
+        for column in columns:
+            codes = self.codes[column][mask]
+            histogram = np.bincount(codes[codes >= 0], minlength=len(self.labels[column]))
+            values = list(self.dictionaries[column])
+            counts[column] = [
+                (values[code], self.labels[column][code], int(histogram[code]))
+                for code in np.flatnonzero(histogram)
+            ]
+
+        prices = self.numeric['price'][mask]
+        buckets = np.digitize(prices[~np.isnan(prices)], price_edges)
+        bucket_histogram = np.bincount(buckets)
+        price_counts = {int(b): int(bucket_histogram[b]) for b in np.flatnonzero(bucket_histogram)}
+
+        return total, counts, price_counts
+
+    def relevance_scores(self, query: Optional[str], mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """BM25 score per row for the free-text query (all zero without one)"""
+        return self.relevance_index.score(tokenize(query), mask).astype(np.float64)
+
+    def _after_cursor(
+        self,
+        rows: np.ndarray,
+        values: Optional[np.ndarray],
+        order: str,
+        sort_value: Optional[str],
+        cursor_id: str
+    ) -> np.ndarray:
+        """Mask over `rows` selecting those strictly after the cursor position"""
+        position = self.id_to_row.get(cursor_id)
+        if position is not None:
+            id_after = rows > position if order == 'ASC' else rows < position
+        else:
+            # Cursor row was removed since; locate it between its neighbours.
+            # self.ids is in codepoint order, the same order searchsorted compares in.
+            position = int(np.searchsorted(self.ids, cursor_id))
+            id_after = rows >= position if order == 'ASC' else rows < position
+
+        if values is None:
+            return id_after
+
+        values = values[rows]
+        if sort_value is None:
+            return np.isnan(values) & id_after
+
+        value = float(sort_value)
+        before_or_after = values > value if order == 'ASC' else values < value
+        return before_or_after | ((values == value) & id_after) | np.isnan(values)
+
+    def _rank(self, values: np.ndarray, rows: np.ndarray, order: str) -> np.ndarray:
+        """Rank of `rows` by value with vehicle_id tie-breaker, same scheme as sort_rank"""
+        if order == 'ASC':
+            perm = rows[np.lexsort((rows, values[rows]))]
+        else:
+            perm = rows[np.lexsort((-rows, -values[rows]))]
+        rank = np.empty(self.size, dtype=np.int64)
+        rank[perm] = np.arange(len(perm))
+        return rank
+
+    def rows_to_dicts(self, rows) -> List[Dict]:
+        """VehicleResponse-shaped dicts for catalog rows"""
+        return [{field: self.display[field][i] for field in self.fields} for i in rows]
+
+    def search(self, search: VehicleSearchRequest) -> Dict:
+        """Filter, sort and page the catalog; same contract as the SQL search"""
+        sort_column, order = resolve_sort(search.sort_by, search.sort_order)
+
+        if sort_column == 'relevance':
+            # Relevance matches the query over the wider ranked fields too
+            mask = self.filter_mask(search, self.relevance_index)
+        else:
+            mask = self.filter_mask(search)
+        rows = np.flatnonzero(mask)
+        total = len(rows)
+
+        if sort_column == 'relevance':
+            # Scores only for rows passing the filters, ranked on the fly
+            values = self.relevance_scores(search.query, mask)
+            rank = self._rank(values, rows, order)
+        elif sort_column == 'vehicle_id':
+            values = None
+            rank = self.sort_rank[(sort_column, order)]
+        else:
+            values = self.numeric[sort_column]
+            rank = self.sort_rank[(sort_column, order)]
+
+        if search.cursor:
+            sort_value, cursor_id = decode_cursor(search.cursor, sort_column, order, engine='memory')
+            rows = rows[self._after_cursor(rows, values, order, sort_value, cursor_id)]
+            offset = 0
+        else:
+            offset = (search.page - 1) * search.page_size
+
+        # Top-N by rank: partition out the first k, sort only those
+        k = offset + search.page_size + 1
+        ranks = rank[rows]
+        if k < len(rows):
+            top = np.argpartition(ranks, k - 1)[:k]
+            rows, ranks = rows[top], ranks[top]
+        page_rows = rows[np.argsort(ranks)][offset:offset + search.page_size + 1]
+
+        has_more = len(page_rows) > search.page_size
+        page_rows = page_rows[:search.page_size]
+
+        next_cursor = None
+        if has_more:
+            last = page_rows[-1]
+            if sort_column == 'relevance':
+                sort_key = repr(float(values[last]))
+            elif sort_column == 'vehicle_id':
+                sort_key = self.ids[last]
+            else:
+                sort_key = self.display[sort_column][last]
+            next_cursor = encode_cursor(sort_column, order, sort_key, self.ids[last], engine='memory')
+
+        return {
+            'results': self.rows_to_dicts(page_rows),
+            'total': total,
+            'total_relation': 'eq',
+            'page': search.page,
+            'page_size': search.page_size,
+            'total_pages': math.ceil(total / search.page_size) if total > 0 else 0,
+            'next_cursor': next_cursor
+        }
+
+
+_catalog: Optional[VehicleCatalog] = None
+
+
+def get_catalog() -> Optional[VehicleCatalog]:
+    """The loaded catalog, or None when the in-memory engine is not enabled"""
+    return _catalog
+
+
+def load_catalog(db: Optional[Session] = None) -> VehicleCatalog:
+    """(Re)load the catalog from the database and swap it in atomically"""
+    global _catalog
+    start_time = time.time()
+
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        catalog = VehicleCatalog.from_db(db)
+
+        # Typeahead keys come from the same columns, so rebuild them together
+        from app.services import suggest
+        suggest.build_suggest_index(db, catalog)
+    finally:
+        if own_session:
+            db.close()
+
+    _catalog = catalog
+    logger.info(f"Loaded in-memory catalog: {catalog.size:,} vehicles in {time.time() - start_time:.2f}s")
+    return catalog
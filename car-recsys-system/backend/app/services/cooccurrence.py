@@ -0,0 +1,369 @@
+"""
+Item-item co-occurrence candidates.
+
+Each user becomes one sparse row of log-damped interaction weights
+(interaction_score times the type weight, summed per vehicle). Two vehicles
+co-occur by the dot product of their user columns, i.e. the item-item
+matrix XᵀX, computed in item blocks with sparse products. The top-N
+entries of every item row, normalized by both items' norms, form the
+neighbor table.
+
+build_cooccurrence_index.py writes the table to MODEL_DIR. The API loads
+it and folds each new interaction into the rows it affects (the vehicle
+and everything else the user touched), so candidates follow live activity
+until the next build replaces the table.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+import os
+import threading
+import time
+import numpy as np
+import scipy.sparse as sp
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.interaction_weights import INTERACTION_WEIGHT_SQL, interaction_weight
+
+logger = logging.getLogger(__name__)
+
+# Vehicles kept per user, heaviest first; bounds the quadratic cost of XᵀX
+MAX_ITEMS_PER_USER = 500
+
+# History vehicles used as seeds of a user's candidates
+MAX_SEEDS = 50
+
+# Added to the norm product, so pairs seen by a single user rank below well-supported ones
+SHRINKAGE = 5.0
+
+# Item rows per sparse product in the offline job
+BLOCK_SIZE = 4096
+
+# Rows fetched per round trip while streaming interactions
+FETCH_SIZE = 100_000
+
+# Summed weight of every (user, vehicle) pair
+INTERACTIONS_SQL = f"""
+    SELECT user_id::text AS user_id, vehicle_id, SUM({INTERACTION_WEIGHT_SQL})::float8 AS weight
+    FROM gold.user_interactions
+    WHERE user_id IS NOT NULL AND vehicle_id IS NOT NULL
+    GROUP BY user_id, vehicle_id
+"""
+
+# One user's vehicles, heaviest first
+USER_HISTORY_SQL = f"""
+    SELECT vehicle_id, SUM({INTERACTION_WEIGHT_SQL})::float8 AS weight
+    FROM gold.user_interactions
+    WHERE user_id = CAST(:user_id AS uuid) AND vehicle_id IS NOT NULL
+    GROUP BY vehicle_id
+    ORDER BY weight DESC, MAX(created_at) DESC
+    LIMIT :limit
+"""
+
+
+def damp(weight):
+    """Matrix value of a summed interaction weight; repeated views add less and less"""
+    return np.log1p(np.maximum(weight, 0))
+
+
+def normalized_scores(counts: np.ndarray, norms_a: np.ndarray, norms_b: np.ndarray) -> np.ndarray:
+    """Shrunk cosine of co-occurrence counts, given the squared norms of both items"""
+    return counts / (np.sqrt(norms_a * norms_b) + SHRINKAGE)
+
+
+def user_item_matrix(
+    user_rows: np.ndarray,
+    item_rows: np.ndarray,
+    weights: np.ndarray,
+    shape: Tuple[int, int],
+    max_items_per_user: int = MAX_ITEMS_PER_USER
+) -> sp.csr_matrix:
+    """Users x items CSR of damped weights, keeping each user's heaviest vehicles"""
+    values = damp(weights).astype(np.float32)
+    order = np.lexsort((-values, user_rows))
+    user_rows, item_rows, values = user_rows[order], item_rows[order], values[order]
+    # Position within the user's run of the sorted pairs
+    rank = np.arange(len(user_rows)) - np.searchsorted(user_rows, user_rows)
+    keep = rank < max_items_per_user
+    return sp.csr_matrix((values[keep], (user_rows[keep], item_rows[keep])), shape=shape)
+
+
+def interaction_matrix(db: Session) -> Tuple[List[str], List[str], sp.csr_matrix]:
+    """(user ids, vehicle ids, users x vehicles CSR of damped weights), streamed in chunks"""
+    users: Dict[str, int] = {}
+    items: Dict[str, int] = {}
+    user_rows, item_rows, weights = [], [], []
+
+    result = db.connection().execution_options(stream_results=True).execute(text(INTERACTIONS_SQL))
+    for chunk in result.partitions(FETCH_SIZE):
+        user_rows.append(np.fromiter((users.setdefault(row[0], len(users)) for row in chunk), dtype=np.int32))
+        item_rows.append(np.fromiter((items.setdefault(row[1], len(items)) for row in chunk), dtype=np.int32))
+        weights.append(np.fromiter((row[2] for row in chunk), dtype=np.float64))
+
+    matrix = user_item_matrix(
+        np.concatenate(user_rows or [np.zeros(0, dtype=np.int32)]),
+        np.concatenate(item_rows or [np.zeros(0, dtype=np.int32)]),
+        np.concatenate(weights or [np.zeros(0)]),
+        (len(users), len(items))
+    )
+    logger.info(f"Interaction matrix: {len(users):,} users x {len(items):,} vehicles, {matrix.nnz:,} entries")
+    return list(users), list(items), matrix
+
+
+class CooccurrenceIndex:
+    """
+    Neighbor table (int32 columns, -1 padded, raw co-occurrence counts) plus
+    the squared item norms. Rows touched since the build live in a dict of
+    {column: count} overrides instead of the fixed-width arrays.
+    """
+
+    def __init__(self, ids: np.ndarray, neighbors: np.ndarray, counts: np.ndarray, norms: np.ndarray):
+        self.ids: List[str] = ids.tolist()
+        self.id_to_row = {vehicle_id: i for i, vehicle_id in enumerate(self.ids)}
+        self.neighbors = neighbors
+        self.counts = counts
+        self.norms = norms.astype(np.float64)
+        self.k = neighbors.shape[1]
+        self._rows: Dict[int, Dict[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_matrix(cls, ids: np.ndarray, matrix: sp.csr_matrix, k: int, block_size: int = BLOCK_SIZE) -> "CooccurrenceIndex":
+        """Top-k co-occurring items of every item, one (block x users) @ (users x items) product at a time"""
+        n_items = matrix.shape[1]
+        norms = np.asarray(matrix.multiply(matrix).sum(axis=0), dtype=np.float64).ravel()
+        item_users = matrix.T.tocsr()
+
+        neighbors = np.full((n_items, k), -1, dtype=np.int32)
+        counts = np.zeros((n_items, k), dtype=np.float32)
+        for start in range(0, n_items, block_size):
+            stop = min(start + block_size, n_items)
+            block = (item_users[start:stop] @ matrix).tocoo()
+            rows, cols, values = block.row, block.col, block.data
+
+            # An item is not its own neighbor
+            keep = cols != rows + start
+            rows, cols, values = rows[keep], cols[keep], values[keep]
+
+            scores = normalized_scores(values, norms[rows + start], norms[cols])
+            order = np.lexsort((cols, -scores, rows))
+            rows, cols, values = rows[order], cols[order], values[order]
+            rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+            keep = rank < k
+            neighbors[rows[keep] + start, rank[keep]] = cols[keep]
+            counts[rows[keep] + start, rank[keep]] = values[keep]
+
+        return cls(ids, neighbors, counts, norms)
+
+    @classmethod
+    def from_db(cls, db: Session, k: int) -> "CooccurrenceIndex":
+        """Stream the (user, vehicle) weights in chunks and build the table"""
+        _, items, matrix = interaction_matrix(db)
+        return cls.from_matrix(np.array(items, dtype=str), matrix, k)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                ids=np.array(self.ids, dtype=str),
+                neighbors=self.neighbors,
+                counts=self.counts,
+                norms=self.norms
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "CooccurrenceIndex":
+        data = np.load(path, allow_pickle=False)
+        return cls(data['ids'], data['neighbors'], data['counts'], data['norms'])
+
+    def _row_entries(self, row: int) -> Dict[int, float]:
+        """Mutable {column: count} of a row, copied from the table on first touch; caller holds the lock"""
+        entries = self._rows.get(row)
+        if entries is None:
+            entries = {}
+            if row < len(self.neighbors):
+                valid = self.neighbors[row] >= 0
+                entries = dict(zip(self.neighbors[row][valid].tolist(), self.counts[row][valid].tolist()))
+            self._rows[row] = entries
+        return entries
+
+    def _row_for(self, vehicle_id: str) -> int:
+        """Row of a vehicle, adding vehicles first seen after the build; caller holds the lock"""
+        row = self.id_to_row.get(vehicle_id)
+        if row is None:
+            row = len(self.ids)
+            self.ids.append(vehicle_id)
+            self.norms = np.append(self.norms, 0.0)
+            self.id_to_row[vehicle_id] = row
+        return row
+
+    def row_scores(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(columns, normalized scores) of one item row"""
+        with self._lock:
+            entries = self._rows.get(row)
+            if entries is not None:
+                columns = np.fromiter(entries.keys(), dtype=np.int64, count=len(entries))
+                counts = np.fromiter(entries.values(), dtype=np.float64, count=len(entries))
+            norms = self.norms
+        if entries is None:
+            if row >= len(self.neighbors):
+                return np.zeros(0, dtype=np.int64), np.zeros(0)
+            valid = self.neighbors[row] >= 0
+            columns = self.neighbors[row][valid].astype(np.int64)
+            counts = self.counts[row][valid].astype(np.float64)
+        return columns, normalized_scores(counts, norms[row], norms[columns])
+
+    def candidates(
+        self,
+        seeds: Dict[str, float],
+        limit: int,
+        exclude: Sequence[str] = ()
+    ) -> List[Tuple[str, float]]:
+        """
+        (vehicle_id, score) best first, scoring every neighbor of the seeds by
+        the seed-weighted sum of its similarities
+        """
+        columns, scores = [], []
+        for vehicle_id, weight in seeds.items():
+            row = self.id_to_row.get(vehicle_id)
+            if row is not None:
+                row_columns, row_scores = self.row_scores(row)
+                columns.append(row_columns)
+                scores.append(row_scores * weight)
+        columns = np.concatenate(columns) if columns else np.zeros(0, dtype=np.int64)
+        if not len(columns):
+            return []
+
+        unique, inverse = np.unique(columns, return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(scores), minlength=len(unique))
+        excluded = [self.id_to_row[v] for v in (*seeds, *exclude) if v in self.id_to_row]
+        totals[np.isin(unique, excluded)] = -np.inf
+
+        k = min(limit, int(np.isfinite(totals).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-totals, k - 1)[:k]
+        top = top[np.lexsort((unique[top], -totals[top]))]
+        return [(self.ids[unique[i]], float(totals[i])) for i in top]
+
+    def add_interaction(self, vehicle_id: str, weight: float, history: Dict[str, float]) -> int:
+        """
+        Fold one new interaction into the table. `history` is the user's summed
+        weight per vehicle, already including it. Returns the rows updated.
+        """
+        with self._lock:
+            total = history.get(vehicle_id, weight)
+            new_value, old_value = damp(total), damp(total - weight)
+            delta = new_value - old_value
+            if delta <= 0:
+                return 0
+
+            row = self._row_for(vehicle_id)
+            self.norms[row] += new_value ** 2 - old_value ** 2
+            entries = self._row_entries(row)
+            updated = 1
+            for other_id, other_total in history.items():
+                if other_id == vehicle_id:
+                    continue
+                other = self._row_for(other_id)
+                increment = delta * damp(other_total)
+                entries[other] = entries.get(other, 0.0) + increment
+                other_entries = self._row_entries(other)
+                other_entries[row] = other_entries.get(row, 0.0) + increment
+                self._trim(other, other_entries)
+                updated += 1
+            self._trim(row, entries)
+            return updated
+
+    def _trim(self, row: int, entries: Dict[int, float]) -> None:
+        """Cut an updated row grown past 4k entries back to its best 2k; caller holds the lock"""
+        if len(entries) <= 4 * self.k:
+            return
+        columns = np.fromiter(entries.keys(), dtype=np.int64, count=len(entries))
+        counts = np.fromiter(entries.values(), dtype=np.float64, count=len(entries))
+        scores = normalized_scores(counts, self.norms[row], self.norms[columns])
+        keep = np.argpartition(-scores, 2 * self.k - 1)[:2 * self.k]
+        self._rows[row] = dict(zip(columns[keep].tolist(), counts[keep].tolist()))
+
+
+_index: Optional[CooccurrenceIndex] = None
+
+
+def index_path() -> str:
+    return os.path.join(settings.MODEL_DIR, 'cooccurrence.npz')
+
+
+def get_cooccurrence_index() -> Optional[CooccurrenceIndex]:
+    return _index
+
+
+def load_cooccurrence_index(path: Optional[str] = None) -> Optional[CooccurrenceIndex]:
+    """Load the precomputed table if the offline job has written one"""
+    global _index
+    path = path or index_path()
+    if not os.path.exists(path):
+        logger.info(f"No co-occurrence table at {path}; run build_cooccurrence_index.py")
+        return None
+    start_time = time.time()
+    _index = CooccurrenceIndex.load(path)
+    logger.info(f"Loaded co-occurrence table: {len(_index):,} vehicles in {time.time() - start_time:.2f}s")
+    return _index
+
+
+def user_history(db: Session, user_id: str, limit: int = MAX_ITEMS_PER_USER) -> Dict[str, float]:
+    """A user's summed interaction weight per vehicle, heaviest first"""
+    rows = db.execute(text(USER_HISTORY_SQL), {'user_id': user_id, 'limit': limit})
+    return {row.vehicle_id: row.weight for row in rows}
+
+
+def find_candidates(
+    db: Session,
+    limit: int,
+    vehicle_ids: Optional[Sequence[str]] = None,
+    user_id: Optional[str] = None
+) -> Optional[Tuple[List[str], List[Tuple[str, float]]]]:
+    """
+    (seeds, candidates) from explicit seed vehicles, else from the user's
+    history; the user's vehicles are never candidates. None when no table
+    is loaded.
+    """
+    index = _index
+    if index is None:
+        return None
+
+    history = user_history(db, user_id) if user_id else {}
+    if vehicle_ids:
+        seeds = dict.fromkeys(vehicle_ids, 1.0)
+    else:
+        seeds = {vehicle_id: float(damp(weight)) for vehicle_id, weight in list(history.items())[:MAX_SEEDS]}
+    return list(seeds), index.candidates(seeds, limit, exclude=list(history))
+
+
+def record_interaction(
+    user_id: str,
+    vehicle_id: str,
+    interaction_type: Optional[str],
+    interaction_score: Optional[float]
+) -> None:
+    """
+    Apply a committed interaction to the loaded table. Runs as a background
+    task after the response, with its own session.
+    """
+    index = _index
+    if index is None:
+        return
+    db = SessionLocal()
+    try:
+        history = user_history(db, str(user_id))
+    except Exception as e:
+        logger.warning(f"Co-occurrence update skipped: {e}")
+        return
+    finally:
+        db.close()
+    index.add_interaction(vehicle_id, interaction_weight(interaction_type, interaction_score), history)
@@ -0,0 +1,107 @@
+"""
+Reaction to vehicle data reloads.
+
+The ETL sends `NOTIFY data_reload` after it loads the raw tables. Every API
+process LISTENs on that channel and drops its caches and rebuilds its
+in-memory indexes, so no worker keeps serving the previous data set.
+"""
+from typing import Optional
+import logging
+import select
+import threading
+import psycopg2
+
+from app.core.config import settings
+from app.services import catalog, embedding_store, facets, similarity, suggest, vector_index, vehicle_search
+from app.services.listing_cache import listing_cache
+
+logger = logging.getLogger(__name__)
+
+RELOAD_CHANNEL = "data_reload"
+
+# Seconds between liveness checks of the LISTEN connection
+POLL_INTERVAL = 5.0
+
+# Seconds to wait before reconnecting after the connection drops
+RECONNECT_DELAY = 10.0
+
+
+def reload_data() -> None:
+    """Drop every cache derived from the vehicle tables and rebuild in-memory indexes"""
+    listing_cache.invalidate()
+    vehicle_search.clear_count_cache()
+    facets.clear_facet_cache()
+
+    if catalog.get_catalog() is not None:
+        # Also rebuilds the suggest index
+        catalog.load_catalog()
+    else:
+        suggest.build_suggest_index_from_db()
+
+    # Picks up a table rebuilt by build_similarity_index.py; vehicles added
+    # since the last build are scored online until then
+    if similarity.get_similarity_index() is not None:
+        similarity.load_similarity_index()
+
+    # Remaps the matrix the embedding job rewrote
+    if embedding_store.get_embedding_store() is not None:
+        embedding_store.load_embedding_store()
+        vector_index.load_vector_index()
+
+    logger.info("Reloaded vehicle data caches")
+
+
+class ReloadListener(threading.Thread):
+    """Background LISTEN loop calling reload_data() on each notification burst"""
+
+    def __init__(self, dsn: str = settings.DATABASE_URL):
+        super().__init__(name="data-reload-listener", daemon=True)
+        self.dsn = dsn
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                conn.cursor().execute(f"LISTEN {RELOAD_CHANNEL}")
+                logger.info(f"Listening for {RELOAD_CHANNEL} notifications")
+
+                while not self._stop_event.is_set():
+                    if select.select([conn], [], [], POLL_INTERVAL) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        # One reload covers any number of queued notifications
+                        conn.notifies.clear()
+                        try:
+                            reload_data()
+                        except Exception as e:
+                            logger.error(f"Data reload failed: {e}")
+            except psycopg2.Error as e:
+                logger.warning(f"Reload listener connection lost, retrying in {RECONNECT_DELAY:.0f}s: {e}")
+                self._stop_event.wait(RECONNECT_DELAY)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+_listener: Optional[ReloadListener] = None
+
+
+def start_listener() -> None:
+    global _listener
+    if _listener is None:
+        _listener = ReloadListener()
+        _listener.start()
+
+
+def stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
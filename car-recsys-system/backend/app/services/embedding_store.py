@@ -0,0 +1,262 @@
+"""
+Vehicle embedding store.
+
+Embeddings live in MODEL_DIR/embeddings/ as one L2-normalized float32 (or
+float16) matrix, vehicles.npy, next to vehicles.json holding the row ->
+vehicle_id map and the model that produced them. The matrix is opened with
+mmap_mode='r', so loading is zero-copy and every uvicorn worker on a host
+shares the same page-cache pages.
+
+Search is exact cosine similarity: blocked matrix products against the
+queries, an argpartition per block and a merge of the survivors, with an
+optional boolean pre-filter mask built from the structured search filters.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, List, Optional, Sequence, Tuple
+import json
+import logging
+import os
+import time
+import numpy as np
+
+from app.core.config import settings
+from app.schemas.vehicle import VehicleSearchRequest
+from app.services.catalog import get_catalog
+from app.services.similarity import top_k
+from app.services.vehicle_search import build_where_clause, get_table_name
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = 'vehicles.npy'
+IDS_FILE = 'vehicles.json'
+
+# Rows per matrix product; float16 blocks are upcast to float32 one block at a time
+BLOCK_ROWS = 65536
+
+# Filtered searches matching at most this many rows skip the approximate index
+EXACT_FILTER_MAX_ROWS = 50_000
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def exact_search(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    mask: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (rows, scores) of the k most similar vectors for each query row, best
+    first; rows outside `mask` are never scored. Fewer than k matches leave
+    -1 rows with -inf scores at the end.
+    """
+    queries = normalize_rows(np.atleast_2d(queries)).T
+    best_rows = np.full((queries.shape[1], 0), -1, dtype=np.int64)
+    best_scores = np.zeros((queries.shape[1], 0), dtype=np.float32)
+
+    for start in range(0, len(vectors), BLOCK_ROWS):
+        stop = min(start + BLOCK_ROWS, len(vectors))
+        if mask is None:
+            rows = np.arange(start, stop)
+            block = vectors[start:stop]
+        else:
+            rows = start + np.flatnonzero(mask[start:stop])
+            if not len(rows):
+                continue
+            block = vectors[rows]
+        scores = (np.asarray(block, dtype=np.float32) @ queries).T
+        columns, values = top_k(scores, k)
+
+        best_rows = np.concatenate([best_rows, rows[columns]], axis=1)
+        best_scores = np.concatenate([best_scores, values], axis=1)
+        if best_rows.shape[1] > k:
+            columns, best_scores = top_k(best_scores, k)
+            best_rows = np.take_along_axis(best_rows, columns, axis=1)
+
+    missing = k - best_rows.shape[1]
+    if missing > 0:
+        best_rows = np.pad(best_rows, ((0, 0), (0, missing)), constant_values=-1)
+        best_scores = np.pad(best_scores, ((0, 0), (0, missing)), constant_values=-np.inf)
+    return best_rows, best_scores
+
+
+def write_embeddings(
+    directory: str,
+    ids: Sequence[str],
+    vectors: np.ndarray,
+    model: Optional[str] = None,
+    dtype: str = 'float32'
+) -> None:
+    """
+    Write the store, replacing any previous one. Both files are written
+    under temporary names and renamed into place; processes that still map
+    the old matrix keep reading it until they reload.
+    """
+    if len(ids) != len(vectors):
+        raise ValueError(f"{len(ids)} ids for {len(vectors)} vectors")
+    os.makedirs(directory, exist_ok=True)
+
+    vectors_path = os.path.join(directory, VECTORS_FILE)
+    ids_path = os.path.join(directory, IDS_FILE)
+    with open(vectors_path + '.tmp', 'wb') as f:
+        np.save(f, normalize_rows(vectors).astype(dtype))
+    with open(ids_path + '.tmp', 'w') as f:
+        json.dump({'model': model, 'dtype': dtype, 'ids': list(ids)}, f)
+    os.replace(vectors_path + '.tmp', vectors_path)
+    os.replace(ids_path + '.tmp', ids_path)
+
+
+class EmbeddingStore:
+    """Memory-mapped embedding matrix plus its vehicle_id map"""
+
+    def __init__(self, ids: List[str], vectors: np.ndarray, model: Optional[str] = None):
+        self.ids = ids
+        self.id_to_row = {vehicle_id: i for i, vehicle_id in enumerate(ids)}
+        self.vectors = vectors
+        self.model = model
+        # Store row -> catalog row, rebuilt when the catalog is reloaded
+        self._catalog = None
+        self._catalog_rows: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    @classmethod
+    def load(cls, directory: str) -> "EmbeddingStore":
+        with open(os.path.join(directory, IDS_FILE)) as f:
+            meta = json.load(f)
+        vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode='r')
+        if len(vectors) != len(meta['ids']):
+            raise ValueError(f"{directory}: {len(meta['ids'])} ids for {len(vectors)} vectors")
+        return cls(meta['ids'], vectors, meta.get('model'))
+
+    def vector(self, vehicle_id: str) -> Optional[np.ndarray]:
+        row = self.id_to_row.get(vehicle_id)
+        return None if row is None else np.asarray(self.vectors[row], dtype=np.float32)
+
+    def query_vector(self, weights: Dict[str, float]) -> Optional[np.ndarray]:
+        """Normalized weighted mean of the given vehicles' embeddings; None if none is stored"""
+        rows = [(self.id_to_row[vehicle_id], weight) for vehicle_id, weight in weights.items() if vehicle_id in self.id_to_row]
+        if not rows:
+            return None
+        indices, values = zip(*rows)
+        matrix = np.asarray(self.vectors[np.array(indices)], dtype=np.float32)
+        return normalize_rows(np.asarray(values, dtype=np.float32) @ matrix)
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        return exact_search(self.vectors, queries, k, mask)
+
+    def similar(
+        self,
+        query: np.ndarray,
+        k: int,
+        mask: Optional[np.ndarray] = None,
+        exclude: Sequence[str] = ()
+    ) -> List[Tuple[str, float]]:
+        """(vehicle_id, cosine similarity) of the k best matches of one query vector"""
+        excluded = [self.id_to_row[vehicle_id] for vehicle_id in exclude if vehicle_id in self.id_to_row]
+        if excluded:
+            mask = np.ones(len(self.ids), dtype=bool) if mask is None else mask.copy()
+            mask[excluded] = False
+        rows, scores = self.search(query, k, mask)
+        return [(self.ids[row], float(score)) for row, score in zip(rows[0], scores[0]) if row >= 0]
+
+    def _rows_in_catalog(self, catalog) -> np.ndarray:
+        if self._catalog is not catalog:
+            self._catalog_rows = np.array([catalog.id_to_row.get(vehicle_id, -1) for vehicle_id in self.ids], dtype=np.int64)
+            self._catalog = catalog
+        return self._catalog_rows
+
+    def filter_mask(self, db: Session, search: VehicleSearchRequest) -> np.ndarray:
+        """
+        Stored rows passing the structured filters: the in-memory catalog's
+        mask when it is loaded, otherwise the matching ids from SQL
+        """
+        catalog = get_catalog()
+        if catalog is not None:
+            catalog_rows = self._rows_in_catalog(catalog)
+            catalog_mask = catalog.filter_mask(search)
+            return (catalog_rows >= 0) & catalog_mask[catalog_rows]
+
+        where_clause, params = build_where_clause(search)
+        ids = db.execute(
+            text(f"SELECT v.vehicle_id FROM {get_table_name(search.condition)} v WHERE {where_clause}"),
+            params
+        ).scalars()
+        mask = np.zeros(len(self.ids), dtype=bool)
+        mask[[self.id_to_row[vehicle_id] for vehicle_id in ids if vehicle_id in self.id_to_row]] = True
+        return mask
+
+
+_store: Optional[EmbeddingStore] = None
+
+
+def store_dir() -> str:
+    return os.path.join(settings.MODEL_DIR, 'embeddings')
+
+
+def get_embedding_store() -> Optional[EmbeddingStore]:
+    return _store
+
+
+def load_embedding_store(directory: Optional[str] = None) -> Optional[EmbeddingStore]:
+    """Map the store if the embedding job has written one"""
+    global _store
+    directory = directory or store_dir()
+    if not os.path.exists(os.path.join(directory, IDS_FILE)):
+        logger.info(f"No vehicle embeddings in {directory}")
+        return None
+    start_time = time.time()
+    _store = EmbeddingStore.load(directory)
+    logger.info(f"Mapped vehicle embeddings: {len(_store):,} x {_store.dim} {_store.vectors.dtype} "
+                f"in {time.time() - start_time:.2f}s")
+    return _store
+
+
+def find_similar_by_embedding(
+    db: Session,
+    seeds: Dict[str, float],
+    limit: int,
+    search: Optional[VehicleSearchRequest] = None,
+    exclude: Sequence[str] = ()
+) -> Optional[List[Tuple[str, float]]]:
+    """
+    (vehicle_id, cosine) of the vehicles closest to the weighted mean of the
+    seed embeddings, restricted to `search` filters when given. Seeds are
+    never returned. None when no store is loaded.
+    """
+    store = _store
+    if store is None:
+        return None
+    query = store.query_vector(seeds)
+    if query is None:
+        return []
+    mask = store.filter_mask(db, search) if search is not None else None
+    exclude = [*seeds, *exclude]
+
+    # An approximate backend serves unfiltered and broad searches; a
+    # selective filter leaves few enough rows for the exact scan
+    from app.services.vector_index import ExactIndex, get_vector_index
+    index = get_vector_index()
+    if index is None or isinstance(index, ExactIndex) or (mask is not None and mask.sum() <= EXACT_FILTER_MAX_ROWS):
+        return store.similar(query, limit, mask, exclude=exclude)
+
+    allowed_ids = [store.ids[row] for row in np.flatnonzero(mask)] if mask is not None else None
+    excluded = set(exclude)
+    results = index.search(query, limit + len(excluded), allowed_ids)[0]
+    return [(vehicle_id, score) for vehicle_id, score in results if vehicle_id not in excluded][:limit]
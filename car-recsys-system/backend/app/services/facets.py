@@ -0,0 +1,140 @@
+"""
+Search facets - per-value counts for the current filters in a single pass
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, List, Optional, Tuple
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.schemas.vehicle import FacetValue, SearchFacetsResponse, VehicleSearchRequest
+from app.services.catalog import get_catalog
+from app.services.vehicle_search import build_where_clause, count_cache_key, get_table_name
+
+# Exact-valued facet columns. The vehicle tables have no body_type column,
+# drivetrain is the closest body/segment attribute they carry.
+FACET_COLUMNS = ('brand', 'fuel_type', 'transmission', 'drivetrain')
+
+# Lower edges of the price buckets; bucket i covers [edges[i-1], edges[i])
+PRICE_BUCKET_EDGES = (0, 10000, 20000, 30000, 40000, 50000, 75000, 100000)
+
+PRICE_BUCKET_SQL = f"width_bucket(v.price, ARRAY[{', '.join(str(e) for e in PRICE_BUCKET_EDGES)}]::numeric[])"
+
+_facet_cache = TTLCache(maxsize=settings.SEARCH_COUNT_CACHE_SIZE, ttl=settings.SEARCH_COUNT_CACHE_TTL)
+
+
+def clear_facet_cache() -> None:
+    _facet_cache.clear()
+
+
+def price_bucket_bounds(bucket: int) -> Tuple[Optional[float], Optional[float]]:
+    """(price_min, price_max) of a width_bucket number; None means open-ended"""
+    low = PRICE_BUCKET_EDGES[bucket - 1] if bucket > 0 else None
+    high = PRICE_BUCKET_EDGES[bucket] if bucket < len(PRICE_BUCKET_EDGES) else None
+    return low, high
+
+
+def build_facets_response(
+    total: int,
+    counts: Dict[str, List[Tuple[str, str, int]]],
+    price_counts: Dict[int, int]
+) -> SearchFacetsResponse:
+    """Shape raw (value, label, count) tuples; values ordered by count, then value"""
+    facets = {}
+    for column in FACET_COLUMNS:
+        entries = sorted(counts.get(column, []), key=lambda e: (-e[2], e[0]))
+        facets[column] = [FacetValue(value=value, label=label, count=count) for value, label, count in entries]
+
+    price_facet = []
+    for bucket in sorted(price_counts):
+        low, high = price_bucket_bounds(bucket)
+        price_facet.append(FacetValue(
+            value=f"{int(low) if low is not None else ''}-{int(high) if high is not None else ''}",
+            count=price_counts[bucket],
+            price_min=low,
+            price_max=high
+        ))
+    facets['price'] = price_facet
+
+    return SearchFacetsResponse(total=total, facets=facets)
+
+
+def build_facets_sql(table_name: str, where_clause: str) -> str:
+    """One GROUPING SETS query returning every facet histogram plus the total"""
+    facet_case = []
+    value_case = []
+    grouping_sets = []
+    for column in FACET_COLUMNS:
+        key = f"lower(v.{column})"
+        facet_case.append(f"WHEN GROUPING({key}) = 0 THEN '{column}'")
+        value_case.append(f"WHEN GROUPING({key}) = 0 THEN {key}")
+        grouping_sets.append(f"({key})")
+
+    facet_case.append(f"WHEN GROUPING({PRICE_BUCKET_SQL}) = 0 THEN 'price'")
+    value_case.append(f"WHEN GROUPING({PRICE_BUCKET_SQL}) = 0 THEN {PRICE_BUCKET_SQL}::text")
+    grouping_sets.append(f"({PRICE_BUCKET_SQL})")
+    grouping_sets.append("()")
+
+    label_case = [
+        f"WHEN GROUPING(lower(v.{column})) = 0 THEN MIN(v.{column})" for column in FACET_COLUMNS
+    ]
+
+    return f"""
+        SELECT
+            CASE {' '.join(facet_case)} ELSE 'total' END AS facet,
+            CASE {' '.join(value_case)} END AS value,
+            CASE {' '.join(label_case)} END AS label,
+            COUNT(*) AS count
+        FROM {table_name} v
+        WHERE {where_clause}
+        GROUP BY GROUPING SETS ({', '.join(grouping_sets)})
+    """
+
+
+def compute_facets_sql(db: Session, search: VehicleSearchRequest) -> SearchFacetsResponse:
+    table_name = get_table_name(search.condition)
+    where_clause, params = build_where_clause(search)
+
+    total = 0
+    counts: Dict[str, List[Tuple[str, str, int]]] = {}
+    price_counts: Dict[int, int] = {}
+    for row in db.execute(text(build_facets_sql(table_name, where_clause)), params):
+        if row.facet == 'total':
+            total = row.count
+        elif row.value is None:
+            continue
+        elif row.facet == 'price':
+            price_counts[int(row.value)] = row.count
+        else:
+            counts.setdefault(row.facet, []).append((row.value, row.label, row.count))
+
+    return build_facets_response(total, counts, price_counts)
+
+
+def compute_facets(db: Session, search: VehicleSearchRequest) -> SearchFacetsResponse:
+    """
+    Facet histograms for the search filters, from the in-memory catalog when
+    selected and loaded, otherwise from one grouped SQL query. Cached by the
+    normalized filter key and the engine that answered, so the two engines'
+    counts never stand in for each other.
+    """
+    engine = search.engine or settings.SEARCH_ENGINE
+    catalog = get_catalog() if engine == 'memory' else None
+
+    table_name = get_table_name(search.condition)
+    where_clause, params = build_where_clause(search)
+    served_by = 'memory' if catalog is not None else 'sql'
+    cache_key = count_cache_key(table_name, where_clause, params, f'facets:{served_by}')
+
+    cached = _facet_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if catalog is not None:
+        total, counts, price_counts = catalog.facet_counts(search, FACET_COLUMNS, PRICE_BUCKET_EDGES)
+        response = build_facets_response(total, counts, price_counts)
+    else:
+        response = compute_facets_sql(db, search)
+
+    _facet_cache.set(cache_key, response)
+    return response
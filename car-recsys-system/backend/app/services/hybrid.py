@@ -0,0 +1,275 @@
+"""
+Hybrid recommendations: a staged pipeline.
+
+1. seeds     - explicit vehicle ids, else the user's most heavily
+               interacted vehicles, as /reco/candidate seeds
+2. retrieve  - co-occurrence, ALS, embedding similarity and popularity
+               candidates, concurrently on a thread pool; a source that misses
+               HYBRID_RETRIEVAL_BUDGET_MS is left out of this response
+3. fuse      - reciprocal rank fusion (default) or weighted fusion of
+               min-max normalized scores, with per-source weights
+4. rerank    - with a text query, the cross-encoder reorders the head of
+               the fused list within RERANK_BUDGET_MS
+5. hydrate   - listings of the final top-k
+
+Every stage, and every source, reports its wall time in milliseconds. A
+signed-in user's default feed skips stages 1-3 when the per-user cache
+(reco_cache) holds their ranking. Database reads run on the threadpool so
+the event loop never waits on Postgres.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import time
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services import als, cooccurrence, embedding_store, popularity
+from app.services.listings import fetch_listings
+from app.services.reco_cache import Ranking, reco_cache
+from app.services.reranker import candidate_text, reranker
+
+logger = logging.getLogger(__name__)
+
+# Relative trust in each source; popularity mostly fills cold and sparse users
+SOURCE_WEIGHTS = {
+    'cooccurrence': 1.0,
+    'als': 1.0,
+    'embedding': 1.0,
+    'popularity': 0.3,
+}
+
+# Reciprocal rank fusion constant; damps the lead of the very first ranks
+RRF_K = 60
+
+# Fused candidates handed to the cross-encoder when a query is given
+RERANK_DEPTH = 50
+
+# Retrievers are in-memory lookups; the pool bounds concurrent requests' threads
+_retrieval_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hybrid-retrieval")
+
+Ranked = List[Tuple[str, float]]
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+def _retrieve_cooccurrence(db: Session, seeds: Dict[str, float], exclude: Sequence[str], n: int) -> Optional[Ranked]:
+    index = cooccurrence.get_cooccurrence_index()
+    if index is None:
+        return None
+    return index.candidates(seeds, n, exclude=exclude) if seeds else []
+
+
+def _retrieve_als(db: Session, seeds: Dict[str, float], exclude: Sequence[str], n: int) -> Optional[Ranked]:
+    model = als.get_als_model()
+    if model is None:
+        return None
+    return model.candidates(seeds, n, exclude=exclude) if seeds else []
+
+
+def _retrieve_embedding(db: Session, seeds: Dict[str, float], exclude: Sequence[str], n: int) -> Optional[Ranked]:
+    # No structured filters, so the session is never used from this thread
+    return embedding_store.find_similar_by_embedding(db, seeds, n, exclude=exclude) if seeds else []
+
+
+def _retrieve_popularity(db: Session, seeds: Dict[str, float], exclude: Sequence[str], n: int) -> Optional[Ranked]:
+    return popularity.popular_vehicles(n, exclude=[*seeds, *exclude])
+
+
+RETRIEVERS: Dict[str, Callable[[Session, Dict[str, float], Sequence[str], int], Optional[Ranked]]] = {
+    'cooccurrence': _retrieve_cooccurrence,
+    'als': _retrieve_als,
+    'embedding': _retrieve_embedding,
+    'popularity': _retrieve_popularity,
+}
+
+
+def _timed(retriever, *args) -> Tuple[Optional[Ranked], float]:
+    start = time.perf_counter()
+    return retriever(*args), _elapsed_ms(start)
+
+
+def rrf_fuse(ranked: Dict[str, Ranked], weights: Dict[str, float], k: int = RRF_K) -> Dict[str, float]:
+    """Σ weight / (k + rank) over the sources listing each vehicle"""
+    fused: Dict[str, float] = {}
+    for source, results in ranked.items():
+        weight = weights.get(source, 1.0)
+        for rank, (vehicle_id, _) in enumerate(results, start=1):
+            fused[vehicle_id] = fused.get(vehicle_id, 0.0) + weight / (k + rank)
+    return fused
+
+
+def weighted_fuse(ranked: Dict[str, Ranked], weights: Dict[str, float]) -> Dict[str, float]:
+    """Σ weight * score, each source's scores min-max scaled to [0, 1]"""
+    fused: Dict[str, float] = {}
+    for source, results in ranked.items():
+        if not results:
+            continue
+        weight = weights.get(source, 1.0)
+        scores = [score for _, score in results]
+        low, high = min(scores), max(scores)
+        for vehicle_id, score in results:
+            scaled = (score - low) / (high - low) if high > low else 1.0
+            fused[vehicle_id] = fused.get(vehicle_id, 0.0) + weight * scaled
+    return fused
+
+
+async def rank(
+    db: Session,
+    user_id: Optional[str] = None,
+    vehicle_ids: Optional[Sequence[str]] = None,
+    fusion: str = 'rrf',
+    timings: Optional[Dict[str, float]] = None
+) -> Tuple[List[str], Ranking, Dict[str, Dict[str, Any]]]:
+    """
+    Stages 1-3: (seeds, fused [(vehicle_id, score, sources)] best first, and
+    per-source status), recording stage timings into `timings`
+    """
+    timings = {} if timings is None else timings
+
+    # 1. Seeds
+    stage = time.perf_counter()
+    history = await run_in_threadpool(cooccurrence.user_history, db, user_id) if user_id else {}
+    if vehicle_ids:
+        seeds = dict.fromkeys(vehicle_ids, 1.0)
+    else:
+        seeds = {vehicle_id: float(cooccurrence.damp(weight)) for vehicle_id, weight in list(history.items())[:cooccurrence.MAX_SEEDS]}
+    exclude = list(history)
+    timings['seeds'] = _elapsed_ms(stage)
+
+    # 2. Candidates from every source at once, within the budget
+    stage = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    futures = {
+        loop.run_in_executor(_retrieval_executor, _timed, retriever, db, seeds, exclude, settings.CANDIDATE_SIZE): source
+        for source, retriever in RETRIEVERS.items()
+    }
+    done, _ = await asyncio.wait(futures, timeout=settings.HYBRID_RETRIEVAL_BUDGET_MS / 1000)
+    ranked: Dict[str, Ranked] = {}
+    sources: Dict[str, Dict[str, Any]] = {}
+    for future, source in futures.items():
+        if future not in done:
+            # Left running; its result is dropped when it finishes
+            sources[source] = {'status': 'timeout', 'count': 0}
+            continue
+        try:
+            results, took_ms = future.result()
+        except Exception as e:
+            logger.error(f"Hybrid source {source} failed: {e}")
+            sources[source] = {'status': 'error', 'count': 0}
+            continue
+        timings[f'retrieve.{source}'] = took_ms
+        if results is None:
+            sources[source] = {'status': 'unavailable', 'count': 0}
+        else:
+            ranked[source] = results
+            sources[source] = {'status': 'ok', 'count': len(results)}
+    timings['retrieve'] = _elapsed_ms(stage)
+
+    # 3. Fusion
+    stage = time.perf_counter()
+    fused = (weighted_fuse if fusion == 'weighted' else rrf_fuse)(ranked, SOURCE_WEIGHTS)
+    contributors: Dict[str, List[str]] = {}
+    for source, results in ranked.items():
+        for vehicle_id, _ in results:
+            contributors.setdefault(vehicle_id, []).append(source)
+    order = sorted(fused, key=lambda vehicle_id: -fused[vehicle_id])[:settings.CANDIDATE_SIZE]
+    ranking = [(vehicle_id, fused[vehicle_id], contributors[vehicle_id]) for vehicle_id in order]
+    timings['fuse'] = _elapsed_ms(stage)
+
+    return list(seeds), ranking, sources
+
+
+async def refresh_user(user_id: str) -> None:
+    """Recompute a user's cached ranking on a session of its own"""
+    db = SessionLocal()
+    try:
+        seeds, ranking, _ = await rank(db, user_id)
+    finally:
+        await run_in_threadpool(db.close)
+    reco_cache.set(user_id, seeds, ranking)
+
+
+async def recommend(
+    db: Session,
+    limit: int,
+    user_id: Optional[str] = None,
+    vehicle_ids: Optional[Sequence[str]] = None,
+    query: Optional[str] = None,
+    fusion: str = 'rrf'
+) -> Dict[str, Any]:
+    """
+    Top-`limit` listings with their fused score, contributing sources and
+    stage timings. A user's default feed (no seeds, RRF) comes from the
+    per-user cache, stale-while-revalidate.
+    """
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    cache_state = None
+    sources: Dict[str, Dict[str, Any]] = {}
+
+    if user_id and not vehicle_ids and fusion == 'rrf' and settings.RECO_CACHE_ENABLED:
+        stage = time.perf_counter()
+        cached = reco_cache.get(user_id)
+        timings['cache'] = _elapsed_ms(stage)
+        if cached is not None:
+            seeds, ranking, cache_state = cached
+            if cache_state == 'stale':
+                reco_cache.revalidate(user_id, refresh_user)
+        else:
+            cache_state = 'miss'
+            seeds, ranking, sources = await rank(db, user_id, timings=timings)
+            reco_cache.set(user_id, seeds, ranking)
+    else:
+        seeds, ranking, sources = await rank(db, user_id, vehicle_ids, fusion, timings)
+
+    order = [vehicle_id for vehicle_id, _, _ in ranking]
+    entries = {vehicle_id: (score, contributors) for vehicle_id, score, contributors in ranking}
+
+    # 4. Cross-encoder over the head of the fused list
+    rerank_scores: Dict[str, Optional[float]] = {}
+    reranked = False
+    found: Dict[str, Dict[str, Any]] = {}
+    if query and order:
+        stage = time.perf_counter()
+        head = order[:max(limit, RERANK_DEPTH)]
+        found = await run_in_threadpool(fetch_listings, db, head)
+        candidates = [(vehicle_id, candidate_text(found[vehicle_id])) for vehicle_id in head if vehicle_id in found]
+        results, reranked = await reranker.arerank(query, candidates, settings.RERANK_BUDGET_MS / 1000)
+        if reranked:
+            rerank_scores = dict(results)
+            order = [vehicle_id for vehicle_id, _ in results] + order[len(head):]
+        timings['rerank'] = _elapsed_ms(stage)
+
+    # 5. Listings of the final top-k
+    stage = time.perf_counter()
+    top = order[:limit]
+    missing = [vehicle_id for vehicle_id in top if vehicle_id not in found]
+    if missing:
+        found.update(await run_in_threadpool(fetch_listings, db, missing))
+    results = [
+        {
+            'vehicle': found[vehicle_id],
+            'score': entries[vehicle_id][0],
+            'rerank_score': rerank_scores.get(vehicle_id),
+            'sources': entries[vehicle_id][1]
+        }
+        for vehicle_id in top if vehicle_id in found
+    ]
+    timings['hydrate'] = _elapsed_ms(stage)
+    timings['total'] = _elapsed_ms(started)
+
+    return {
+        'seeds': seeds,
+        'fusion': fusion,
+        'reranked': reranked,
+        'cache': cache_state,
+        'results': results,
+        'sources': sources,
+        'timings': timings
+    }
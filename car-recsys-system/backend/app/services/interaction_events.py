@@ -0,0 +1,30 @@
+"""
+Fan-out of a stored interaction to the in-memory signals built from it
+"""
+from typing import Optional
+
+from fastapi import BackgroundTasks
+
+from app.services import cooccurrence, popularity, reco_cache
+
+
+def schedule_interaction_updates(
+    background_tasks: BackgroundTasks,
+    user_id: str,
+    vehicle_id: str,
+    interaction_type: Optional[str],
+    interaction_score: Optional[float]
+) -> None:
+    """
+    Fold a committed interaction into the co-occurrence table, popularity
+    counters and recommendation cache after the response is sent
+    """
+    background_tasks.add_task(
+        cooccurrence.record_interaction, user_id, vehicle_id, interaction_type, interaction_score
+    )
+    background_tasks.add_task(
+        popularity.record_event, vehicle_id, interaction_type, interaction_score
+    )
+    background_tasks.add_task(
+        reco_cache.record_signal, user_id, vehicle_id, interaction_type, interaction_score
+    )
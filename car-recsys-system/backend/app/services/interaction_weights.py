@@ -0,0 +1,26 @@
+"""
+Interaction weights shared by every signal built from user interactions:
+popularity counters, co-occurrence, ALS, session windows, the
+recommendation cache and typeahead ranking.
+"""
+from typing import Optional
+
+# Relative weight of each interaction type in listing popularity
+INTERACTION_TYPE_WEIGHTS = {
+    'view': 1.0,
+    'click': 1.0,
+    'compare': 2.0,
+    'favorite': 3.0,
+    'contact': 5.0,
+}
+
+# One interaction row's weight: its score times the weight of its type
+INTERACTION_WEIGHT_SQL = f"""COALESCE(interaction_score, 1) * CASE interaction_type
+    {' '.join(f"WHEN '{t}' THEN {w}" for t, w in INTERACTION_TYPE_WEIGHTS.items())}
+    ELSE 1 END"""
+
+
+def interaction_weight(interaction_type: Optional[str], interaction_score: Optional[float]) -> float:
+    """Python twin of INTERACTION_WEIGHT_SQL"""
+    score = 1.0 if interaction_score is None else float(interaction_score)
+    return score * INTERACTION_TYPE_WEIGHTS.get(interaction_type, 1.0)
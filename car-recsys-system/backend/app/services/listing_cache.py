@@ -0,0 +1,109 @@
+"""
+Listing detail cache.
+
+Serialized VehicleResponse payloads with their strong ETag, kept in a
+bounded in-process LRU+TTL cache and optionally in Redis as a second tier
+shared by all API workers.
+"""
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import logging
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+try:
+    import redis
+except ImportError:  # optional second tier
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "listing:"
+
+def make_etag(body: bytes) -> str:
+    """
+    Strong ETag from the serialized listing itself. The vehicle tables carry
+    no reliable last-modified column, and hashing the body also changes the
+    tag when the response shape does.
+    """
+    return f'"{hashlib.sha1(body).hexdigest()[:24]}"'
+
+
+class ListingCache:
+    """
+    vehicle_id -> (etag, JSON body, listing dict). The local tier keeps the
+    parsed dict too, so batch lookups can reuse entries without decoding.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, redis_url: Optional[str] = None):
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.redis = None
+        if redis_url:
+            if redis is None:
+                logger.warning("LISTING_CACHE_REDIS is set but the redis package is not installed")
+            else:
+                self.redis = redis.Redis.from_url(redis_url, socket_timeout=0.05, socket_connect_timeout=0.2)
+
+    def get(self, vehicle_id: str) -> Optional[Tuple[str, bytes, Optional[Dict[str, Any]]]]:
+        entry = self.local.get(vehicle_id)
+        if entry is not None or self.redis is None:
+            return entry
+
+        try:
+            value = self.redis.get(REDIS_KEY_PREFIX + vehicle_id)
+        except redis.RedisError as e:
+            logger.warning(f"Listing cache Redis read failed: {e}")
+            return None
+        if value is None:
+            return None
+
+        etag, _, body = value.partition(b'\n')
+        entry = (etag.decode(), body, None)
+        self.local.set(vehicle_id, entry)
+        return entry
+
+    def get_listing(self, vehicle_id: str) -> Optional[Dict[str, Any]]:
+        """Parsed listing from the local tier only; None on a miss"""
+        entry = self.local.get(vehicle_id)
+        return entry[2] if entry is not None else None
+
+    def set(self, vehicle_id: str, etag: str, body: bytes, listing: Dict[str, Any]) -> None:
+        self.local.set(vehicle_id, (etag, body, listing))
+        if self.redis is not None:
+            try:
+                self.redis.set(REDIS_KEY_PREFIX + vehicle_id, etag.encode() + b'\n' + body, ex=int(self.ttl))
+            except redis.RedisError as e:
+                logger.warning(f"Listing cache Redis write failed: {e}")
+
+    def invalidate(self, vehicle_id: Optional[str] = None) -> None:
+        """Drop one listing, or every listing when no id is given"""
+        if vehicle_id is not None:
+            self.local.delete(vehicle_id)
+        else:
+            self.local.clear()
+
+        if self.redis is None:
+            return
+        try:
+            if vehicle_id is not None:
+                self.redis.delete(REDIS_KEY_PREFIX + vehicle_id)
+            else:
+                keys = []
+                for key in self.redis.scan_iter(match=REDIS_KEY_PREFIX + '*', count=1000):
+                    keys.append(key)
+                    if len(keys) >= 1000:
+                        self.redis.unlink(*keys)
+                        keys = []
+                if keys:
+                    self.redis.unlink(*keys)
+        except redis.RedisError as e:
+            logger.warning(f"Listing cache Redis invalidation failed: {e}")
+
+
+listing_cache = ListingCache(
+    maxsize=settings.LISTING_CACHE_SIZE,
+    ttl=settings.CACHE_TTL,
+    redis_url=settings.REDIS_URL if settings.LISTING_CACHE_REDIS else None
+)
@@ -0,0 +1,240 @@
+"""
+Listing lookups by vehicle_id
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from decimal import Decimal
+import orjson
+
+from app.core.config import settings
+from app.services import popularity, similarity
+from app.services.catalog import get_catalog
+from app.services.listing_cache import listing_cache, make_etag
+from app.services.vehicle_search import VEHICLE_ROWS_SQL, VEHICLE_SELECT, rows_to_dicts
+
+# Both vehicle tables; = ANY pushes down into each UNION ALL branch's primary key
+LISTINGS_BY_ID_SQL = f"""
+    SELECT {VEHICLE_SELECT}
+    FROM {VEHICLE_ROWS_SQL} v
+    WHERE v.vehicle_id = ANY(:ids)
+"""
+
+# One listing from either table; its ETag is a hash of the serialized row
+LISTING_DETAIL_SQL = f"""
+    SELECT {VEHICLE_SELECT}
+    FROM {VEHICLE_ROWS_SQL} v
+    WHERE v.vehicle_id = :vehicle_id
+    LIMIT 1
+"""
+
+
+# Columns the detail page shows beyond VehicleResponse; same in both tables
+SPEC_COLUMNS = (
+    'condition', 'stock_number', 'vin', 'drivetrain', 'engine', 'mpg', 'exterior_color', 'interior_color',
+    'accidents_damage', 'one_owner', 'personal_use_only', 'warranty', 'car_rating', 'percentage_recommend',
+    'comfort_rating', 'interior_rating', 'performance_rating', 'value_rating', 'exterior_rating',
+    'reliability_rating', 'car_review_link', 'total_images'
+)
+
+# Everything around one listing in a single statement: each nested list is a
+# capped, index-ordered json_agg subquery (database/migrations/002-listing-detail-indexes.sql)
+LISTING_RELATED_SQL = f"""
+    SELECT
+        (SELECT row_to_json(s) FROM (
+            SELECT {', '.join(SPEC_COLUMNS)} FROM raw.used_vehicles WHERE vehicle_id = :vehicle_id
+            UNION ALL
+            SELECT {', '.join(SPEC_COLUMNS)} FROM raw.new_vehicles WHERE vehicle_id = :vehicle_id
+            LIMIT 1
+        ) s) AS specs,
+        (SELECT COALESCE(json_agg(i), '[]'::json) FROM (
+            SELECT image_order, image_url
+            FROM raw.vehicle_images
+            WHERE vehicle_id = :vehicle_id
+            ORDER BY image_order NULLS LAST
+            LIMIT :max_images
+        ) i) AS images,
+        (SELECT COUNT(*) FROM raw.vehicle_images WHERE vehicle_id = :vehicle_id) AS image_count,
+        (SELECT COALESCE(json_agg(f), '[]'::json) FROM (
+            SELECT feature_category AS category, feature_name AS name
+            FROM raw.vehicle_features
+            WHERE vehicle_id = :vehicle_id
+            ORDER BY feature_category NULLS LAST
+            LIMIT :max_features
+        ) f) AS features,
+        (SELECT COUNT(*) FROM raw.vehicle_features WHERE vehicle_id = :vehicle_id) AS feature_count,
+        (SELECT COALESCE(json_agg(r), '[]'::json) FROM (
+            SELECT title, overall_rating, review_time, user_name, user_location, review_text
+            FROM raw.reviews_ratings
+            WHERE vehicle_id = :vehicle_id
+            ORDER BY id DESC
+            LIMIT :max_reviews
+        ) r) AS reviews,
+        (SELECT COUNT(*) FROM raw.reviews_ratings WHERE vehicle_id = :vehicle_id) AS review_count,
+        (SELECT ROUND(AVG(overall_rating)::numeric, 2)::float8 FROM raw.reviews_ratings WHERE vehicle_id = :vehicle_id) AS average_rating,
+        (SELECT row_to_json(s) FROM (
+            SELECT s.seller_key, s.seller_name, s.seller_link, s.phone_new, s.phone_used, s.destination,
+                   s.sales_hours, s.seller_rating, s.seller_rating_count, r.price, r.stock_number
+            FROM raw.seller_vehicle_relationships r
+            JOIN raw.sellers s ON s.seller_key = r.seller_key
+            WHERE r.vehicle_id = :vehicle_id
+            ORDER BY r.id
+            LIMIT 1
+        ) s) AS seller
+"""
+
+
+def fetch_listings(db: Session, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    VehicleResponse-shaped dicts keyed by vehicle_id for the ids that exist.
+    Reads through the listing cache, then the in-memory catalog when loaded,
+    otherwise one query for all remaining ids.
+    """
+    found = {}
+    for vehicle_id in ids:
+        listing = listing_cache.get_listing(vehicle_id)
+        if listing is not None:
+            found[vehicle_id] = listing
+
+    missing = [vehicle_id for vehicle_id in ids if vehicle_id not in found]
+    if not missing:
+        return found
+
+    catalog = get_catalog()
+    if catalog is not None:
+        rows = [catalog.id_to_row[vehicle_id] for vehicle_id in missing if vehicle_id in catalog.id_to_row]
+        found.update((listing['id'], listing) for listing in catalog.rows_to_dicts(rows))
+        return found
+
+    rows = db.execute(text(LISTINGS_BY_ID_SQL), {'ids': missing})
+    found.update((listing['id'], listing) for listing in rows_to_dicts(rows))
+    return found
+
+
+def _load_listing(db: Session, vehicle_id: str) -> Optional[Tuple[str, bytes, Optional[Dict[str, Any]]]]:
+    """Cache entry (etag, body, listing) for one listing, filled from the database on a miss"""
+    cached = listing_cache.get(vehicle_id)
+    if cached is not None:
+        return cached
+
+    row = db.execute(text(LISTING_DETAIL_SQL), {'vehicle_id': vehicle_id}).first()
+    if row is None:
+        return None
+
+    listing = rows_to_dicts([row])[0]
+    body = orjson.dumps(listing)
+    etag = make_etag(body)
+    listing_cache.set(vehicle_id, etag, body, listing)
+    return etag, body, listing
+
+
+def get_listing_detail(db: Session, vehicle_id: str) -> Optional[Tuple[str, bytes]]:
+    """(ETag, serialized VehicleResponse) for one listing, cached; None if it does not exist"""
+    entry = _load_listing(db, vehicle_id)
+    return entry[:2] if entry is not None else None
+
+
+def get_listings_batch(db: Session, ids: Sequence[str]) -> Dict[str, List]:
+    """Listings in requested order (duplicates dropped) plus the ids not found"""
+    ids = list(dict.fromkeys(ids))
+    found = fetch_listings(db, ids)
+    return {
+        'results': [found[vehicle_id] for vehicle_id in ids if vehicle_id in found],
+        'missing': [vehicle_id for vehicle_id in ids if vehicle_id not in found]
+    }
+
+
+def similar_listings_by_price(db: Session, vehicle_id: str, limit: int) -> Optional[List[Tuple[Dict[str, Any], Optional[float]]]]:
+    """
+    Fallback before the neighbor table exists: same brand within ±30% of
+    the price, closest price first
+    """
+    # Get the reference vehicle
+    vehicle = db.execute(
+        text("SELECT brand, price FROM raw.used_vehicles WHERE vehicle_id = :vehicle_id"),
+        {'vehicle_id': vehicle_id}
+    ).first()
+
+    if not vehicle:
+        return None
+
+    # Find similar vehicles
+    conditions = ["v.vehicle_id != :vehicle_id"]
+    params = {'vehicle_id': vehicle_id, 'limit': limit}
+    order_by = "v.vehicle_id"
+
+    # Same brand
+    if vehicle.brand:
+        conditions.append("v.brand = :brand")
+        params['brand'] = vehicle.brand
+
+    # Similar price range (±30%)
+    if vehicle.price:
+        conditions.append("v.price BETWEEN :price_min AND :price_max")
+        params['price_min'] = vehicle.price * Decimal('0.7')
+        params['price_max'] = vehicle.price * Decimal('1.3')
+        params['price'] = vehicle.price
+        order_by = "abs(v.price - :price), v.vehicle_id"
+
+    rows = db.execute(text(f"""
+        SELECT {VEHICLE_SELECT}
+        FROM raw.used_vehicles v
+        WHERE {' AND '.join(conditions)}
+        ORDER BY {order_by}
+        LIMIT :limit
+    """), params)
+
+    return [(listing, None) for listing in rows_to_dicts(rows)]
+
+
+def similar_listings(db: Session, vehicle_id: str, limit: int) -> Optional[List[Tuple[Dict[str, Any], Optional[float]]]]:
+    """
+    (listing, similarity) pairs, most similar first, from the precomputed
+    kNN table; None when the vehicle does not exist
+    """
+    if similarity.get_similarity_index() is None:
+        return similar_listings_by_price(db, vehicle_id, limit)
+
+    neighbors = similarity.find_similar(db, vehicle_id, limit)
+    if neighbors is None:
+        return None
+
+    found = fetch_listings(db, [neighbor_id for neighbor_id, _ in neighbors])
+    return [(found[neighbor_id], score) for neighbor_id, score in neighbors if neighbor_id in found]
+
+
+def popular_listings(
+    db: Session,
+    limit: int,
+    brand: Optional[str] = None,
+    segment: Optional[str] = None
+) -> Optional[List[Tuple[Dict[str, Any], float]]]:
+    """(listing, decayed popularity) pairs, most popular first; None when popularity is not loaded"""
+    popular = popularity.popular_vehicles(limit, brand, segment)
+    if popular is None:
+        return None
+    found = fetch_listings(db, [vehicle_id for vehicle_id, _ in popular])
+    return [(found[vehicle_id], score) for vehicle_id, score in popular if vehicle_id in found]
+
+
+def get_listing_full(db: Session, vehicle_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Listing plus specs, images, features, reviews and seller in two queries
+    (one when the listing is cached); None if it does not exist
+    """
+    entry = _load_listing(db, vehicle_id)
+    if entry is None:
+        return None
+    _, body, listing = entry
+    if listing is None:
+        # Entry came from the Redis tier, which keeps only the serialized body
+        listing = orjson.loads(body)
+
+    related = db.execute(text(LISTING_RELATED_SQL), {
+        'vehicle_id': vehicle_id,
+        'max_images': settings.LISTING_MAX_IMAGES,
+        'max_features': settings.LISTING_MAX_FEATURES,
+        'max_reviews': settings.LISTING_MAX_REVIEWS
+    }).first()
+
+    return {'vehicle': listing, **related._mapping}
@@ -0,0 +1,481 @@
+"""
+Time-decayed vehicle popularity.
+
+Every vehicle carries exponentially decayed counters (views, favorites,
+contacts) and a decayed popularity score, the interaction weights of
+interaction_weights.INTERACTION_TYPE_WEIGHTS summed with a half-life of
+POPULARITY_HALF_LIFE_HOURS. Values are kept scaled to a fixed epoch,
+value * exp(rate * (t - epoch)), so decay never touches the stored numbers:
+an event adds its weight at the current scale and every other vehicle keeps
+its rank. A sorted top list per scope (global, per brand, per segment) moves
+a vehicle up in place when its score grows, and a top-N read is a slice.
+Scores can also drop (a sync from the table, a negative interaction score);
+the lists are then rebuilt from the counters, since a vehicle cut from a
+full list may belong back in it.
+
+Events arrive through record_event(). A flush thread adds each process's
+pending deltas to gold.vehicle_popularity (stored as of updated_at) and
+pulls the rows other workers changed, so all processes converge on the
+same counters.
+"""
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+import math
+import threading
+import time
+import numpy as np
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.interaction_weights import INTERACTION_WEIGHT_SQL, interaction_weight
+from app.services.vehicle_search import normalize_facet
+
+logger = logging.getLogger(__name__)
+
+# Decayed counter columns, and the interaction types each one counts
+COUNTERS = ('views', 'favorites', 'contacts')
+COUNTER_TYPES = {'view': 0, 'click': 0, 'favorite': 1, 'contact': 2}
+
+# Vehicles ranked per scope; deeper pages of "popular" are never requested
+TOP_CAPACITY = 1000
+
+# Rebase the scale once exp(rate * (t - epoch)) grows past e**REBASE_EXPONENT
+REBASE_EXPONENT = 300.0
+
+# Brand and segment of every vehicle. The vehicle tables have no body type,
+# so drivetrain is the segment, as in the search facets.
+VEHICLES_SQL = """
+    SELECT vehicle_id, brand, drivetrain FROM raw.used_vehicles
+    UNION ALL
+    SELECT vehicle_id, brand, drivetrain FROM raw.new_vehicles
+"""
+
+VEHICLE_SQL = """
+    SELECT brand, drivetrain FROM raw.used_vehicles WHERE vehicle_id = :vehicle_id
+    UNION ALL
+    SELECT brand, drivetrain FROM raw.new_vehicles WHERE vehicle_id = :vehicle_id
+    LIMIT 1
+"""
+
+STORED_SQL = """
+    SELECT vehicle_id, views, favorites, contacts, score, EXTRACT(EPOCH FROM updated_at)::float8 AS updated_at
+    FROM gold.vehicle_popularity
+"""
+
+# Decayed counters recomputed from the interaction log, for an empty table
+BOOTSTRAP_SQL = f"""
+    SELECT vehicle_id,
+           SUM(CASE WHEN interaction_type IN ('view', 'click') THEN decay ELSE 0 END)::float8 AS views,
+           SUM(CASE WHEN interaction_type = 'favorite' THEN decay ELSE 0 END)::float8 AS favorites,
+           SUM(CASE WHEN interaction_type = 'contact' THEN decay ELSE 0 END)::float8 AS contacts,
+           SUM(weight * decay)::float8 AS score,
+           EXTRACT(EPOCH FROM NOW())::float8 AS updated_at
+    FROM (
+        SELECT vehicle_id, interaction_type, {INTERACTION_WEIGHT_SQL} AS weight,
+               exp(-:rate * GREATEST(EXTRACT(EPOCH FROM LOCALTIMESTAMP - created_at), 0)) AS decay
+        FROM gold.user_interactions
+        WHERE vehicle_id IS NOT NULL
+    ) i
+    GROUP BY vehicle_id
+"""
+
+# Seeds the table once; workers starting together leave the first seed in place
+SEED_SQL = f"""
+    INSERT INTO gold.vehicle_popularity (vehicle_id, views, favorites, contacts, score, updated_at)
+    SELECT vehicle_id, views, favorites, contacts, score, to_timestamp(updated_at)
+    FROM ({BOOTSTRAP_SQL}) b
+    ON CONFLICT (vehicle_id) DO NOTHING
+"""
+
+# Adds deltas valid at :now to the stored values decayed to :now
+FLUSH_SQL = """
+    INSERT INTO gold.vehicle_popularity AS p (vehicle_id, views, favorites, contacts, score, updated_at)
+    SELECT d.vehicle_id, d.views, d.favorites, d.contacts, d.score, :now
+    FROM unnest(CAST(:ids AS text[]), CAST(:views AS float8[]), CAST(:favorites AS float8[]),
+                CAST(:contacts AS float8[]), CAST(:score AS float8[]))
+         AS d(vehicle_id, views, favorites, contacts, score)
+    ON CONFLICT (vehicle_id) DO UPDATE SET
+        views = p.views * exp(-:rate * EXTRACT(EPOCH FROM EXCLUDED.updated_at - p.updated_at)) + EXCLUDED.views,
+        favorites = p.favorites * exp(-:rate * EXTRACT(EPOCH FROM EXCLUDED.updated_at - p.updated_at)) + EXCLUDED.favorites,
+        contacts = p.contacts * exp(-:rate * EXTRACT(EPOCH FROM EXCLUDED.updated_at - p.updated_at)) + EXCLUDED.contacts,
+        score = p.score * exp(-:rate * EXTRACT(EPOCH FROM EXCLUDED.updated_at - p.updated_at)) + EXCLUDED.score,
+        updated_at = EXCLUDED.updated_at
+"""
+
+# Rows changed since the last sync, by any process
+CHANGED_SQL = STORED_SQL + " WHERE updated_at > :since"
+
+
+def decay_rate(half_life_hours: float) -> float:
+    """Per-second rate of a half-life given in hours"""
+    return math.log(2) / (half_life_hours * 3600)
+
+
+class _TopList:
+    """Up to `capacity` (−score, row) keys, best first"""
+
+    __slots__ = ('capacity', 'keys')
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.keys: List[Tuple[float, int]] = []
+
+    def _index(self, row: int, score: float) -> Optional[int]:
+        i = bisect_left(self.keys, (-score, row))
+        return i if i < len(self.keys) and self.keys[i] == (-score, row) else None
+
+    def holds(self, row: int, score: float) -> bool:
+        return self._index(row, score) is not None
+
+    def update(self, row: int, old: float, new: float) -> None:
+        """Move a row up to a higher score; a lower one needs a rebuild"""
+        i = self._index(row, old)
+        if i is not None:
+            del self.keys[i]
+        if len(self.keys) < self.capacity or (-new, row) < self.keys[-1]:
+            insort(self.keys, (-new, row))
+            if len(self.keys) > self.capacity:
+                self.keys.pop()
+
+
+class PopularityModel:
+    """
+    Scaled counters per vehicle row ([views, favorites, contacts, score])
+    plus the top lists; rows are appended for vehicles first seen in events.
+    """
+
+    def __init__(self, half_life_hours: float, capacity: int = TOP_CAPACITY):
+        self.rate = decay_rate(half_life_hours)
+        self.capacity = capacity
+        self.epoch = time.time()
+        self.ids: List[str] = []
+        self.id_to_row: Dict[str, int] = {}
+        self.brands: List[Optional[str]] = []
+        self.segments: List[Optional[str]] = []
+        self.values = np.zeros((0, len(COUNTERS) + 1), dtype=np.float64)
+        self.tops: Dict[Tuple[str, Optional[str]], _TopList] = {}
+        # Scaled deltas not yet written to the table
+        self.pending: Dict[int, np.ndarray] = {}
+        # Whether gold.vehicle_popularity exists to flush to
+        self.persistent = False
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def scale(self, t: float) -> float:
+        return math.exp(self.rate * (t - self.epoch))
+
+    def _scopes(self, row: int):
+        yield ('all', None)
+        if self.brands[row]:
+            yield ('brand', self.brands[row])
+        if self.segments[row]:
+            yield ('segment', self.segments[row])
+
+    def add_vehicle(self, vehicle_id: str, brand: Optional[str], segment: Optional[str]) -> int:
+        with self._lock:
+            row = self.id_to_row.get(vehicle_id)
+            if row is not None:
+                return row
+            row = self.id_to_row[vehicle_id] = len(self.ids)
+            self.ids.append(vehicle_id)
+            self.brands.append(normalize_facet(brand) if brand else None)
+            self.segments.append(normalize_facet(segment) if segment else None)
+            if row == len(self.values):
+                grown = np.zeros((max(1024, 2 * len(self.values)), self.values.shape[1]))
+                grown[:row] = self.values
+                self.values = grown
+            return row
+
+    def rebuild(self) -> None:
+        """Top lists from scratch, after a bulk load or a rebase"""
+        with self._lock:
+            scores = self.values[:len(self.ids), -1]
+            rows = np.flatnonzero(scores > 0)
+            rows = rows[np.argsort(-scores[rows], kind='stable')]
+            self.tops = {}
+            for row in rows.tolist():
+                for scope in self._scopes(row):
+                    top = self.tops.get(scope)
+                    if top is None:
+                        top = self.tops[scope] = _TopList(self.capacity)
+                    if len(top.keys) < self.capacity:
+                        top.keys.append((-scores[row], row))
+
+    def _rebase(self, now: float) -> None:
+        factor = 1.0 / self.scale(now)
+        self.values *= factor
+        for delta in self.pending.values():
+            delta *= factor
+        self.epoch = now
+        self.rebuild()
+
+    def _set(self, row: int, values: np.ndarray) -> bool:
+        """
+        Assign one row's counters. Returns True when a listed score dropped;
+        the caller then rebuild()s, as vehicles cut from a full list may now
+        outrank it.
+        """
+        old = self.values[row, -1]
+        self.values[row] = values
+        if values[-1] < old:
+            return any(
+                scope in self.tops and self.tops[scope].holds(row, old)
+                for scope in self._scopes(row)
+            )
+        if values[-1] > old:
+            for scope in self._scopes(row):
+                top = self.tops.get(scope)
+                if top is None:
+                    top = self.tops[scope] = _TopList(self.capacity)
+                top.update(row, old, values[-1])
+        return False
+
+    def record(self, row: int, interaction_type: Optional[str], interaction_score: Optional[float], now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.rate * (now - self.epoch) > REBASE_EXPONENT:
+                self._rebase(now)
+            delta = np.zeros(self.values.shape[1])
+            counter = COUNTER_TYPES.get(interaction_type)
+            if counter is not None:
+                delta[counter] = 1.0
+            delta[-1] = interaction_weight(interaction_type, interaction_score)
+            delta *= self.scale(now)
+            if self._set(row, self.values[row] + delta):
+                self.rebuild()
+            if row in self.pending:
+                self.pending[row] += delta
+            else:
+                self.pending[row] = delta
+
+    def load_stored(self, rows) -> None:
+        """Bulk-assign stored rows at startup; call rebuild() afterwards"""
+        with self._lock:
+            for vehicle_id, *values, updated_at in rows:
+                row = self.id_to_row.get(vehicle_id)
+                if row is None:
+                    row = self.add_vehicle(vehicle_id, None, None)
+                self.values[row] = np.asarray(values, dtype=np.float64) * self.scale(updated_at)
+
+    def apply_stored(self, rows) -> None:
+        """
+        Overwrite counters with (vehicle_id, views, favorites, contacts, score,
+        updated_at) rows read from the table, keeping unflushed local deltas
+        """
+        with self._lock:
+            dropped = False
+            for vehicle_id, *values, updated_at in rows:
+                row = self.id_to_row.get(vehicle_id)
+                if row is None:
+                    row = self.add_vehicle(vehicle_id, None, None)
+                scaled = np.asarray(values, dtype=np.float64) * self.scale(updated_at)
+                pending = self.pending.get(row)
+                dropped |= self._set(row, scaled if pending is None else scaled + pending)
+            if dropped:
+                self.rebuild()
+
+    def take_pending(self, now: float) -> Dict[str, np.ndarray]:
+        """Unflushed deltas per vehicle_id, decayed to `now`"""
+        with self._lock:
+            pending, self.pending = self.pending, {}
+            factor = 1.0 / self.scale(now)
+            return {self.ids[row]: delta * factor for row, delta in pending.items()}
+
+    def restore_pending(self, deltas: Dict[str, np.ndarray], now: float) -> None:
+        """Put back deltas whose flush failed"""
+        with self._lock:
+            factor = self.scale(now)
+            for vehicle_id, delta in deltas.items():
+                row = self.id_to_row[vehicle_id]
+                self.pending[row] = self.pending.get(row, 0) + delta * factor
+
+    def top(
+        self,
+        limit: int,
+        brand: Optional[str] = None,
+        segment: Optional[str] = None,
+        exclude: Sequence[str] = ()
+    ) -> List[Tuple[str, float]]:
+        """
+        (vehicle_id, decayed score) of the most popular vehicles, globally or
+        within one brand or segment; reads the first limit + |exclude| keys
+        """
+        if brand:
+            scope = ('brand', normalize_facet(brand))
+        elif segment:
+            scope = ('segment', normalize_facet(segment))
+        else:
+            scope = ('all', None)
+        excluded = set(exclude)
+        with self._lock:
+            top = self.tops.get(scope)
+            if top is None:
+                return []
+            factor = 1.0 / self.scale(time.time())
+            results = []
+            for key, row in top.keys:
+                if len(results) == limit:
+                    break
+                if self.ids[row] not in excluded:
+                    results.append((self.ids[row], float(-key * factor)))
+            return results
+
+    def counters(self, vehicle_id: str) -> Optional[Dict[str, float]]:
+        """Decayed counters and score of one vehicle, as of now"""
+        with self._lock:
+            row = self.id_to_row.get(vehicle_id)
+            if row is None:
+                return None
+            values = self.values[row] / self.scale(time.time())
+            return dict(zip((*COUNTERS, 'score'), values.tolist()))
+
+
+def _table_exists(db: Session) -> bool:
+    return db.execute(text("SELECT to_regclass('gold.vehicle_popularity') IS NOT NULL")).scalar()
+
+
+def flush(model: PopularityModel, db: Session, since: float) -> None:
+    """Write this process's deltas, then pull the rows changed since `since` by any process"""
+    now = time.time()
+    deltas = model.take_pending(now)
+    if deltas:
+        columns = np.stack(list(deltas.values())).T
+        params = {name: columns[i].tolist() for i, name in enumerate((*COUNTERS, 'score'))}
+        try:
+            db.execute(text(FLUSH_SQL), {
+                'ids': list(deltas), 'now': datetime.fromtimestamp(now, timezone.utc), 'rate': model.rate, **params
+            })
+            db.commit()
+        except Exception:
+            db.rollback()
+            model.restore_pending(deltas, now)
+            raise
+    changed = db.execute(text(CHANGED_SQL), {'since': datetime.fromtimestamp(since, timezone.utc)})
+    model.apply_stored(changed)
+
+
+class FlushThread(threading.Thread):
+    """Flushes the model every POPULARITY_FLUSH_SECONDS, and once more when stopped"""
+
+    def __init__(self, model: PopularityModel, interval: float):
+        super().__init__(name="popularity-flush", daemon=True)
+        self.model = model
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join(timeout=self.interval)
+
+    def run(self) -> None:
+        last_sync = time.time()
+        stopping = False
+        while not stopping:
+            stopping = self._stop_event.wait(self.interval)
+            # Overlap the windows, so rows committed late by another worker are not missed
+            started = time.time()
+            db = SessionLocal()
+            try:
+                flush(self.model, db, last_sync - self.interval)
+                last_sync = started
+            except Exception as e:
+                logger.warning(f"Popularity flush failed, retrying next round: {e}")
+            finally:
+                db.close()
+
+
+_model: Optional[PopularityModel] = None
+_flusher: Optional[FlushThread] = None
+
+
+def get_popularity() -> Optional[PopularityModel]:
+    return _model
+
+
+def load_popularity(db: Optional[Session] = None) -> PopularityModel:
+    """
+    Counters from gold.vehicle_popularity; an empty table is seeded from the
+    interaction log. Without the table (migration 003 not run) the counters
+    live in memory only.
+    """
+    global _model
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        start_time = time.time()
+        model = PopularityModel(settings.POPULARITY_HALF_LIFE_HOURS)
+        for row in db.execute(text(VEHICLES_SQL)):
+            model.add_vehicle(row.vehicle_id, row.brand, row.drivetrain)
+
+        model.persistent = _table_exists(db)
+        if model.persistent:
+            if db.execute(text("SELECT NOT EXISTS (SELECT 1 FROM gold.vehicle_popularity)")).scalar():
+                db.execute(text(SEED_SQL), {'rate': model.rate})
+                db.commit()
+            model.load_stored(db.execute(text(STORED_SQL)))
+        else:
+            logger.warning("gold.vehicle_popularity missing (run database/migrations/003); popularity is not persisted")
+            model.load_stored(db.execute(text(BOOTSTRAP_SQL), {'rate': model.rate}))
+        model.rebuild()
+    finally:
+        if own_session:
+            db.close()
+
+    _model = model
+    logger.info(f"Loaded vehicle popularity: {len(model):,} vehicles in {time.time() - start_time:.2f}s")
+    return model
+
+
+def start_flusher() -> None:
+    global _flusher
+    if _flusher is None and _model is not None and _model.persistent:
+        _flusher = FlushThread(_model, settings.POPULARITY_FLUSH_SECONDS)
+        _flusher.start()
+
+
+def stop_flusher() -> None:
+    global _flusher
+    if _flusher is not None:
+        _flusher.stop()
+        _flusher = None
+
+
+def record_event(vehicle_id: str, interaction_type: Optional[str], interaction_score: Optional[float]) -> None:
+    """
+    Count a committed interaction. Runs as a background task after the
+    response; a vehicle the model has not seen is looked up first.
+    """
+    model = _model
+    if model is None or not vehicle_id:
+        return
+    row = model.id_to_row.get(vehicle_id)
+    if row is None:
+        db = SessionLocal()
+        try:
+            vehicle = db.execute(text(VEHICLE_SQL), {'vehicle_id': vehicle_id}).first()
+        except Exception as e:
+            logger.warning(f"Popularity lookup of {vehicle_id} failed: {e}")
+            vehicle = None
+        finally:
+            db.close()
+        row = model.add_vehicle(vehicle_id, *(vehicle or (None, None)))
+    model.record(row, interaction_type, interaction_score)
+
+
+def popular_vehicles(
+    limit: int,
+    brand: Optional[str] = None,
+    segment: Optional[str] = None,
+    exclude: Sequence[str] = ()
+) -> Optional[List[Tuple[str, float]]]:
+    """Top-N (vehicle_id, score); None when the model is not loaded"""
+    model = _model
+    if model is None:
+        return None
+    return model.top(limit, brand, segment, exclude)
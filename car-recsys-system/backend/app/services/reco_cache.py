@@ -0,0 +1,280 @@
+"""
+Per-user recommendation cache.
+
+Holds each user's fused hybrid ranking (the first CANDIDATE_SIZE vehicles,
+before reranking and hydration) as compact arrays: int32 rows into a shared
+vehicle_id vocabulary, float32 scores and a uint8 mask of the contributing
+sources. With RECO_CACHE_REDIS the entries live in Redis instead, shared by
+all workers.
+
+Entries are served stale-while-revalidate: younger than RECO_CACHE_TTL they
+are fresh; older ones, up to RECO_CACHE_MAX_STALE, are still served while
+a refresh runs in the background. A strong signal (a favorite, a contact,
+high-scored feedback) drops the vehicle from the user's entry and marks it
+stale, so the next read triggers a refresh. A materializer thread
+precomputes the entries of recently active users that are missing or stale.
+"""
+from sqlalchemy import text
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+import threading
+import time
+import numpy as np
+import orjson
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.interaction_weights import interaction_weight
+
+try:
+    import redis
+except ImportError:  # optional shared tier
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "reco:"
+
+# Sources are stored as one bit each, in this order; new ones go at the end
+SOURCES = ('cooccurrence', 'embedding', 'popularity', 'als')
+
+# Interaction weight (see interaction_weights.INTERACTION_TYPE_WEIGHTS) of a strong signal; a favorite is 3
+STRONG_SIGNAL_WEIGHT = 3.0
+
+# Only one worker materializes at a time when the entries are shared
+MATERIALIZE_LOCK_ID = 0x7265636f
+
+# Most recently active users first
+ACTIVE_USERS_SQL = """
+    SELECT user_id::text AS user_id
+    FROM gold.user_interactions
+    WHERE user_id IS NOT NULL AND created_at > LOCALTIMESTAMP - make_interval(days => :days)
+    GROUP BY user_id
+    ORDER BY MAX(created_at) DESC
+    LIMIT :limit
+"""
+
+# [(vehicle_id, fused score, [sources])], best first
+Ranking = List[Tuple[str, float, List[str]]]
+
+
+class RecoEntry:
+    __slots__ = ('rows', 'scores', 'masks', 'seeds', 'computed_at', 'stale')
+
+    def __init__(self, rows: np.ndarray, scores: np.ndarray, masks: np.ndarray, seeds: List[str], computed_at: float, stale: bool = False):
+        self.rows = rows
+        self.scores = scores
+        self.masks = masks
+        self.seeds = seeds
+        self.computed_at = computed_at
+        self.stale = stale
+
+
+class RecoCache:
+    """user_id -> RecoEntry, in process or in Redis"""
+
+    def __init__(self, maxsize: int, ttl: float, max_stale: float, redis_url: Optional[str] = None):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.local = TTLCache(maxsize=maxsize, ttl=max_stale)
+        # vehicle_id vocabulary shared by every local entry
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._refreshing: Set[str] = set()
+        # The loop only keeps weak references to tasks; hold revalidations until done
+        self._tasks: Set[asyncio.Task] = set()
+        self.redis = None
+        if redis_url:
+            if redis is None:
+                logger.warning("RECO_CACHE_REDIS is set but the redis package is not installed")
+            else:
+                self.redis = redis.Redis.from_url(redis_url, socket_timeout=0.05, socket_connect_timeout=0.2)
+
+    def _encode_ids(self, vehicle_ids: List[str]) -> np.ndarray:
+        with self._lock:
+            for vehicle_id in vehicle_ids:
+                if vehicle_id not in self._rows:
+                    self._rows[vehicle_id] = len(self._ids)
+                    self._ids.append(vehicle_id)
+            return np.fromiter((self._rows[v] for v in vehicle_ids), dtype=np.int32, count=len(vehicle_ids))
+
+    def _entry(self, ranking: Ranking, seeds: List[str], computed_at: float) -> RecoEntry:
+        masks = [sum(1 << SOURCES.index(s) for s in sources if s in SOURCES) for _, _, sources in ranking]
+        return RecoEntry(
+            self._encode_ids([vehicle_id for vehicle_id, _, _ in ranking]),
+            np.array([score for _, score, _ in ranking], dtype=np.float32),
+            np.array(masks, dtype=np.uint8),
+            seeds,
+            computed_at
+        )
+
+    def _ranking(self, entry: RecoEntry) -> Ranking:
+        return [
+            (self._ids[row], float(score), [s for i, s in enumerate(SOURCES) if mask & (1 << i)])
+            for row, score, mask in zip(entry.rows.tolist(), entry.scores.tolist(), entry.masks.tolist())
+        ]
+
+    def _dumps(self, entry: RecoEntry) -> bytes:
+        header = {'ids': [self._ids[row] for row in entry.rows.tolist()], 'seeds': entry.seeds,
+                  'computed_at': entry.computed_at, 'stale': entry.stale}
+        return orjson.dumps(header) + b'\n' + entry.scores.tobytes() + entry.masks.tobytes()
+
+    def _loads(self, value: bytes) -> RecoEntry:
+        header, _, arrays = value.partition(b'\n')
+        meta = orjson.loads(header)
+        n = len(meta['ids'])
+        return RecoEntry(
+            self._encode_ids(meta['ids']),
+            np.frombuffer(arrays[:4 * n], dtype=np.float32),
+            np.frombuffer(arrays[4 * n:], dtype=np.uint8),
+            meta['seeds'],
+            meta['computed_at'],
+            meta['stale']
+        )
+
+    def _get_entry(self, user_id: str) -> Optional[RecoEntry]:
+        if self.redis is None:
+            return self.local.get(user_id)
+        try:
+            value = self.redis.get(REDIS_KEY_PREFIX + user_id)
+        except redis.RedisError as e:
+            logger.warning(f"Recommendation cache Redis read failed: {e}")
+            return None
+        return self._loads(value) if value is not None else None
+
+    def _set_entry(self, user_id: str, entry: RecoEntry) -> None:
+        ttl = max(self.max_stale - (time.time() - entry.computed_at), 1)
+        if self.redis is None:
+            self.local.set(user_id, entry, ttl=ttl)
+            return
+        try:
+            self.redis.set(REDIS_KEY_PREFIX + user_id, self._dumps(entry), ex=int(ttl))
+        except redis.RedisError as e:
+            logger.warning(f"Recommendation cache Redis write failed: {e}")
+
+    def get(self, user_id: str) -> Optional[Tuple[List[str], Ranking, str]]:
+        """(seeds, ranking, 'hit' or 'stale'); None on a miss"""
+        entry = self._get_entry(user_id)
+        if entry is None:
+            return None
+        fresh = not entry.stale and time.time() - entry.computed_at < self.ttl
+        return entry.seeds, self._ranking(entry), 'hit' if fresh else 'stale'
+
+    def set(self, user_id: str, seeds: List[str], ranking: Ranking) -> None:
+        self._set_entry(user_id, self._entry(ranking, seeds, time.time()))
+
+    def invalidate(self, user_id: str, vehicle_id: Optional[str] = None) -> None:
+        """Mark the user's entry stale, dropping `vehicle_id` from it right away"""
+        entry = self._get_entry(user_id)
+        if entry is None:
+            return
+        if vehicle_id is not None and vehicle_id in self._rows:
+            keep = entry.rows != self._rows[vehicle_id]
+            entry = RecoEntry(entry.rows[keep], entry.scores[keep], entry.masks[keep], entry.seeds, entry.computed_at)
+        entry.stale = True
+        self._set_entry(user_id, entry)
+
+    def revalidate(self, user_id: str, refresh: Callable[[str], Awaitable[None]]) -> None:
+        """Schedule refresh(user_id) on the running loop unless one is already in flight"""
+        with self._lock:
+            if user_id in self._refreshing:
+                return
+            self._refreshing.add(user_id)
+
+        async def run():
+            try:
+                await refresh(user_id)
+            except Exception as e:
+                logger.warning(f"Recommendation refresh for {user_id} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(user_id)
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+def record_signal(user_id: str, vehicle_id: str, interaction_type: Optional[str], interaction_score: Optional[float]) -> None:
+    """Background task after an interaction: strong signals invalidate the user's entry"""
+    if interaction_weight(interaction_type, interaction_score) >= STRONG_SIGNAL_WEIGHT:
+        reco_cache.invalidate(str(user_id), vehicle_id)
+
+
+class Materializer(threading.Thread):
+    """Every RECO_CACHE_REFRESH_SECONDS, computes missing and stale entries of active users"""
+
+    def __init__(self, interval: float):
+        super().__init__(name="reco-materializer", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.materialize()
+            except Exception as e:
+                logger.warning(f"Recommendation materialization failed: {e}")
+
+    def materialize(self) -> int:
+        from app.services.hybrid import refresh_user
+
+        db = SessionLocal()
+        try:
+            if reco_cache.redis is not None and not db.execute(
+                text("SELECT pg_try_advisory_lock(:id)"), {'id': MATERIALIZE_LOCK_ID}
+            ).scalar():
+                return 0
+            try:
+                users = db.execute(text(ACTIVE_USERS_SQL), {
+                    'days': settings.RECO_CACHE_ACTIVE_DAYS, 'limit': settings.RECO_CACHE_MAX_USERS
+                }).scalars().all()
+                due = [user_id for user_id in users if (reco_cache.get(user_id) or (None, None, 'miss'))[2] != 'hit']
+
+                async def refresh_all():
+                    for user_id in due:
+                        if self._stop_event.is_set():
+                            break
+                        await refresh_user(user_id)
+
+                start_time = time.time()
+                asyncio.run(refresh_all())
+                if due:
+                    logger.info(f"Materialized recommendations of {len(due):,}/{len(users):,} active users "
+                                f"in {time.time() - start_time:.1f}s")
+                return len(due)
+            finally:
+                if reco_cache.redis is not None:
+                    db.execute(text("SELECT pg_advisory_unlock(:id)"), {'id': MATERIALIZE_LOCK_ID})
+        finally:
+            db.close()
+
+
+reco_cache = RecoCache(
+    maxsize=settings.RECO_CACHE_SIZE,
+    ttl=settings.RECO_CACHE_TTL,
+    max_stale=settings.RECO_CACHE_MAX_STALE,
+    redis_url=settings.REDIS_URL if settings.RECO_CACHE_REDIS else None
+)
+
+_materializer: Optional[Materializer] = None
+
+
+def start_materializer() -> None:
+    global _materializer
+    if _materializer is None:
+        _materializer = Materializer(settings.RECO_CACHE_REFRESH_SECONDS)
+        _materializer.start()
+
+
+def stop_materializer() -> None:
+    global _materializer
+    if _materializer is not None:
+        _materializer.stop()
+        _materializer = None
@@ -0,0 +1,240 @@
+"""
+Cross-encoder reranking.
+
+One forward pass per request wastes most of a CPU's throughput, so
+requests hand their (query, vehicle text) pairs to a single worker thread
+that gathers the pairs of all concurrent requests into micro-batches: up
+to RERANK_MAX_BATCH pairs, waiting at most RERANK_MAX_WAIT_MS for a batch
+to fill. Scores are cached per (query hash, vehicle_id), and a pair
+already queued by another request is shared rather than scored twice.
+
+A request whose pairs are not all scored within its latency budget keeps
+the first-stage order. Pairs still queued past their deadline are dropped
+instead of scored, so an overloaded worker catches up rather than falling
+further behind.
+"""
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import queue
+import threading
+import time
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:  # reranking is skipped without it
+    CrossEncoder = None
+
+logger = logging.getLogger(__name__)
+
+# Listing fields describing a vehicle to the cross-encoder, in order
+TEXT_FIELDS = ('title', 'brand', 'model', 'fuel_type', 'transmission', 'color')
+
+Scorer = Callable[[List[Tuple[str, str]]], Sequence[float]]
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha1(' '.join(query.lower().split()).encode()).hexdigest()[:16]
+
+
+def candidate_text(listing: Dict[str, Any]) -> str:
+    """Short description of a listing for the cross-encoder"""
+    parts = [str(listing[field]) for field in TEXT_FIELDS if listing.get(field)]
+    if listing.get('price'):
+        parts.append(f"${float(listing['price']):,.0f}")
+    if listing.get('mileage'):
+        parts.append(f"{float(listing['mileage']):,.0f} miles")
+    return ', '.join(parts)
+
+
+class _Pair:
+    __slots__ = ('key', 'query', 'text', 'deadline', 'future')
+
+    def __init__(self, key: Tuple[str, str], query: str, text: str, deadline: float):
+        self.key = key
+        self.query = query
+        self.text = text
+        self.deadline = deadline
+        self.future: Future = Future()
+
+
+class Reranker:
+    """Micro-batching front of one cross-encoder, scored on a dedicated worker thread"""
+
+    def __init__(
+        self,
+        model_name: str,
+        max_batch: int,
+        max_wait: float,
+        cache_size: int,
+        cache_ttl: float,
+        scorer: Optional[Scorer] = None,
+        enabled: bool = True
+    ):
+        self.model_name = model_name
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._scorer = scorer
+        self._queue: "queue.Queue[Optional[_Pair]]" = queue.Queue()
+        self._pending: Dict[Tuple[str, str], _Pair] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.available = enabled and (scorer is not None or CrossEncoder is not None)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None and self.available:
+                self._thread = threading.Thread(target=self._run, name="reranker", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread = None
+
+    def _load(self) -> Scorer:
+        """Model loads on the worker thread, so startup does not wait for it"""
+        model = CrossEncoder(self.model_name, max_length=256)
+        logger.info(f"Loaded reranker {self.model_name}")
+        return lambda pairs: model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+
+    def _next_batch(self) -> Tuple[List[_Pair], bool]:
+        """Block for one pair, then take more until the batch is full or max_wait passes"""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pair = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if pair is None:
+                return batch, True
+            batch.append(pair)
+        return batch, False
+
+    def _finish(self, pairs: List[_Pair], scores: Optional[Sequence[float]] = None, error: Optional[Exception] = None) -> None:
+        with self._lock:
+            for pair in pairs:
+                self._pending.pop(pair.key, None)
+        for i, pair in enumerate(pairs):
+            if pair.future.done():
+                continue
+            if scores is not None:
+                self.cache.set(pair.key, float(scores[i]))
+                pair.future.set_result(float(scores[i]))
+            elif error is not None:
+                pair.future.set_exception(error)
+            else:
+                pair.future.cancel()
+
+    def _run(self) -> None:
+        try:
+            if self._scorer is None:
+                self._scorer = self._load()
+        except Exception as e:
+            logger.error(f"Failed to load reranker {self.model_name}, keeping first-stage order: {e}")
+            self.available = False
+
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if not self.available:
+                self._finish(batch)
+                continue
+
+            now = time.monotonic()
+            live = [pair for pair in batch if pair.deadline > now]
+            self._finish([pair for pair in batch if pair.deadline <= now])
+            if not live:
+                continue
+            try:
+                scores = self._scorer([(pair.query, pair.text) for pair in live])
+            except Exception as e:
+                logger.error(f"Reranker batch of {len(live)} failed: {e}")
+                self._finish(live, error=e)
+                continue
+            self._finish(live, scores)
+
+    def _submit(self, query: str, candidates: Sequence[Tuple[str, str]], deadline: float) -> Dict[str, Any]:
+        """Cached score or Future per vehicle_id; queues the pairs nobody has queued yet"""
+        qhash = query_hash(query)
+        results: Dict[str, Any] = {}
+        for vehicle_id, text in candidates:
+            key = (qhash, vehicle_id)
+            score = self.cache.get(key)
+            if score is not None:
+                results[vehicle_id] = score
+                continue
+            with self._lock:
+                pair = self._pending.get(key)
+                if pair is None or pair.future.done():
+                    pair = self._pending[key] = _Pair(key, query, text, deadline)
+                    self._queue.put(pair)
+                else:
+                    pair.deadline = max(pair.deadline, deadline)
+            results[vehicle_id] = pair.future
+        return results
+
+    @staticmethod
+    def _order(candidates: Sequence[Tuple[str, str]], results: Dict[str, Any]) -> Tuple[List[Tuple[str, Optional[float]]], bool]:
+        """Best score first when every pair was scored, otherwise the first-stage order"""
+        scores = {}
+        for vehicle_id, result in results.items():
+            if isinstance(result, Future):
+                if not result.done() or result.cancelled() or result.exception() is not None:
+                    return [(vehicle_id, None) for vehicle_id, _ in candidates], False
+                result = result.result()
+            scores[vehicle_id] = result
+        ranked = sorted(candidates, key=lambda candidate: -scores[candidate[0]])
+        return [(vehicle_id, scores[vehicle_id]) for vehicle_id, _ in ranked], True
+
+    def rerank(self, query: str, candidates: Sequence[Tuple[str, str]], budget: float) -> Tuple[List[Tuple[str, Optional[float]]], bool]:
+        """
+        (vehicle_id, score) for `candidates` given as (vehicle_id, text) in
+        first-stage order, plus whether they were reranked; waits at most
+        `budget` seconds. Blocks, so call it from a worker thread.
+        """
+        if not self.available or not candidates:
+            return [(vehicle_id, None) for vehicle_id, _ in candidates], False
+        self.start()
+        results = self._submit(query, candidates, time.monotonic() + budget)
+        futures = [result for result in results.values() if isinstance(result, Future)]
+        if futures:
+            concurrent.futures.wait(futures, timeout=budget)
+        return self._order(candidates, results)
+
+    async def arerank(self, query: str, candidates: Sequence[Tuple[str, str]], budget: float) -> Tuple[List[Tuple[str, Optional[float]]], bool]:
+        """rerank() for async endpoints, waiting without blocking the event loop"""
+        if not self.available or not candidates:
+            return [(vehicle_id, None) for vehicle_id, _ in candidates], False
+        self.start()
+        results = self._submit(query, candidates, time.monotonic() + budget)
+        futures = {result for result in results.values() if isinstance(result, Future)}
+        if futures:
+            # A timed-out wait leaves the futures running for the requests sharing them
+            await asyncio.wait([asyncio.wrap_future(f) for f in futures], timeout=budget)
+        return self._order(candidates, results)
+
+
+reranker = Reranker(
+    model_name=settings.RERANKER_MODEL,
+    max_batch=settings.RERANK_MAX_BATCH,
+    max_wait=settings.RERANK_MAX_WAIT_MS / 1000,
+    cache_size=settings.RERANK_CACHE_SIZE,
+    cache_ttl=settings.CACHE_TTL,
+    enabled=settings.RERANKER_ENABLED
+)
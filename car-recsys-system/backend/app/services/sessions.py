@@ -0,0 +1,150 @@
+"""
+Session-based recommendations from an in-memory event window.
+
+Each session keeps a ring buffer of its last SESSION_WINDOW_SIZE
+interactions. Sessions are held in LRU order of their last event: past
+SESSION_MAX_SESSIONS the least recently active one is evicted, and sessions
+idle for SESSION_IDLE_SECONDS are dropped as new events arrive.
+
+Candidates are scored against the session's recent vehicles, newer clicks
+weighing more, using only the precomputed item neighbors (co-occurrence
+and similar-vehicles tables), so a recommendation needs no database read.
+"""
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import threading
+import time
+
+from app.core.config import settings
+from app.services import cooccurrence, popularity, similarity
+from app.services.interaction_weights import interaction_weight
+
+# Each older event counts this much less than the one after it
+RECENCY_DECAY = 0.8
+
+# Precomputed similar vehicles taken per session vehicle
+SIMILAR_PER_SEED = 20
+
+# Co-occurrence carries what sessions did next; similarity fills vehicles without interactions
+SOURCE_WEIGHTS = {
+    'cooccurrence': 1.0,
+    'similarity': 0.5,
+}
+
+# (vehicle_id, weight, timestamp), oldest first
+Event = Tuple[str, float, float]
+
+
+class SessionWindow:
+    """session_id -> ring buffer of its last events, least recently active first"""
+
+    def __init__(self, window_size: int, max_sessions: int, idle_seconds: float):
+        self.window_size = window_size
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions: "OrderedDict[str, Deque[Event]]" = OrderedDict()
+        self._last_seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict(self, now: float) -> None:
+        """Drop idle sessions, then the least recently active past the cap; caller holds the lock"""
+        while self._sessions:
+            session_id = next(iter(self._sessions))
+            if len(self._sessions) <= self.max_sessions and now - self._last_seen[session_id] < self.idle_seconds:
+                break
+            del self._sessions[session_id]
+            del self._last_seen[session_id]
+
+    def record(self, session_id: str, vehicle_id: str, weight: float) -> None:
+        now = time.time()
+        with self._lock:
+            events = self._sessions.get(session_id)
+            if events is None:
+                events = self._sessions[session_id] = deque(maxlen=self.window_size)
+            else:
+                self._sessions.move_to_end(session_id)
+            events.append((vehicle_id, weight, now))
+            self._last_seen[session_id] = now
+            self._evict(now)
+
+    def events(self, session_id: str) -> List[Event]:
+        """The session's events, oldest first; empty for unknown or idle sessions"""
+        with self._lock:
+            events = self._sessions.get(session_id)
+            if events is None or time.time() - self._last_seen[session_id] >= self.idle_seconds:
+                return []
+            return list(events)
+
+
+def session_seeds(events: List[Event]) -> Dict[str, float]:
+    """{vehicle_id: weight}, each event decayed by how many events followed it; most recent first"""
+    seeds: Dict[str, float] = {}
+    for age, (vehicle_id, weight, _) in enumerate(reversed(events)):
+        seeds[vehicle_id] = seeds.get(vehicle_id, 0.0) + weight * RECENCY_DECAY ** age
+    return seeds
+
+
+def similar_candidates(index: similarity.SimilarityIndex, seeds: Dict[str, float], limit: int) -> List[Tuple[str, float]]:
+    """Seed-weighted sum of the precomputed similarities"""
+    totals: Dict[str, float] = {}
+    for vehicle_id, weight in seeds.items():
+        for neighbor, score in index.similar(vehicle_id, SIMILAR_PER_SEED) or ():
+            if neighbor not in seeds:
+                totals[neighbor] = totals.get(neighbor, 0.0) + weight * score
+    return sorted(totals.items(), key=lambda item: -item[1])[:limit]
+
+
+def recommend(session_id: str, limit: int) -> Dict[str, Any]:
+    """
+    Top-`limit` (vehicle_id, score, sources) for a session, excluding the
+    vehicles it has already seen; popular vehicles while it is empty
+    """
+    from app.services.hybrid import weighted_fuse
+
+    seeds = session_seeds(session_window.events(session_id))
+    if not seeds:
+        popular = popularity.popular_vehicles(limit) or []
+        return {
+            'session_id': session_id,
+            'seeds': [],
+            'results': [{'vehicle_id': vid, 'score': score, 'sources': ['popularity']} for vid, score in popular]
+        }
+
+    ranked: Dict[str, List[Tuple[str, float]]] = {}
+    index = cooccurrence.get_cooccurrence_index()
+    if index is not None:
+        ranked['cooccurrence'] = index.candidates(seeds, settings.CANDIDATE_SIZE)
+    similar_index = similarity.get_similarity_index()
+    if similar_index is not None:
+        ranked['similarity'] = similar_candidates(similar_index, seeds, settings.CANDIDATE_SIZE)
+
+    fused = weighted_fuse(ranked, SOURCE_WEIGHTS)
+    contributors: Dict[str, List[str]] = {}
+    for source, results in ranked.items():
+        for vehicle_id, _ in results:
+            contributors.setdefault(vehicle_id, []).append(source)
+    order = sorted(fused, key=lambda vehicle_id: -fused[vehicle_id])[:limit]
+    results = [{'vehicle_id': vid, 'score': fused[vid], 'sources': contributors[vid]} for vid in order]
+
+    # Too few neighbors (new listings, sparse tables): top up with popular vehicles
+    if len(results) < limit:
+        popular = popularity.popular_vehicles(limit - len(results), exclude=[*seeds, *fused]) or []
+        results.extend({'vehicle_id': vid, 'score': 0.0, 'sources': ['popularity']} for vid, _ in popular)
+
+    return {'session_id': session_id, 'seeds': list(seeds), 'results': results}
+
+
+def record_event(session_id: Optional[str], vehicle_id: str, interaction_type: Optional[str], interaction_score: Optional[float]) -> None:
+    """Append an interaction to its session's window; no-op without a session"""
+    if session_id:
+        session_window.record(session_id, vehicle_id, interaction_weight(interaction_type, interaction_score))
+
+
+session_window = SessionWindow(
+    window_size=settings.SESSION_WINDOW_SIZE,
+    max_sessions=settings.SESSION_MAX_SESSIONS,
+    idle_seconds=settings.SESSION_IDLE_SECONDS
+)
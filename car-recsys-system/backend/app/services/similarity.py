@@ -0,0 +1,324 @@
+"""
+Vehicle-to-vehicle similarity.
+
+Every listing becomes one L2-normalized feature vector: z-scored numeric
+attributes (price, mileage, year, ratings, mpg) and weighted one-hot
+categoricals (brand, drivetrain, fuel type, transmission). Cosine
+similarity is then a matrix product, computed in row batches.
+
+build_similarity_index.py precomputes the top-K neighbors of every vehicle
+into a compact table (int32 rows, float16 scores) saved with the feature
+matrix, so serving is a dictionary lookup; listings newer than the table
+are scored online against the saved matrix.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, List, Optional, Sequence, Tuple
+import json
+import logging
+import os
+import re
+import time
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Numeric features and their relative weights. price and mileage are
+# log-scaled first, since their spread is multiplicative.
+NUMERIC_FEATURES = {
+    'price': 2.0,
+    'mileage': 1.0,
+    'year': 1.5,
+    'rating': 0.5,
+    'mpg': 0.5,
+}
+LOG_FEATURES = ('price', 'mileage')
+
+# One-hot features and the weight of a match. The vehicle tables have no
+# body type column; transmission stands in as the remaining categorical.
+CATEGORICAL_FEATURES = {
+    'brand': 2.0,
+    'drivetrain': 1.0,
+    'fuel_type': 1.0,
+    'transmission': 0.5,
+}
+
+# Rows scored per matrix product in the offline job
+BATCH_SIZE = 1024
+
+SIMILARITY_FEATURES_SQL = """
+    SELECT vehicle_id, title, brand, drivetrain, fuel_type, transmission, mpg,
+           price::float8 AS price,
+           mileage::float8 AS mileage,
+           COALESCE(car_rating, (
+               COALESCE(comfort_rating, 0) + COALESCE(interior_rating, 0) + COALESCE(performance_rating, 0)
+               + COALESCE(value_rating, 0) + COALESCE(exterior_rating, 0) + COALESCE(reliability_rating, 0)
+           ) / NULLIF(
+               (comfort_rating IS NOT NULL)::int + (interior_rating IS NOT NULL)::int
+               + (performance_rating IS NOT NULL)::int + (value_rating IS NOT NULL)::int
+               + (exterior_rating IS NOT NULL)::int + (reliability_rating IS NOT NULL)::int, 0
+           ))::float8 AS rating
+    FROM {table}
+"""
+
+YEAR_RE = re.compile(r'^\s*([0-9]{4})(?![0-9])')
+NUMBER_RE = re.compile(r'[0-9]+(?:\.[0-9]+)?')
+
+
+def _title_year(title: Optional[str]) -> float:
+    match = YEAR_RE.match(title or '')
+    return float(match.group(1)) if match else np.nan
+
+
+def _parse_mpg(mpg: Optional[str]) -> float:
+    """Mean of a "city–highway" range such as "26–36"; "0–0" means unknown"""
+    values = [float(v) for v in NUMBER_RE.findall(mpg or '')[:2]]
+    values = [v for v in values if v > 0]
+    return sum(values) / len(values) if values else np.nan
+
+
+def _normalize_transmission(value: Optional[str]) -> Optional[str]:
+    """Collapse spellings like "6-Speed M/T" or "Automatic CVT" to a few classes"""
+    if not value:
+        return None
+    value = value.lower()
+    if 'cvt' in value or 'variable' in value:
+        return 'cvt'
+    if 'manual' in value or 'm/t' in value:
+        return 'manual'
+    return 'automatic'
+
+
+def _category(column: str, value: Optional[str]) -> Optional[str]:
+    if column == 'transmission':
+        return _normalize_transmission(value)
+    value = (value or '').strip().lower()
+    return value or None
+
+
+def _numeric_row(row) -> List[float]:
+    values = {
+        'price': row['price'],
+        'mileage': row['mileage'],
+        'year': _title_year(row['title']),
+        'rating': row['rating'],
+        'mpg': _parse_mpg(row['mpg']),
+    }
+    result = []
+    for feature in NUMERIC_FEATURES:
+        value = values[feature]
+        value = np.nan if value is None else float(value)
+        if feature in LOG_FEATURES and not np.isnan(value):
+            value = np.log1p(max(value, 0.0))
+        result.append(value)
+    return result
+
+
+class FeatureEncoder:
+    """Fitted normalization: numeric means/stds and categorical vocabularies"""
+
+    def __init__(self, means: Sequence[float], stds: Sequence[float], vocabularies: Dict[str, List[str]]):
+        self.means = np.asarray(means, dtype=np.float64)
+        self.stds = np.asarray(stds, dtype=np.float64)
+        self.vocabularies = vocabularies
+        self.positions = {}
+        offset = len(NUMERIC_FEATURES)
+        for column in CATEGORICAL_FEATURES:
+            self.positions[column] = {value: offset + i for i, value in enumerate(vocabularies[column])}
+            offset += len(vocabularies[column])
+        self.dim = offset
+
+    @classmethod
+    def fit(cls, rows) -> "FeatureEncoder":
+        numeric = np.array([_numeric_row(row) for row in rows], dtype=np.float64).reshape(-1, len(NUMERIC_FEATURES))
+        means = np.nan_to_num(np.nanmean(numeric, axis=0)) if len(numeric) else np.zeros(len(NUMERIC_FEATURES))
+        stds = np.nan_to_num(np.nanstd(numeric, axis=0)) if len(numeric) else np.ones(len(NUMERIC_FEATURES))
+        stds[stds == 0] = 1.0
+        vocabularies = {
+            column: sorted({c for c in (_category(column, row[column]) for row in rows) if c})
+            for column in CATEGORICAL_FEATURES
+        }
+        return cls(means, stds, vocabularies)
+
+    def encode(self, rows) -> np.ndarray:
+        """L2-normalized float32 feature matrix, one row per vehicle"""
+        numeric = np.array([_numeric_row(row) for row in rows], dtype=np.float64).reshape(-1, len(NUMERIC_FEATURES))
+        matrix = np.zeros((len(rows), self.dim), dtype=np.float32)
+
+        # Missing values sit at the mean, i.e. contribute nothing
+        scaled = np.nan_to_num((numeric - self.means) / self.stds)
+        matrix[:, :len(NUMERIC_FEATURES)] = scaled * np.array(list(NUMERIC_FEATURES.values()))
+
+        for column, weight in CATEGORICAL_FEATURES.items():
+            positions = self.positions[column]
+            for i, row in enumerate(rows):
+                position = positions.get(_category(column, row[column]))
+                if position is not None:
+                    matrix[i, position] = weight
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'means': self.means.tolist(),
+            'stds': self.stds.tolist(),
+            'vocabularies': self.vocabularies
+        })
+
+    @classmethod
+    def from_json(cls, value: str) -> "FeatureEncoder":
+        data = json.loads(value)
+        return cls(data['means'], data['stds'], data['vocabularies'])
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Column indices and values of the k best scores in each row, best first"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.zeros((len(scores), 0), dtype=np.int64), np.zeros((len(scores), 0), dtype=scores.dtype)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+class SimilarityIndex:
+    """Feature matrix plus the precomputed neighbor table"""
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        features: np.ndarray,
+        encoder: FeatureEncoder,
+        neighbors: Optional[np.ndarray] = None,
+        scores: Optional[np.ndarray] = None
+    ):
+        self.ids = ids
+        self.id_to_row = {vehicle_id: i for i, vehicle_id in enumerate(ids.tolist())}
+        self.features = features
+        self.encoder = encoder
+        self.neighbors = neighbors
+        self.scores = scores
+
+    @classmethod
+    def from_db(cls, db: Session) -> "SimilarityIndex":
+        rows = [
+            row._mapping
+            for table in ('raw.used_vehicles', 'raw.new_vehicles')
+            for row in db.execute(text(SIMILARITY_FEATURES_SQL.format(table=table)))
+        ]
+        encoder = FeatureEncoder.fit(rows)
+        ids = np.array([row['vehicle_id'] for row in rows])
+        return cls(ids, encoder.encode(rows), encoder)
+
+    def build_neighbors(self, k: int, batch_size: int = BATCH_SIZE) -> None:
+        """Top-k neighbors of every vehicle, one (batch x n) matrix product at a time"""
+        n = len(self.ids)
+        k = min(k, max(n - 1, 0))
+        self.neighbors = np.zeros((n, k), dtype=np.int32)
+        self.scores = np.zeros((n, k), dtype=np.float16)
+        for start in range(0, n, batch_size):
+            stop = min(start + batch_size, n)
+            block = self.features[start:stop] @ self.features.T
+            # A vehicle is not its own neighbor
+            block[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+            columns, values = top_k(block, k)
+            self.neighbors[start:stop] = columns
+            self.scores[start:stop] = values
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                ids=self.ids.astype(str),
+                features=self.features,
+                neighbors=self.neighbors,
+                scores=self.scores,
+                encoder=np.array(self.encoder.to_json())
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "SimilarityIndex":
+        data = np.load(path, allow_pickle=False)
+        return cls(
+            data['ids'],
+            data['features'],
+            FeatureEncoder.from_json(str(data['encoder'])),
+            data['neighbors'],
+            data['scores']
+        )
+
+    def similar(self, vehicle_id: str, limit: int) -> Optional[List[Tuple[str, float]]]:
+        """Precomputed neighbors of an indexed vehicle, or None if it is not indexed"""
+        row = self.id_to_row.get(vehicle_id)
+        if row is None or self.neighbors is None:
+            return None
+        neighbors = self.neighbors[row, :limit]
+        scores = self.scores[row, :limit]
+        return [(self.ids[n], float(s)) for n, s in zip(neighbors, scores)]
+
+    def similar_to_features(self, row, limit: int, exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Online scoring of a vehicle missing from the table against every indexed one"""
+        vector = self.encoder.encode([row])
+        scores = (self.features @ vector[0])[None, :]
+        exclude_row = self.id_to_row.get(exclude)
+        if exclude_row is not None:
+            scores[0, exclude_row] = -np.inf
+        columns, values = top_k(scores, limit)
+        return [(self.ids[c], float(v)) for c, v in zip(columns[0], values[0])]
+
+
+_index: Optional[SimilarityIndex] = None
+
+
+def index_path() -> str:
+    return os.path.join(settings.MODEL_DIR, 'similar_vehicles.npz')
+
+
+def get_similarity_index() -> Optional[SimilarityIndex]:
+    return _index
+
+
+def load_similarity_index(path: Optional[str] = None) -> Optional[SimilarityIndex]:
+    """Load the precomputed table if the offline job has written one"""
+    global _index
+    path = path or index_path()
+    if not os.path.exists(path):
+        logger.info(f"No similar-vehicles table at {path}; run build_similarity_index.py")
+        return None
+    start_time = time.time()
+    _index = SimilarityIndex.load(path)
+    logger.info(f"Loaded similar-vehicles table: {len(_index.ids):,} vehicles in {time.time() - start_time:.2f}s")
+    return _index
+
+
+def find_similar(db: Session, vehicle_id: str, limit: int) -> Optional[List[Tuple[str, float]]]:
+    """
+    (vehicle_id, score) of the most similar vehicles, best first. Uses the
+    precomputed table, scoring listings newer than the table online; None
+    when no table is loaded or the vehicle does not exist.
+    """
+    index = _index
+    if index is None:
+        return None
+
+    result = index.similar(vehicle_id, limit)
+    if result is not None:
+        return result
+
+    row = None
+    for table in ('raw.used_vehicles', 'raw.new_vehicles'):
+        row = db.execute(
+            text(SIMILARITY_FEATURES_SQL.format(table=table) + " WHERE vehicle_id = :vehicle_id"),
+            {'vehicle_id': vehicle_id}
+        ).first()
+        if row is not None:
+            break
+    if row is None:
+        return None
+    return index.similar_to_features(row._mapping, limit, exclude=vehicle_id)
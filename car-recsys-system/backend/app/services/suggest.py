@@ -0,0 +1,211 @@
+"""
+Typeahead suggestions over brands, models and title terms.
+
+A sorted array of normalized keys answers a prefix with two bisects; the
+matching slice is ranked by a precomputed score (listing count plus
+interaction popularity), so a keystroke never touches the database.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import re
+import threading
+import time
+import numpy as np
+
+from app.core.database import SessionLocal
+from app.services.interaction_weights import INTERACTION_WEIGHT_SQL
+from app.services.vehicle_search import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Popularity points worth one extra listing in the suggestion score
+POPULARITY_WEIGHT = 0.5
+
+# Title terms shorter than this are not suggested on their own
+MIN_TERM_LENGTH = 2
+
+# Per-vehicle popularity, weighted by interaction type
+POPULARITY_SQL = f"""
+    SELECT vehicle_id, SUM({INTERACTION_WEIGHT_SQL})::float8 AS popularity
+    FROM gold.user_interactions
+    WHERE vehicle_id IS NOT NULL
+    GROUP BY vehicle_id
+"""
+
+LISTINGS_SQL = """
+    SELECT vehicle_id, brand, car_model AS model, title FROM raw.used_vehicles
+    UNION ALL
+    SELECT vehicle_id, brand, car_model AS model, title FROM raw.new_vehicles
+"""
+
+
+# car_model values are slugs like "jeep-grand_cherokee-2025"
+MODEL_YEAR_RE = re.compile(r'-[0-9]{4}$')
+
+
+def normalize_prefix(value: Optional[str]) -> str:
+    """Lowercase tokens joined by single spaces, the form every key is stored in"""
+    return ' '.join(tokenize(value))
+
+
+def model_slug(car_model: Optional[str], brand_key: str) -> str:
+    """
+    Model part of a car_model slug, without the make prefix and model year,
+    e.g. "grand_cherokee". Still a substring of car_model, so it works as
+    the `model` search filter.
+    """
+    slug = MODEL_YEAR_RE.sub('', (car_model or '').strip())
+    make, _, rest = slug.partition('-')
+    if rest and brand_key and normalize_prefix(make) == brand_key:
+        slug = rest
+    return slug
+
+
+def model_label(slug: str) -> str:
+    return slug.replace('_', ' ').title()
+
+
+class SuggestIndex:
+    """
+    Suggestion entries plus a sorted key array pointing at them. Models are
+    keyed both as "model" and "brand model", so "tac" and "toyota tac" both
+    reach "Toyota Tacoma".
+    """
+
+    def __init__(
+        self,
+        listings: Iterable[Tuple[str, Optional[str], Optional[str], Optional[str]]],
+        popularity: Dict[str, float]
+    ):
+        # entry key -> [kind, text, value, brand, listings, popularity]; the
+        # last part of the entry key is its normalized lookup key
+        entries: Dict[tuple, list] = {}
+
+        def add(entry_key, kind, display, value, brand, vehicle_popularity):
+            entry = entries.get(entry_key)
+            if entry is None:
+                entry = entries[entry_key] = [kind, display, value, brand, 0, 0.0]
+            elif display < entry[1]:
+                entry[1] = display
+            entry[4] += 1
+            entry[5] += vehicle_popularity
+
+        for vehicle_id, brand, model, title in listings:
+            vehicle_popularity = popularity.get(vehicle_id, 0.0)
+            brand_key = normalize_prefix(brand)
+            slug = model_slug(model, brand_key)
+            model_key = normalize_prefix(slug)
+
+            if brand_key:
+                add(('brand', brand_key), 'brand', brand.strip(), brand_key, None, vehicle_popularity)
+            if model_key:
+                display = f"{brand.strip()} {model_label(slug)}" if brand_key else model_label(slug)
+                add(('model', brand_key, model_key), 'model', display, slug.lower(),
+                    brand_key or None, vehicle_popularity)
+
+            known = set(brand_key.split()) | set(model_key.split())
+            for term in set(tokenize(title)):
+                if len(term) >= MIN_TERM_LENGTH and term not in known:
+                    add(('term', term), 'term', term, term, None, vehicle_popularity)
+
+        # Title terms spelling a brand or model come from rows missing those columns
+        named = {key[-1] for key in entries if key[0] != 'term'}
+        entries = {key: entry for key, entry in entries.items() if key[0] != 'term' or key[-1] not in named}
+
+        self.entries = [
+            {'text': display, 'kind': kind, 'value': value, 'brand': brand, 'count': count}
+            for kind, display, value, brand, count, _ in entries.values()
+        ]
+        scores = [count + POPULARITY_WEIGHT * pop for _, _, _, _, count, pop in entries.values()]
+
+        keyed = []
+        for entry_id, (entry_key, entry) in enumerate(zip(entries, self.entries)):
+            keyed.append((entry_key[-1], entry_id))
+            if entry_key[0] == 'model' and entry['brand']:
+                keyed.append((f"{entry['brand']} {entry_key[-1]}", entry_id))
+        keyed.sort()
+
+        self.keys: List[str] = [key for key, _ in keyed]
+        self.entry_ids = np.array([entry_id for _, entry_id in keyed], dtype=np.int32)
+        self.scores = np.array(scores, dtype=np.float64)[self.entry_ids] if keyed else np.zeros(0)
+        for entry_id, score in enumerate(scores):
+            self.entries[entry_id]['score'] = round(score, 2)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict]:
+        """Best-scoring entries whose key starts with the normalized prefix"""
+        prefix = normalize_prefix(prefix)
+        if not prefix or limit <= 0:
+            return []
+
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + '\uffff', lo)
+        if lo == hi:
+            return []
+
+        # An entry has at most two keys, so 2 * limit candidates hold `limit` distinct entries
+        scores = self.scores[lo:hi]
+        k = 2 * limit
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.lexsort((top, -scores[top]))]
+
+        results = []
+        seen = set()
+        for entry_id in self.entry_ids[lo + top]:
+            if entry_id not in seen:
+                seen.add(entry_id)
+                results.append(self.entries[entry_id])
+                if len(results) == limit:
+                    break
+        return results
+
+
+_index: Optional[SuggestIndex] = None
+_index_lock = threading.Lock()
+
+
+def load_popularity(db: Session) -> Dict[str, float]:
+    return {row.vehicle_id: row.popularity for row in db.execute(text(POPULARITY_SQL))}
+
+
+def build_suggest_index(db: Session, catalog=None) -> SuggestIndex:
+    """
+    (Re)build the index and swap it in. Reuses the in-memory catalog's
+    columns when given, otherwise reads the few needed columns once.
+    """
+    global _index
+    start_time = time.time()
+
+    if catalog is not None:
+        listings = zip(catalog.ids, catalog.display['brand'], catalog.display['model'], catalog.display['title'])
+    else:
+        listings = [tuple(row) for row in db.execute(text(LISTINGS_SQL))]
+
+    index = SuggestIndex(listings, load_popularity(db))
+    _index = index
+    logger.info(f"Built suggest index: {len(index):,} entries in {time.time() - start_time:.2f}s")
+    return index
+
+
+def build_suggest_index_from_db() -> SuggestIndex:
+    db = SessionLocal()
+    try:
+        return build_suggest_index(db)
+    finally:
+        db.close()
+
+
+def get_suggest_index() -> SuggestIndex:
+    """The current index, built on first use if startup did not build one"""
+    if _index is not None:
+        return _index
+    with _index_lock:
+        return _index if _index is not None else build_suggest_index_from_db()
@@ -0,0 +1,124 @@
+"""
+Compact in-process inverted index over tokenized vehicle text
+"""
+from bisect import bisect_left
+from typing import Iterable, List, Optional, Sequence
+import numpy as np
+
+
+def vocab_prefix_range(vocab: Sequence[str], prefix: str) -> range:
+    """Positions of the terms starting with `prefix` in a sorted vocabulary"""
+    lo = bisect_left(vocab, prefix)
+    hi = bisect_left(vocab, prefix + '\uffff', lo)
+    return range(lo, hi)
+
+
+class InvertedIndex:
+    """
+    Term -> document postings stored CSR-style: a sorted vocabulary, an
+    offsets array and one flat int32 array of document ids. Postings of
+    all terms sharing a prefix are contiguous, so a prefix lookup is two
+    bisects and one slice.
+    """
+
+    def __init__(self, docs: Sequence[Iterable[str]]):
+        self.n_docs = len(docs)
+
+        pairs = {}
+        for doc_id, tokens in enumerate(docs):
+            for token in set(tokens):
+                pairs.setdefault(token, []).append(doc_id)
+
+        self.vocab: List[str] = sorted(pairs)
+        lengths = np.fromiter((len(pairs[t]) for t in self.vocab), dtype=np.int64, count=len(self.vocab))
+        self.offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+        self.doc_ids = np.fromiter(
+            (d for t in self.vocab for d in pairs[t]), dtype=np.int32, count=int(self.offsets[-1])
+        )
+
+    def prefix_range(self, prefix: str) -> range:
+        """Ids of vocabulary terms starting with `prefix`"""
+        return vocab_prefix_range(self.vocab, prefix)
+
+    def term_postings(self, term_id: int) -> np.ndarray:
+        return self.doc_ids[self.offsets[term_id]:self.offsets[term_id + 1]]
+
+    def prefix_postings(self, prefix: str) -> np.ndarray:
+        """Document ids (possibly repeated) containing any term with this prefix"""
+        terms = self.prefix_range(prefix)
+        return self.doc_ids[self.offsets[terms.start]:self.offsets[terms.stop]]
+
+    def match_all_prefixes(self, prefixes: Sequence[str]) -> np.ndarray:
+        """Boolean document mask: every prefix matches some term of the document"""
+        mask = np.ones(self.n_docs, dtype=bool)
+        for prefix in prefixes:
+            hit = np.zeros(self.n_docs, dtype=bool)
+            hit[self.prefix_postings(prefix)] = True
+            mask &= hit
+        return mask
+
+
+class BM25Index(InvertedIndex):
+    """
+    InvertedIndex whose postings also carry a BM25 impact. Document lengths
+    are fixed at build time, so each posting stores its length-normalized
+    term-frequency part and a query is one bincount over the postings of
+    its terms.
+    """
+
+    def __init__(self, docs: Sequence[Sequence[str]], k1: float = 1.2, b: float = 0.75):
+        self.n_docs = len(docs)
+        self.k1 = k1
+        self.b = b
+
+        doc_lengths = np.fromiter((len(tokens) for tokens in docs), dtype=np.float32, count=self.n_docs)
+        avg_length = float(doc_lengths.mean()) if self.n_docs and doc_lengths.sum() else 1.0
+
+        postings = {}
+        for doc_id, tokens in enumerate(docs):
+            frequencies = {}
+            for token in tokens:
+                frequencies[token] = frequencies.get(token, 0) + 1
+            for token, tf in frequencies.items():
+                postings.setdefault(token, []).append((doc_id, tf))
+
+        self.vocab: List[str] = sorted(postings)
+        lengths = np.fromiter((len(postings[t]) for t in self.vocab), dtype=np.int64, count=len(self.vocab))
+        self.offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+
+        total = int(self.offsets[-1])
+        self.doc_ids = np.fromiter(
+            (d for t in self.vocab for d, _ in postings[t]), dtype=np.int32, count=total
+        )
+        tf = np.fromiter(
+            (f for t in self.vocab for _, f in postings[t]), dtype=np.float32, count=total
+        )
+        norm = k1 * (1 - b + b * doc_lengths[self.doc_ids] / avg_length)
+        self.impacts = (tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+        # Okapi idf with the +1 that keeps very common terms non-negative
+        self.idf = np.log(1 + (self.n_docs - lengths + 0.5) / (lengths + 0.5)).astype(np.float32)
+
+    def score(self, terms: Sequence[str], mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        BM25 score of every document for the query terms, each expanded as a
+        prefix like the search filter. Postings outside `mask` are skipped.
+        """
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in terms:
+            terms_range = self.prefix_range(term)
+            if not terms_range:
+                continue
+            start, stop = self.offsets[terms_range.start], self.offsets[terms_range.stop]
+            docs = self.doc_ids[start:stop]
+            weights = self.impacts[start:stop] * np.repeat(
+                self.idf[terms_range.start:terms_range.stop],
+                np.diff(self.offsets[terms_range.start:terms_range.stop + 1])
+            )
+            if mask is not None:
+                keep = mask[docs]
+                docs, weights = docs[keep], weights[keep]
+            scores += np.bincount(docs, weights=weights, minlength=self.n_docs).astype(np.float32)
+        return scores
@@ -0,0 +1,438 @@
+"""
+Pluggable vector indexes over the vehicle embeddings.
+
+Every backend answers the same calls: add() inserts or replaces vectors by
+vehicle_id, search() returns (vehicle_id, cosine) lists best first,
+optionally restricted to a set of ids, and save()/load() persist it.
+
+- exact: brute-force blocked matmul over the embedding store's matrix
+- ivfpq: inverted file with product quantization in NumPy, for catalogs
+  where the exact scan gets too slow or the float matrix too large
+- qdrant: adapter for a Qdrant server at QDRANT_URL
+
+VECTOR_INDEX picks the backend the API serves from; bench_vector_index.py
+compares their recall and latency on the current embeddings.
+"""
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence, Tuple
+import logging
+import os
+import time
+import uuid
+import numpy as np
+import scipy.sparse as sp
+
+from app.core.config import settings
+from app.services.embedding_store import (
+    EmbeddingStore,
+    exact_search,
+    get_embedding_store,
+    normalize_rows,
+    write_embeddings
+)
+from app.services.similarity import top_k
+
+try:
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models as qdrant_models
+except ImportError:  # only needed for VECTOR_INDEX=qdrant
+    QdrantClient = None
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('exact', 'ivfpq', 'qdrant')
+
+# Training points per PQ codebook, about 40 per code
+PQ_SAMPLE_SIZE = 10_000
+
+SearchResults = List[List[Tuple[str, float]]]
+
+
+class VectorIndex(ABC):
+    """Interface shared by the backends"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        """Insert vectors, replacing those of ids already indexed"""
+
+    @abstractmethod
+    def search(self, queries: np.ndarray, k: int, allowed_ids: Optional[Sequence[str]] = None) -> SearchResults:
+        """Per query row, up to k (vehicle_id, cosine) pairs best first"""
+
+    @abstractmethod
+    def save(self, path: str) -> None:
+        ...
+
+
+class ExactIndex(VectorIndex):
+    """Exact cosine scan; wraps the memory-mapped store without copying it"""
+
+    def __init__(self, ids: List[str], vectors: np.ndarray):
+        self.ids = list(ids)
+        self.id_to_row = {vehicle_id: i for i, vehicle_id in enumerate(self.ids)}
+        # The filled rows; after the first add() a view into _buffer
+        self.vectors = vectors
+        self._buffer: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_store(cls, store: EmbeddingStore) -> "ExactIndex":
+        return cls(store.ids, store.vectors)
+
+    @classmethod
+    def load(cls, path: str) -> "ExactIndex":
+        return cls.from_store(EmbeddingStore.load(path))
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = normalize_rows(vectors)
+        rows = []
+        for vehicle_id in ids:
+            row = self.id_to_row.get(vehicle_id)
+            if row is None:
+                row = self.id_to_row[vehicle_id] = len(self.ids)
+                self.ids.append(vehicle_id)
+            rows.append(row)
+        count = len(self.ids)
+        if self._buffer is None or count > len(self._buffer):
+            # The mapped store is read-only: the first insert copies it into a
+            # buffer with spare rows, later ones only when the buffer is full
+            grown = np.empty((max(1024, 2 * count), vectors.shape[1]), dtype=np.float32)
+            grown[:len(self.vectors)] = self.vectors
+            self._buffer = grown
+        for row, vector in zip(rows, vectors):
+            self._buffer[row] = vector
+        self.vectors = self._buffer[:count]
+
+    def _mask(self, allowed_ids: Optional[Sequence[str]]) -> Optional[np.ndarray]:
+        if allowed_ids is None:
+            return None
+        mask = np.zeros(len(self.ids), dtype=bool)
+        mask[[self.id_to_row[v] for v in allowed_ids if v in self.id_to_row]] = True
+        return mask
+
+    def search(self, queries: np.ndarray, k: int, allowed_ids: Optional[Sequence[str]] = None) -> SearchResults:
+        rows, scores = exact_search(self.vectors, queries, k, self._mask(allowed_ids))
+        return [
+            [(self.ids[row], float(score)) for row, score in zip(row_ids, row_scores) if row >= 0]
+            for row_ids, row_scores in zip(rows, scores)
+        ]
+
+    def save(self, path: str) -> None:
+        write_embeddings(path, self.ids, self.vectors)
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means (squared Euclidean); empty clusters are reseeded from random points"""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = nearest_centroid(vectors, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        # Per-cluster sums as a sparse one-hot product
+        one_hot = sp.csr_matrix((np.ones(len(vectors), dtype=np.float32), (assignment, np.arange(len(vectors)))), shape=(k, len(vectors)))
+        sums = one_hot @ vectors
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+    return centroids
+
+
+def nearest_centroid(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+    """Index of the closest centroid of every row, in row batches"""
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch_size):
+        block = vectors[start:start + batch_size]
+        # ||x - c||² up to the per-row constant ||x||²
+        assignment[start:start + batch_size] = np.argmin(centroid_norms - 2 * block @ centroids.T, axis=1)
+    return assignment
+
+
+def default_subspaces(dim: int) -> int:
+    """PQ subspaces of 8 dimensions where the size allows, else 4, else 2"""
+    for sub_dim in (8, 4, 2):
+        if dim % sub_dim == 0:
+            return dim // sub_dim
+    return dim
+
+
+class IVFPQIndex(VectorIndex):
+    """
+    Vectors are assigned to the nearest of `nlist` coarse centroids and their
+    residuals are product-quantized into one byte per subspace. For inner
+    products, q·x ≈ q·centroid + Σ LUT[m, code_m], and the lookup table LUT
+    is shared by all lists, so a query costs one (M x 256) table plus a
+    gather over the probed lists.
+
+    Inserts encode with the trained codebooks; a replaced id leaves a dead
+    slot that save() compacts. When `refine` is set, the best candidates are
+    re-scored exactly against that store's vectors.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        codebooks: np.ndarray,
+        ids: Sequence[str] = (),
+        lists: Optional[np.ndarray] = None,
+        codes: Optional[np.ndarray] = None,
+        nprobe: int = 16
+    ):
+        self.centroids = centroids.astype(np.float32)
+        self.codebooks = codebooks.astype(np.float32)
+        self.ids = list(ids)
+        self.id_to_slot = {vehicle_id: i for i, vehicle_id in enumerate(self.ids)}
+        self.lists = lists if lists is not None else np.zeros(0, dtype=np.int32)
+        self.codes = codes if codes is not None else np.zeros((0, len(codebooks)), dtype=np.uint8)
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        self.nprobe = nprobe
+        self.refine: Optional[EmbeddingStore] = None
+        self.refine_factor = 10
+        self._order: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    @property
+    def subspaces(self) -> int:
+        return self.codebooks.shape[0]
+
+    @classmethod
+    def train(
+        cls,
+        vectors: np.ndarray,
+        nlist: Optional[int] = None,
+        subspaces: Optional[int] = None,
+        sample_size: int = 50_000,
+        iterations: int = 10,
+        seed: int = 0
+    ) -> "IVFPQIndex":
+        """Empty index with centroids and codebooks learned from a sample of `vectors`"""
+        rng = np.random.default_rng(seed)
+        sample = vectors if len(vectors) <= sample_size else vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+        sample = normalize_rows(sample)
+        dim = sample.shape[1]
+        nlist = nlist or max(1, min(4096, int(4 * np.sqrt(len(vectors)))))
+        subspaces = subspaces or default_subspaces(dim)
+        if dim % subspaces:
+            raise ValueError(f"dimension {dim} is not divisible into {subspaces} subspaces")
+
+        centroids = normalize_rows(kmeans(sample, nlist, iterations, seed))
+        # 256 codes per subspace need far fewer points than the coarse centroids
+        pq_sample = sample[:PQ_SAMPLE_SIZE]
+        residuals = pq_sample - centroids[nearest_centroid(pq_sample, centroids)]
+        sub_dim = dim // subspaces
+        codebooks = np.zeros((subspaces, 256, sub_dim), dtype=np.float32)
+        for m in range(subspaces):
+            subvectors = np.ascontiguousarray(residuals[:, m * sub_dim:(m + 1) * sub_dim])
+            codebook = kmeans(subvectors, 256, iterations, seed + m)
+            codebooks[m, :len(codebook)] = codebook
+        return cls(centroids, codebooks, nprobe=settings.VECTOR_INDEX_NPROBE)
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        lists = np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+        residuals = vectors - self.centroids[lists]
+        sub_dim = self.codebooks.shape[2]
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for m in range(self.subspaces):
+            codes[:, m] = nearest_centroid(residuals[:, m * sub_dim:(m + 1) * sub_dim], self.codebooks[m])
+        return lists, codes
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        ids = list(ids)
+        lists, codes = self._encode(normalize_rows(vectors))
+        for vehicle_id in ids:
+            slot = self.id_to_slot.get(vehicle_id)
+            if slot is not None:
+                self.alive[slot] = False
+        start = len(self.ids)
+        self.id_to_slot.update((vehicle_id, start + i) for i, vehicle_id in enumerate(ids))
+        self.ids.extend(ids)
+        self.lists = np.concatenate([self.lists, lists])
+        self.codes = np.concatenate([self.codes, codes])
+        # An id repeated within the batch keeps its last vector
+        alive = np.array([self.id_to_slot[vehicle_id] == start + i for i, vehicle_id in enumerate(ids)], dtype=bool)
+        self.alive = np.concatenate([self.alive, alive])
+        self._order = None
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Slots grouped by list and each list's offsets, rebuilt after inserts"""
+        if self._order is None:
+            self._order = np.argsort(self.lists, kind='stable')
+            self._offsets = np.concatenate([[0], np.cumsum(np.bincount(self.lists, minlength=len(self.centroids)))])
+        return self._order, self._offsets
+
+    def search(self, queries: np.ndarray, k: int, allowed_ids: Optional[Sequence[str]] = None) -> SearchResults:
+        queries = normalize_rows(np.atleast_2d(queries))
+        order, offsets = self._inverted_lists()
+        allowed = self.alive
+        allowed_slots = None
+        if allowed_ids is not None:
+            allowed = np.zeros(len(self.ids), dtype=bool)
+            allowed[[self.id_to_slot[v] for v in allowed_ids if v in self.id_to_slot]] = True
+            allowed &= self.alive
+            # A filter smaller than the probed lists is scored in full instead,
+            # so a selective filter cannot come back empty
+            if allowed.sum() * len(self.centroids) <= self.nprobe * len(self.ids):
+                allowed_slots = np.flatnonzero(allowed)
+
+        sub_dim = self.codebooks.shape[2]
+        nprobe = min(self.nprobe, len(self.centroids))
+        candidates = k * self.refine_factor if self.refine is not None else k
+        results = []
+        for query in queries:
+            coarse = self.centroids @ query
+            if allowed_slots is not None:
+                slots = allowed_slots
+            else:
+                probe = np.argpartition(-coarse, nprobe - 1)[:nprobe]
+                slots = np.concatenate([order[offsets[l]:offsets[l + 1]] for l in probe])
+                slots = slots[allowed[slots]]
+            if not len(slots):
+                results.append([])
+                continue
+
+            table = np.einsum('md,mkd->mk', query.reshape(self.subspaces, sub_dim), self.codebooks)
+            scores = coarse[self.lists[slots]] + table[np.arange(self.subspaces), self.codes[slots]].sum(axis=1)
+            columns, values = top_k(scores[None, :], candidates)
+            best = slots[columns[0]]
+
+            if self.refine is not None:
+                rows = [self.refine.id_to_row.get(self.ids[slot], -1) for slot in best]
+                known = np.array([row >= 0 for row in rows], dtype=bool)
+                if known.all():
+                    exact = np.asarray(self.refine.vectors[np.array(rows)], dtype=np.float32) @ query
+                    columns, values = top_k(exact[None, :], k)
+                    best = best[columns[0]]
+                else:
+                    best = best[:k]
+                    values = values[:, :k]
+
+            results.append([(self.ids[slot], float(value)) for slot, value in zip(best, values[0])])
+        return results
+
+    def save(self, path: str) -> None:
+        """Write the live entries, compacting dead slots"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        live = np.flatnonzero(self.alive)
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                codebooks=self.codebooks,
+                ids=np.array([self.ids[slot] for slot in live], dtype=str),
+                lists=self.lists[live],
+                codes=self.codes[live],
+                nprobe=np.array(self.nprobe)
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "IVFPQIndex":
+        data = np.load(path, allow_pickle=False)
+        return cls(
+            data['centroids'], data['codebooks'], data['ids'].tolist(), data['lists'], data['codes'],
+            nprobe=int(data['nprobe'])
+        )
+
+
+# Point ids must be integers or UUIDs, so vehicle ids map to name-based UUIDs
+QDRANT_NAMESPACE = uuid.UUID('6f9c2c1e-5d3a-4c57-9b1f-2a7e0f4d8b61')
+
+
+def qdrant_point_id(vehicle_id: str) -> str:
+    return str(uuid.uuid5(QDRANT_NAMESPACE, vehicle_id))
+
+
+class QdrantIndex(VectorIndex):
+    """Adapter for a Qdrant collection; the server persists it, so save() is a no-op"""
+
+    def __init__(self, url: str = settings.QDRANT_URL, collection: str = 'vehicles', batch_size: int = 256):
+        if QdrantClient is None:
+            raise RuntimeError("VECTOR_INDEX=qdrant needs the qdrant-client package")
+        self.client = QdrantClient(url=url, timeout=10)
+        self.collection = collection
+        self.batch_size = batch_size
+
+    def __len__(self) -> int:
+        if not self._exists():
+            return 0
+        return self.client.count(self.collection, exact=True).count
+
+    def _exists(self) -> bool:
+        return any(c.name == self.collection for c in self.client.get_collections().collections)
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = normalize_rows(vectors)
+        if not self._exists():
+            self.client.create_collection(
+                self.collection,
+                vectors_config=qdrant_models.VectorParams(size=vectors.shape[1], distance=qdrant_models.Distance.COSINE)
+            )
+        ids = list(ids)
+        for start in range(0, len(ids), self.batch_size):
+            self.client.upsert(self.collection, points=[
+                qdrant_models.PointStruct(id=qdrant_point_id(vehicle_id), vector=vector.tolist(), payload={'vehicle_id': vehicle_id})
+                for vehicle_id, vector in zip(ids[start:start + self.batch_size], vectors[start:start + self.batch_size])
+            ])
+
+    def search(self, queries: np.ndarray, k: int, allowed_ids: Optional[Sequence[str]] = None) -> SearchResults:
+        query_filter = None
+        if allowed_ids is not None:
+            query_filter = qdrant_models.Filter(must=[
+                qdrant_models.HasIdCondition(has_id=[qdrant_point_id(v) for v in allowed_ids])
+            ])
+        responses = self.client.search_batch(self.collection, requests=[
+            qdrant_models.SearchRequest(vector=query.tolist(), limit=k, filter=query_filter, with_payload=True)
+            for query in normalize_rows(np.atleast_2d(queries))
+        ])
+        return [[(hit.payload['vehicle_id'], float(hit.score)) for hit in hits] for hits in responses]
+
+    def save(self, path: str) -> None:
+        pass
+
+
+_index: Optional[VectorIndex] = None
+
+
+def ivfpq_path() -> str:
+    return os.path.join(settings.MODEL_DIR, 'vector_index_ivfpq.npz')
+
+
+def get_vector_index() -> Optional[VectorIndex]:
+    return _index
+
+
+def load_vector_index(backend: Optional[str] = None) -> Optional[VectorIndex]:
+    """Open the configured backend; the exact one needs the embedding store mapped first"""
+    global _index
+    backend = backend or settings.VECTOR_INDEX
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown VECTOR_INDEX {backend!r}; expected one of {', '.join(BACKENDS)}")
+
+    start_time = time.time()
+    store = get_embedding_store()
+    if backend == 'exact':
+        if store is None:
+            return None
+        index = ExactIndex.from_store(store)
+    elif backend == 'ivfpq':
+        if not os.path.exists(ivfpq_path()):
+            logger.info(f"No IVF-PQ index at {ivfpq_path()}; run build_vector_index.py")
+            return None
+        index = IVFPQIndex.load(ivfpq_path())
+        index.refine = store
+    else:
+        index = QdrantIndex()
+
+    _index = index
+    logger.info(f"Opened {backend} vector index: {len(index):,} vectors in {time.time() - start_time:.2f}s")
+    return index
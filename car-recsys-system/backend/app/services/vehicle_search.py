@@ -0,0 +1,508 @@
+"""
+Vehicle search service - SQL building, keyset pagination and execution
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import base64
+import json
+import math
+import re
+import threading
+import time
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.schemas.vehicle import VehicleResponse, VehicleSearchRequest
+
+
+# Map API sort fields to table columns (id maps to vehicle_id, the actual PK).
+# relevance is not a column: it ranks the free-text match (see sort_expression)
+SORT_COLUMN_MAP = {
+    'id': 'vehicle_id',
+    'price': 'price',
+    'mileage': 'mileage',
+    'relevance': 'relevance'
+}
+
+# Full-text rank used when SQL serves sort_by=relevance; the in-memory
+# catalog ranks with BM25 over more fields instead
+RELEVANCE_SQL = "ts_rank(v.search_tsv, to_tsquery('simple', :query))"
+
+COUNT_STRATEGIES = ('exact', 'estimated', 'capped')
+
+# Totals keyed by the normalized filter set, so paging through one search never recounts
+_count_cache = TTLCache(maxsize=settings.SEARCH_COUNT_CACHE_SIZE, ttl=settings.SEARCH_COUNT_CACHE_TTL)
+
+# Uncached counts run on a second pooled connection, concurrently with the
+# page query. The semaphore bounds those extra connections; when all are
+# busy the count runs after the page query on the request's own session.
+_count_executor = ThreadPoolExecutor(
+    max_workers=max(settings.SEARCH_COUNT_CONCURRENCY, 1), thread_name_prefix="search-count"
+)
+_count_slots = threading.BoundedSemaphore(max(settings.SEARCH_COUNT_CONCURRENCY, 1))
+
+# Batch searches beyond the first run on their own connections, bounded here
+_batch_executor = ThreadPoolExecutor(
+    max_workers=max(settings.SEARCH_BATCH_CONCURRENCY, 1), thread_name_prefix="search-batch"
+)
+
+# Columns behind VEHICLE_SELECT; shared by both vehicle tables
+VEHICLE_COLUMNS = (
+    'vehicle_id', 'vehicle_url', 'title', 'price', 'brand', 'car_model', 'mileage',
+    'fuel_type', 'transmission', 'exterior_color', 'drivetrain', 'created_at'
+)
+
+# Columns read by search and facets. search_tsv is created with the tables
+# (load_complete_database.py, database/migrations/001-search-text-index.sql)
+SEARCH_COLUMNS = VEHICLE_COLUMNS + ('search_tsv',)
+
+
+def union_vehicles(columns: Tuple[str, ...]) -> str:
+    """Both vehicle tables as one parenthesized UNION ALL of `columns`"""
+    return "(" + " UNION ALL ".join(
+        f"SELECT {', '.join(columns)} FROM {table}"
+        for table in ('raw.used_vehicles', 'raw.new_vehicles')
+    ) + ")"
+
+
+# condition=any: both tables as one relation. Filters and ORDER BY ... LIMIT
+# are pushed into each branch, so the planner merges two index scans.
+ALL_VEHICLES_SQL = union_vehicles(SEARCH_COLUMNS)
+
+# Both tables with only the VEHICLE_SELECT columns, for hydrating rows by id
+VEHICLE_ROWS_SQL = union_vehicles(VEHICLE_COLUMNS)
+
+# Columns projected into VehicleResponse, in response field order
+VEHICLE_SELECT = """
+    vehicle_id AS id,
+    vehicle_url AS url,
+    title,
+    price::text AS price,
+    brand,
+    car_model AS model,
+    '' AS year,
+    mileage::text AS mileage,
+    fuel_type,
+    transmission,
+    '' AS body_type,
+    exterior_color AS color,
+    '' AS seats,
+    '' AS origin,
+    '' AS location,
+    '' AS description,
+    '' AS image_url,
+    '' AS seller_name,
+    '' AS seller_phone,
+    created_at::text AS posted_date
+"""
+
+VEHICLE_FIELDS = tuple(VehicleResponse.model_fields)
+
+
+# The vehicle tables carry no year column; listing titles start with the model year
+TITLE_YEAR_SQL = "substring(title from '^\\s*([0-9]{4})(?![0-9])')::int"
+
+# Word characters as split by the 'simple' text search parser
+TOKEN_RE = re.compile(r'[0-9a-z]+')
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor is malformed or belongs to another sort"""
+
+
+def get_table_name(condition: Optional[str]) -> str:
+    """
+    Determine which relation to query based on condition: one of the
+    vehicle tables, or for "any" both of them merged with UNION ALL so sort,
+    count and keyset pagination run over a single result set
+    """
+    condition = (condition or '').lower()
+    if condition == 'any':
+        return ALL_VEHICLES_SQL
+    return "raw.new_vehicles" if condition == "new" else "raw.used_vehicles"
+
+
+def resolve_sort(sort_by: Optional[str], sort_order: Optional[str]) -> Tuple[str, str]:
+    """Resolve API sort parameters to (column, ASC|DESC)"""
+    sort_column = SORT_COLUMN_MAP.get(sort_by, 'vehicle_id')
+    order = 'ASC' if (sort_order or '').lower() == 'asc' else 'DESC'
+    return sort_column, order
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    """Lowercase word tokens of a free-text value"""
+    return TOKEN_RE.findall(value.lower()) if value else []
+
+
+def to_prefix_tsquery(query: str) -> Optional[str]:
+    """Turn free text into an AND of prefix terms, e.g. 'Honda pass' -> 'honda:* & pass:*'"""
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    return ' & '.join(f"{token}:*" for token in tokens)
+
+
+def normalize_facet(value: str) -> str:
+    """Normalize an exact-valued facet for lower(column) = :value matching"""
+    return value.strip().lower()
+
+
+def build_where_clause(search: VehicleSearchRequest) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build the WHERE clause and bind parameters for the search filters.
+
+    Free text uses the search_tsv GIN index and brand/fuel_type/transmission
+    use lower() expression indexes (database/migrations/001-search-text-index.sql).
+    """
+    conditions = []
+    params = {}
+
+    if search.query:
+        tsquery = to_prefix_tsquery(search.query)
+        if tsquery:
+            conditions.append("search_tsv @@ to_tsquery('simple', :query)")
+            params['query'] = tsquery
+
+    if search.brand:
+        conditions.append("lower(brand) = :brand")
+        params['brand'] = normalize_facet(search.brand)
+
+    if search.model:
+        conditions.append("car_model ILIKE :model")
+        params['model'] = f"%{search.model}%"
+
+    if search.year_min:
+        conditions.append(f"{TITLE_YEAR_SQL} >= :year_min")
+        params['year_min'] = search.year_min
+
+    if search.year_max:
+        conditions.append(f"{TITLE_YEAR_SQL} <= :year_max")
+        params['year_max'] = search.year_max
+
+    if search.price_min:
+        conditions.append("price >= :price_min")
+        params['price_min'] = search.price_min
+
+    if search.price_max:
+        conditions.append("price <= :price_max")
+        params['price_max'] = search.price_max
+
+    if search.mileage_max:
+        conditions.append("mileage <= :mileage_max")
+        params['mileage_max'] = search.mileage_max
+
+    if search.fuel_type:
+        conditions.append("lower(fuel_type) = :fuel_type")
+        params['fuel_type'] = normalize_facet(search.fuel_type)
+
+    if search.transmission:
+        conditions.append("lower(transmission) = :transmission")
+        params['transmission'] = normalize_facet(search.transmission)
+
+    if search.body_type:
+        conditions.append("body_type ILIKE :body_type")
+        params['body_type'] = f"%{search.body_type}%"
+
+    if search.location:
+        conditions.append("location ILIKE :location")
+        params['location'] = f"%{search.location}%"
+
+    where_clause = " AND ".join(conditions) if conditions else "1=1"
+    return where_clause, params
+
+
+def count_cache_key(table_name: str, where_clause: str, params: Dict[str, Any], strategy: str) -> Hashable:
+    """Cache key for a filter set; ILIKE filters are case-insensitive so values are lowercased"""
+    normalized = tuple(sorted(
+        (k, v.strip().lower() if isinstance(v, str) else v) for k, v in params.items()
+    ))
+    return (strategy, table_name, where_clause, normalized)
+
+
+def clear_count_cache() -> None:
+    _count_cache.clear()
+
+
+def count_vehicles(
+    db: Session,
+    table_name: str,
+    where_clause: str,
+    params: Dict[str, Any],
+    strategy: str
+) -> Tuple[int, str]:
+    """
+    Count rows matching the filters. Returns (total, relation) where relation
+    is "eq" for an exact total, "gte" when capped and "approx" for estimates.
+    """
+    if strategy == 'estimated':
+        plan = db.execute(
+            text(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {table_name} v WHERE {where_clause}"), params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), 'approx'
+
+    if strategy == 'capped':
+        cap = settings.SEARCH_COUNT_CAP
+        capped_sql = f"SELECT COUNT(*) FROM (SELECT 1 FROM {table_name} v WHERE {where_clause} LIMIT :count_limit) capped"
+        total = db.execute(text(capped_sql), {**params, 'count_limit': cap + 1}).scalar()
+        if total > cap:
+            return cap, 'gte'
+        return total, 'eq'
+
+    count_sql = f"SELECT COUNT(*) FROM {table_name} v WHERE {where_clause}"
+    return db.execute(text(count_sql), params).scalar(), 'eq'
+
+
+def cursor_sort_column(sort_column: str, engine: str) -> str:
+    """
+    Sort column as recorded in a cursor. Column sorts page identically on
+    both engines, but relevance scores do not (ts_rank vs BM25), so a
+    relevance cursor names the engine that issued it.
+    """
+    return f"{sort_column}:{engine}" if sort_column == 'relevance' else sort_column
+
+
+def _count_in_new_session(table_name: str, where_clause: str, params: Dict[str, Any], strategy: str) -> Tuple[int, str]:
+    db = SessionLocal()
+    try:
+        return count_vehicles(db, table_name, where_clause, params, strategy)
+    finally:
+        db.close()
+        _count_slots.release()
+
+
+def encode_cursor(
+    sort_column: str, order: str, sort_value: Optional[str], vehicle_id: str, engine: str = 'sql'
+) -> str:
+    """Encode the last row's sort key and vehicle_id tie-breaker as an opaque token"""
+    payload = json.dumps(
+        [cursor_sort_column(sort_column, engine), order, sort_value, vehicle_id], separators=(',', ':')
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort_column: str, order: str, engine: str = 'sql') -> Tuple[Optional[str], str]:
+    """Decode a cursor into (sort_value, vehicle_id), checking it matches the current sort and engine"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_column, cursor_order, sort_value, vehicle_id = json.loads(
+            base64.urlsafe_b64decode(padded.encode())
+        )
+    except (ValueError, TypeError):
+        raise InvalidCursorError("Malformed cursor")
+
+    expected_column = cursor_sort_column(sort_column, engine)
+    if cursor_column != expected_column and str(cursor_column).split(':')[0] == sort_column:
+        raise InvalidCursorError("Cursor was issued by a different search engine")
+
+    if cursor_column != expected_column or cursor_order != order or not isinstance(vehicle_id, str):
+        raise InvalidCursorError("Cursor does not match the requested sort order")
+
+    return sort_value, vehicle_id
+
+
+def sort_expression(sort_column: str, params: Dict[str, Any]) -> str:
+    """
+    SQL expression for a resolved sort column. Columns are qualified with the
+    `v` table alias, otherwise Postgres would sort by the ::text output
+    columns of the same name. Relevance without a text query ranks all rows equal.
+    """
+    if sort_column == 'relevance':
+        return RELEVANCE_SQL if 'query' in params else "0::real"
+    return f"v.{sort_column}"
+
+
+def build_keyset_clause(
+    sort_expr: str,
+    order: str,
+    sort_value: Optional[str],
+    vehicle_id: str,
+    params: Dict[str, Any]
+) -> str:
+    """
+    Build the predicate selecting rows strictly after the cursor position for
+    ORDER BY sort_expr <order> NULLS LAST, vehicle_id <order>
+    """
+    op = '>' if order == 'ASC' else '<'
+    params['cursor_id'] = vehicle_id
+
+    if sort_expr == 'v.vehicle_id':
+        return f"v.vehicle_id {op} :cursor_id"
+
+    if sort_value is None:
+        # Already inside the NULLS LAST tail, only the tie-breaker moves forward
+        return f"({sort_expr} IS NULL AND v.vehicle_id {op} :cursor_id)"
+
+    params['cursor_value'] = sort_value
+    return (
+        f"({sort_expr} {op} :cursor_value"
+        f" OR ({sort_expr} = :cursor_value AND v.vehicle_id {op} :cursor_id)"
+        f" OR {sort_expr} IS NULL)"
+    )
+
+
+def build_order_clause(sort_expr: str, order: str) -> str:
+    """ORDER BY with vehicle_id tie-breaker so keyset pagination is deterministic"""
+    if sort_expr == 'v.vehicle_id':
+        return f"v.vehicle_id {order}"
+    return f"{sort_expr} {order} NULLS LAST, v.vehicle_id {order}"
+
+
+def rows_to_dicts(rows) -> List[Dict[str, Any]]:
+    """
+    Map projected VEHICLE_SELECT rows straight to VehicleResponse-shaped dicts.
+    List endpoints encode these with ORJSONResponse instead of building and
+    re-validating one Pydantic model per row.
+    """
+    return [{field: row._mapping[field] for field in VEHICLE_FIELDS} for row in rows]
+
+
+def search_vehicles(db: Session, search: VehicleSearchRequest) -> Dict[str, Any]:
+    """
+    Run a filtered vehicle search on the requested engine. The in-memory
+    catalog answers when selected and loaded, otherwise SQL does.
+    Relevance sorts prefer the catalog's BM25 ranking whenever it is loaded,
+    unless the sql engine was asked for explicitly. Their cursors only page
+    on the engine that issued them.
+    """
+    from app.services.catalog import get_catalog
+
+    engine = search.engine or settings.SEARCH_ENGINE
+    if search.sort_by == 'relevance' and search.engine is None:
+        engine = 'memory'
+    catalog = get_catalog() if engine == 'memory' else None
+    if catalog is not None:
+        return catalog.search(search)
+    return search_vehicles_sql(db, search)
+
+
+def search_vehicles_sql(db: Session, search: VehicleSearchRequest) -> Dict[str, Any]:
+    """
+    Run a filtered vehicle search in Postgres. Returns a
+    VehicleSearchResponse-shaped dict.
+
+    Pages by OFFSET when no cursor is given (backwards compatible), or by
+    keyset when `search.cursor` is set. Both modes return `next_cursor` when
+    more rows follow, so clients can switch to keyset after the first page.
+
+    The total comes from the count cache when the same filters were counted
+    recently; otherwise it is computed on a second connection while the page
+    query runs, or after it when every count slot is busy. Callers run this
+    off the event loop, so waiting on the count never blocks it.
+    """
+    table_name = get_table_name(search.condition)
+    where_clause, params = build_where_clause(search)
+    sort_column, order = resolve_sort(search.sort_by, search.sort_order)
+
+    strategy = search.count_strategy or settings.SEARCH_COUNT_STRATEGY
+    if strategy not in COUNT_STRATEGIES:
+        strategy = 'exact'
+
+    count_key = count_cache_key(table_name, where_clause, params, strategy)
+    count_params = dict(params)
+
+    sort_expr = sort_expression(sort_column, params)
+
+    page_where = where_clause
+    if search.cursor:
+        sort_value, cursor_id = decode_cursor(search.cursor, sort_column, order)
+        page_where = f"{where_clause} AND {build_keyset_clause(sort_expr, order, sort_value, cursor_id, params)}"
+        params['offset'] = 0
+    else:
+        params['offset'] = (search.page - 1) * search.page_size
+
+    cached_count = _count_cache.get(count_key)
+    count_future = None
+    if cached_count is None and _count_slots.acquire(blocking=False):
+        count_future = _count_executor.submit(
+            _count_in_new_session, table_name, where_clause, count_params, strategy
+        )
+
+    # Fetch one extra row to know whether another page follows
+    params['limit'] = search.page_size + 1
+
+    query_sql = f"""
+        SELECT {VEHICLE_SELECT}, ({sort_expr})::text AS sort_key
+        FROM {table_name} v
+        WHERE {page_where}
+        ORDER BY {build_order_clause(sort_expr, order)}
+        LIMIT :limit OFFSET :offset
+    """
+
+    rows = db.execute(text(query_sql), params).fetchall()
+    has_more = len(rows) > search.page_size
+    rows = rows[:search.page_size]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(sort_column, order, last.sort_key, last.id)
+
+    if count_future is not None:
+        cached_count = count_future.result()
+        _count_cache.set(count_key, cached_count)
+    elif cached_count is None:
+        cached_count = count_vehicles(db, table_name, where_clause, count_params, strategy)
+        _count_cache.set(count_key, cached_count)
+    total, total_relation = cached_count
+
+    total_pages = math.ceil(total / search.page_size) if total > 0 else 0
+
+    return {
+        'results': rows_to_dicts(rows),
+        'total': total,
+        'total_relation': total_relation,
+        'page': search.page,
+        'page_size': search.page_size,
+        'total_pages': total_pages,
+        'next_cursor': next_cursor
+    }
+
+
+def _timed_search(db: Session, search: VehicleSearchRequest) -> Dict[str, Any]:
+    """One batch item: the response or its error, with elapsed milliseconds"""
+    start_time = time.perf_counter()
+    item: Dict[str, Any] = {'response': None, 'error': None}
+    try:
+        item['response'] = search_vehicles(db, search)
+    except InvalidCursorError as e:
+        item['error'] = str(e)
+    item['took_ms'] = round((time.perf_counter() - start_time) * 1000, 3)
+    return item
+
+
+def _timed_search_in_new_session(search: VehicleSearchRequest) -> Dict[str, Any]:
+    db = SessionLocal()
+    try:
+        return _timed_search(db, search)
+    finally:
+        db.close()
+
+
+def search_vehicles_batch(db: Session, searches: List[VehicleSearchRequest]) -> Dict[str, Any]:
+    """
+    Run several searches for one request; results keep the request order.
+
+    The first search runs on the caller's connection while the rest run
+    concurrently on the bounded batch pool, each on its own connection.
+    With SEARCH_BATCH_CONCURRENCY=1 everything runs in turn on `db`.
+    A failing search (bad cursor) reports its error without failing the batch.
+    """
+    start_time = time.perf_counter()
+
+    if not searches:
+        items = []
+    elif settings.SEARCH_BATCH_CONCURRENCY <= 1:
+        items = [_timed_search(db, search) for search in searches]
+    else:
+        futures = [_batch_executor.submit(_timed_search_in_new_session, search) for search in searches[1:]]
+        items = [_timed_search(db, searches[0])] + [future.result() for future in futures]
+
+    return {
+        'results': items,
+        'took_ms': round((time.perf_counter() - start_time) * 1000, 3)
+    }
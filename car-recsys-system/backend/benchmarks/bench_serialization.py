@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: per-page serialization cost of list endpoints.
+
+Compares the previous path (one VehicleResponse per row, then FastAPI's
+response_model validation and jsonable_encoder + json.dumps) with the
+fast path (SQL rows mapped to dicts, encoded once by ORJSONResponse).
+Uses synthetic rows shaped like VEHICLE_SELECT, so no database is needed.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization [--page-size 100] [--repeat 200]
+"""
+import argparse
+import statistics
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.responses import ORJSONResponse
+from app.schemas.vehicle import VehicleResponse, VehicleSearchResponse
+from app.services.vehicle_search import VEHICLE_FIELDS
+
+
+def make_rows(n: int):
+    rows = []
+    for i in range(n):
+        row = {field: '' for field in VEHICLE_FIELDS}
+        row.update(
+            id=f"1HGCM82633A{i:06d}",
+            url=f"https://www.cars.com/vehicledetail/{i:08d}/",
+            title=f"2024 Honda Accord Sport {i}",
+            price=f"{25000 + i * 13}.0",
+            brand="Honda",
+            model="honda-accord-2024",
+            mileage=f"{12000 + i * 7}.0",
+            fuel_type="Gasoline",
+            transmission="Automatic",
+            color="Platinum White Pearl",
+            posted_date="2025-10-01 12:00:00.000000",
+        )
+        rows.append(row)
+    return rows
+
+
+def page_meta(rows):
+    return {'total': 12345, 'total_relation': 'eq', 'page': 1, 'page_size': len(rows),
+            'total_pages': 124, 'next_cursor': 'WyJ2ZWhpY2xlX2lkIiwiREVTQyIsbnVsbCwiMSJd'}
+
+
+def serialize_before(rows) -> bytes:
+    """Endpoint builds models, FastAPI re-validates and encodes via response_model"""
+    response = VehicleSearchResponse(results=[VehicleResponse(**row) for row in rows], **page_meta(rows))
+    validated = VehicleSearchResponse.model_validate(response, from_attributes=True)
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def serialize_after(rows) -> bytes:
+    """Rows are already dicts; one orjson call"""
+    return ORJSONResponse({'results': rows, **page_meta(rows)}).body
+
+
+def bench(fn, rows, repeat: int):
+    fn(rows)  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(rows)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.mean(timings), timings[len(timings) // 2], timings[int(len(timings) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    rows = make_rows(args.page_size)
+    assert len(serialize_after(rows)) > 0
+
+    print('=' * 80)
+    print(f"Serialization per page ({args.page_size} rows, {args.repeat} runs)")
+    print('=' * 80)
+    results = {}
+    for name, fn in [('pydantic + response_model', serialize_before), ('dict + orjson', serialize_after)]:
+        mean, p50, p99 = bench(fn, rows, args.repeat)
+        results[name] = mean
+        print(f"  {name:28s} mean {mean:8.3f} ms   p50 {p50:8.3f} ms   p99 {p99:8.3f} ms")
+    print('-' * 80)
+    print(f"  speedup: {results['pydantic + response_model'] / results['dict + orjson']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: recall and latency of the vector index backends.
+
+Holds out a sample of the vehicle embeddings as queries, indexes the rest
+with each backend and compares recall@k against the exact scan, along
+with build time, index size and per-query latency. Uses the embedding
+store in MODEL_DIR, or clustered synthetic vectors with --synthetic.
+
+Usage (from backend/):
+    python -m benchmarks.bench_vector_index [--k 10] [--queries 200] [--nprobe 4,16,64]
+        [--synthetic 100000 --dim 384] [--qdrant-url http://localhost:6333]
+"""
+import argparse
+import time
+import numpy as np
+
+from app.services.embedding_store import EmbeddingStore, normalize_rows, store_dir
+from app.services.vector_index import ExactIndex, IVFPQIndex, QdrantIndex
+
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Points scattered around a few hundred topic centers, like text embeddings of listings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 250), dim))
+    return normalize_rows(centers[rng.integers(0, len(centers), n)] + 0.35 * rng.standard_normal((n, dim)))
+
+
+def timed_search(index, queries: np.ndarray, k: int):
+    """Results and per-query latencies in ms, one query per call as the API issues them"""
+    results, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.extend(index.search(query, k))
+        timings.append((time.perf_counter() - start) * 1000)
+    return results, np.array(timings)
+
+
+def recall(results, truth, k: int) -> float:
+    return float(np.mean([len({v for v, _ in r} & {v for v, _ in t}) / k for r, t in zip(results, truth)]))
+
+
+def report(name: str, build_s: float, size_mb: float, results, timings: np.ndarray, truth, k: int):
+    print(f"{name:<28} {build_s:>8.2f} {size_mb:>9.1f} {recall(results, truth, k):>9.3f} "
+          f"{np.percentile(timings, 50):>8.2f} {np.percentile(timings, 95):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--nprobe', default='4,16,64', help='comma-separated IVF-PQ probe counts')
+    parser.add_argument('--synthetic', type=int, default=0, help='use N synthetic vectors instead of the store')
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--qdrant-url', default=None, help='also benchmark a Qdrant server (uses a scratch collection)')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic, args.dim)
+        ids = [f"synthetic-{i}" for i in range(len(vectors))]
+        source = 'synthetic'
+    else:
+        store = EmbeddingStore.load(store_dir())
+        vectors, ids = np.asarray(store.vectors, dtype=np.float32), store.ids
+        source = store_dir()
+
+    rng = np.random.default_rng(1)
+    held_out = np.zeros(len(ids), dtype=bool)
+    held_out[rng.choice(len(ids), min(args.queries, len(ids) // 10), replace=False)] = True
+    queries = vectors[held_out]
+    ids = [vehicle_id for vehicle_id, q in zip(ids, held_out) if not q]
+    vectors = vectors[~held_out]
+    print(f"{source}: {len(ids):,} vectors x {vectors.shape[1]}, {len(queries)} held-out queries, k={args.k}\n")
+
+    print(f"{'backend':<28} {'build s':>8} {'size MB':>9} {'recall':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    start = time.perf_counter()
+    exact = ExactIndex(ids, vectors)
+    truth, timings = timed_search(exact, queries, args.k)
+    report('exact', time.perf_counter() - start, vectors.nbytes / 2**20, truth, timings, truth, args.k)
+
+    start = time.perf_counter()
+    ivfpq = IVFPQIndex.train(vectors)
+    ivfpq.add(ids, vectors)
+    build_s = time.perf_counter() - start
+    size_mb = (ivfpq.codes.nbytes + ivfpq.lists.nbytes + ivfpq.centroids.nbytes + ivfpq.codebooks.nbytes) / 2**20
+    refine_store = EmbeddingStore(ids, vectors)
+    for nprobe in (int(n) for n in args.nprobe.split(',')):
+        ivfpq.nprobe = nprobe
+        for refine in (None, refine_store):
+            ivfpq.refine = refine
+            results, timings = timed_search(ivfpq, queries, args.k)
+            name = f"ivfpq nprobe={nprobe}" + (" +refine" if refine is not None else "")
+            report(name, build_s, size_mb, results, timings, truth, args.k)
+
+    if args.qdrant_url:
+        qdrant = QdrantIndex(url=args.qdrant_url, collection='bench_vector_index')
+        qdrant.client.delete_collection(qdrant.collection)
+        start = time.perf_counter()
+        qdrant.add(ids, vectors)
+        build_s = time.perf_counter() - start
+        results, timings = timed_search(qdrant, queries, args.k)
+        report('qdrant', build_s, float('nan'), results, timings, truth, args.k)
+        qdrant.client.delete_collection(qdrant.collection)
+
+
+if __name__ == "__main__":
+    main()
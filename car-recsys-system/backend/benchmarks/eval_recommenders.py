@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""
+Benchmark: offline quality, latency and memory of the recommenders.
+
+Splits the interaction log by time (the last --test-fraction of it is the
+test period), builds every strategy behind /reco/* from the training
+events only, and asks each for K vehicles per test user with a training
+history. A hit is a vehicle the user interacted with in the test period
+and not before. Reports, per strategy:
+
+    recall@K, NDCG@K   against the test-period vehicles
+    coverage           share of the catalog recommended to anyone
+    diversity          1 - mean pairwise cosine of the listed vehicles'
+                       similarity features (needs vehicle attributes)
+    p50/p95/p99 ms     one user per call, as the API scores them
+    peak MB            traced Python/NumPy allocations while building and
+                       while scoring
+
+Runs on a synthetic dataset (--synthetic USERS) or on one exported from
+the database with --export DIR, so no live service is needed. Writes
+<output>.json and <output>.md; keep the JSON of a baseline to compare.
+
+Usage (from backend/):
+    python -m benchmarks.eval_recommenders --synthetic 5000 [--vehicles 3000]
+    python -m benchmarks.eval_recommenders --export data/eval      # needs the database
+    python -m benchmarks.eval_recommenders --data data/eval [--k 20] [--test-fraction 0.2]
+        [--max-users 2000] [--strategies popular,candidate,als,hybrid] [--output eval_report]
+"""
+import argparse
+import csv
+import json
+import os
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+from app.core.config import settings
+from app.services import als, cooccurrence, hybrid, sessions
+from app.services.embedding_store import EmbeddingStore
+from app.services.popularity import PopularityModel
+from app.services.similarity import SIMILARITY_FEATURES_SQL, FeatureEncoder, SimilarityIndex
+from app.services.interaction_weights import interaction_weight
+
+INTERACTIONS_FILE = 'interactions.csv'
+VEHICLES_FILE = 'vehicles.csv'
+
+INTERACTION_COLUMNS = ('user_id', 'vehicle_id', 'interaction_type', 'interaction_score', 'created_at')
+VEHICLE_COLUMNS = ('vehicle_id', 'title', 'brand', 'drivetrain', 'fuel_type', 'transmission', 'mpg', 'price', 'mileage', 'rating')
+NUMERIC_COLUMNS = ('price', 'mileage', 'rating')
+
+EXPORT_INTERACTIONS_SQL = """
+    SELECT user_id::text, vehicle_id, interaction_type, interaction_score,
+           EXTRACT(EPOCH FROM created_at)::float8 AS created_at
+    FROM gold.user_interactions
+    WHERE user_id IS NOT NULL AND vehicle_id IS NOT NULL
+    ORDER BY created_at
+"""
+
+STRATEGIES = ('popular', 'candidate', 'similar', 'session', 'als', 'hybrid')
+
+# (user_id, vehicle_id, interaction_type, interaction_score, created_at)
+Event = Tuple[str, str, str, Optional[float], float]
+
+SYNTHETIC_BRANDS = [
+    'Toyota', 'Honda', 'Ford', 'Chevrolet', 'Nissan', 'Hyundai', 'Kia', 'Subaru', 'Mazda', 'Jeep',
+    'BMW', 'Mercedes-Benz', 'Audi', 'Lexus', 'Volkswagen', 'Tesla', 'Ram', 'GMC', 'Volvo', 'Porsche'
+]
+# Synthetic logs end at a fixed time, so reports of the same seed are identical
+SYNTHETIC_END = 1_767_225_600.0  # 2026-01-01 UTC
+SYNTHETIC_INTERACTIONS = {'view': 0.70, 'click': 0.12, 'compare': 0.06, 'favorite': 0.08, 'contact': 0.04}
+
+
+def synthetic_dataset(n_users: int, n_vehicles: int, seed: int = 0) -> Tuple[List[Event], List[Dict]]:
+    """
+    Users browsing over 90 days, mostly within one or two favorite brands
+    and a price band, otherwise following a long-tailed global popularity
+    """
+    rng = np.random.default_rng(seed)
+    brand_share = 1 / np.arange(1, len(SYNTHETIC_BRANDS) + 1) ** 0.7
+    brands = rng.choice(len(SYNTHETIC_BRANDS), n_vehicles, p=brand_share / brand_share.sum())
+    tiers = 20_000 * (1 + brands / 6)
+    prices = np.round(tiers * rng.lognormal(0, 0.35, n_vehicles), -2)
+    vehicles = [
+        {
+            'vehicle_id': f"SYN{i:07d}",
+            'title': f"{rng.integers(2012, 2026)} {SYNTHETIC_BRANDS[b]} Model {i % 9}",
+            'brand': SYNTHETIC_BRANDS[b],
+            'drivetrain': rng.choice(['Front-wheel Drive', 'All-wheel Drive', 'Rear-wheel Drive', 'Four-wheel Drive']),
+            'fuel_type': rng.choice(['Gasoline', 'Hybrid', 'Electric', 'Diesel'], p=[0.75, 0.12, 0.08, 0.05]),
+            'transmission': rng.choice(['Automatic', '6-Speed M/T', 'Automatic CVT'], p=[0.75, 0.1, 0.15]),
+            'mpg': f"{rng.integers(18, 32)}–{rng.integers(26, 42)}",
+            'price': float(p),
+            'mileage': float(rng.integers(0, 120_000)),
+            'rating': float(np.round(rng.uniform(3, 5), 1)),
+        }
+        for i, (b, p) in enumerate(zip(brands, prices))
+    ]
+
+    popularity = 1 / (rng.permutation(n_vehicles) + 10) ** 0.8
+    popularity /= popularity.sum()
+    by_brand = {b: np.flatnonzero(brands == b) for b in range(len(SYNTHETIC_BRANDS))}
+    types, type_p = list(SYNTHETIC_INTERACTIONS), list(SYNTHETIC_INTERACTIONS.values())
+
+    events: List[Event] = []
+    now = SYNTHETIC_END
+    for u in range(n_users):
+        user_id = f"user-{u:06d}"
+        favorite = [b for b in rng.choice(len(SYNTHETIC_BRANDS), 2, p=brand_share / brand_share.sum()) if len(by_brand[b])]
+        pool = np.concatenate([by_brand[b] for b in favorite]) if favorite else np.arange(n_vehicles)
+        budget = rng.choice(prices[pool])
+        weights = popularity[pool] * np.exp(-np.abs(np.log(prices[pool] / budget)) * 3)
+        weights /= weights.sum()
+        # Returning every day or two, a few weeks in total
+        t = now - rng.uniform(0, 90) * 86400
+        for _ in range(1 + rng.geometric(1 / 12)):
+            t += rng.exponential(1.5 * 86400)
+            if t > now:
+                break
+            row = rng.choice(pool, p=weights) if rng.random() < 0.75 else rng.choice(n_vehicles, p=popularity)
+            events.append((user_id, vehicles[row]['vehicle_id'], rng.choice(types, p=type_p), 1.0, t))
+    events.sort(key=lambda event: event[4])
+    return events, vehicles
+
+
+def export_dataset(directory: str) -> None:
+    """Write the interaction log and the vehicle attributes to CSV files"""
+    from sqlalchemy import text
+    from app.core.database import SessionLocal
+
+    os.makedirs(directory, exist_ok=True)
+    db = SessionLocal()
+    try:
+        with open(os.path.join(directory, INTERACTIONS_FILE), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(INTERACTION_COLUMNS)
+            writer.writerows(db.execute(text(EXPORT_INTERACTIONS_SQL)))
+        with open(os.path.join(directory, VEHICLES_FILE), 'w', newline='') as f:
+            writer = csv.DictWriter(f, VEHICLE_COLUMNS)
+            writer.writeheader()
+            for table in ('raw.used_vehicles', 'raw.new_vehicles'):
+                for row in db.execute(text(SIMILARITY_FEATURES_SQL.format(table=table))):
+                    writer.writerow(dict(row._mapping))
+    finally:
+        db.close()
+
+
+def load_dataset(directory: str) -> Tuple[List[Event], List[Dict]]:
+    with open(os.path.join(directory, INTERACTIONS_FILE), newline='') as f:
+        events = [
+            (row['user_id'], row['vehicle_id'], row['interaction_type'],
+             float(row['interaction_score']) if row['interaction_score'] else None, float(row['created_at']))
+            for row in csv.DictReader(f)
+        ]
+    events.sort(key=lambda event: event[4])
+    vehicles = []
+    path = os.path.join(directory, VEHICLES_FILE)
+    if os.path.exists(path):
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                for column in NUMERIC_COLUMNS:
+                    row[column] = float(row[column]) if row[column] else None
+                vehicles.append(row)
+    return events, vehicles
+
+
+class TrainingData:
+    """Training events as the services see them: the damped matrix, histories and recent events"""
+
+    def __init__(self, events: List[Event], cutoff: float):
+        self.events = events
+        self.cutoff = cutoff
+        users: Dict[str, int] = {}
+        items: Dict[str, int] = {}
+        user_rows = np.fromiter((users.setdefault(e[0], len(users)) for e in events), dtype=np.int64, count=len(events))
+        item_rows = np.fromiter((items.setdefault(e[1], len(items)) for e in events), dtype=np.int64, count=len(events))
+        weights = np.fromiter((interaction_weight(e[2], e[3]) for e in events), dtype=np.float64, count=len(events))
+        self.users, self.items = list(users), list(items)
+
+        # Summed weight per (user, vehicle), as INTERACTIONS_SQL aggregates it
+        pairs, inverse = np.unique(user_rows * len(items) + item_rows, return_inverse=True)
+        summed = np.bincount(inverse.ravel(), weights=weights)
+        self.matrix = cooccurrence.user_item_matrix(
+            (pairs // max(len(items), 1)).astype(np.int32), (pairs % max(len(items), 1)).astype(np.int32),
+            summed, (len(users), len(items))
+        )
+
+        # Heaviest first, latest first among ties, as USER_HISTORY_SQL orders it
+        last_seen: Dict[Tuple[str, str], float] = {}
+        self.histories: Dict[str, Dict[str, float]] = {}
+        for (user_id, vehicle_id, interaction_type, score, t), weight in zip(events, weights.tolist()):
+            history = self.histories.setdefault(user_id, {})
+            history[vehicle_id] = history.get(vehicle_id, 0.0) + weight
+            last_seen[user_id, vehicle_id] = t
+        for user_id, history in self.histories.items():
+            order = sorted(history, key=lambda v: (-history[v], -last_seen[user_id, v]))
+            self.histories[user_id] = {vehicle_id: history[vehicle_id] for vehicle_id in order}
+
+        self.recent: Dict[str, List[Tuple[str, float, float]]] = {}
+        for user_id, vehicle_id, interaction_type, score, t in events:
+            self.recent.setdefault(user_id, []).append((vehicle_id, interaction_weight(interaction_type, score), t))
+        for user_id, recent in self.recent.items():
+            self.recent[user_id] = recent[-settings.SESSION_WINDOW_SIZE:]
+
+    def seeds(self, user_id: str) -> Dict[str, float]:
+        """Damped weights of the heaviest history vehicles, as hybrid and /reco/candidate seed a user"""
+        history = self.histories[user_id]
+        return {v: float(cooccurrence.damp(w)) for v, w in list(history.items())[:cooccurrence.MAX_SEEDS]}
+
+
+# A built strategy: user_id -> recommended vehicle ids, best first
+Recommender = Callable[[str], List[str]]
+
+
+def _ids(ranked: Sequence[Tuple[str, float]]) -> List[str]:
+    return [vehicle_id for vehicle_id, _ in ranked]
+
+
+def build_popularity(train: TrainingData, vehicles: List[Dict]) -> PopularityModel:
+    model = PopularityModel(settings.POPULARITY_HALF_LIFE_HOURS)
+    model.epoch = train.cutoff
+    for vehicle in vehicles:
+        model.add_vehicle(vehicle['vehicle_id'], vehicle['brand'], vehicle['drivetrain'])
+    for user_id, vehicle_id, interaction_type, score, t in train.events:
+        model.record(model.add_vehicle(vehicle_id, None, None), interaction_type, score, now=t)
+    return model
+
+
+def build_similarity(vehicles: List[Dict]) -> Optional[SimilarityIndex]:
+    if not vehicles:
+        return None
+    encoder = FeatureEncoder.fit(vehicles)
+    index = SimilarityIndex(np.array([v['vehicle_id'] for v in vehicles]), encoder.encode(vehicles), encoder)
+    index.build_neighbors(settings.SIMILAR_NEIGHBORS_K)
+    return index
+
+
+def build_strategy(name: str, train: TrainingData, vehicles: List[Dict], k: int, args) -> Optional[Recommender]:
+    """The strategy's models, built from the training events, behind a per-user call; None if it cannot run"""
+    if name == 'popular':
+        model = build_popularity(train, vehicles)
+        return lambda user_id: _ids(model.top(k, exclude=list(train.histories[user_id])))
+
+    if name == 'candidate':
+        index = cooccurrence.CooccurrenceIndex.from_matrix(np.array(train.items, dtype=str), train.matrix, settings.CANDIDATE_SIZE)
+        return lambda user_id: _ids(index.candidates(train.seeds(user_id), k, exclude=list(train.histories[user_id])))
+
+    if name == 'similar':
+        index = build_similarity(vehicles)
+        if index is None:
+            return None
+
+        def similar(user_id: str) -> List[str]:
+            # The vehicle page of the user's latest training vehicle
+            history = train.histories[user_id]
+            latest = train.recent[user_id][-1][0]
+            return [v for v in _ids(index.similar(latest, k + len(history)) or []) if v not in history][:k]
+        return similar
+
+    if name == 'session':
+        index = cooccurrence.CooccurrenceIndex.from_matrix(np.array(train.items, dtype=str), train.matrix, settings.CANDIDATE_SIZE)
+        similar_index = build_similarity(vehicles)
+        model = build_popularity(train, vehicles)
+
+        def session(user_id: str) -> List[str]:
+            # The user's latest events as one session, scored as sessions.recommend does
+            seeds = sessions.session_seeds(train.recent[user_id])
+            ranked = {'cooccurrence': index.candidates(seeds, settings.CANDIDATE_SIZE)}
+            if similar_index is not None:
+                ranked['similarity'] = sessions.similar_candidates(similar_index, seeds, settings.CANDIDATE_SIZE)
+            fused = hybrid.weighted_fuse(ranked, sessions.SOURCE_WEIGHTS)
+            history = train.histories[user_id]
+            results = [v for v in sorted(fused, key=lambda v: -fused[v]) if v not in history][:k]
+            if len(results) < k:
+                results += _ids(model.top(k - len(results), exclude=[*history, *results]))
+            return results
+        return session
+
+    if name == 'als':
+        model = train_als(train, args)
+        return lambda user_id: _ids(model.candidates(train.seeds(user_id), k, exclude=list(train.histories[user_id])))
+
+    if name == 'hybrid':
+        # The staged pipeline's retrieval and RRF fusion; the embedding source only with --embeddings
+        index = cooccurrence.CooccurrenceIndex.from_matrix(np.array(train.items, dtype=str), train.matrix, settings.CANDIDATE_SIZE)
+        model = train_als(train, args)
+        popular = build_popularity(train, vehicles)
+        store = EmbeddingStore.load(args.embeddings) if args.embeddings else None
+        n = settings.CANDIDATE_SIZE
+
+        def hybrid_ranking(user_id: str) -> List[str]:
+            seeds, exclude = train.seeds(user_id), list(train.histories[user_id])
+            ranked = {
+                'cooccurrence': index.candidates(seeds, n, exclude=exclude),
+                'als': model.candidates(seeds, n, exclude=exclude),
+                'popularity': popular.top(n, exclude=[*seeds, *exclude]),
+            }
+            if store is not None:
+                query = store.query_vector(seeds)
+                ranked['embedding'] = store.similar(query, n, exclude=[*seeds, *exclude]) if query is not None else []
+            fused = hybrid.rrf_fuse(ranked, hybrid.SOURCE_WEIGHTS)
+            return sorted(fused, key=lambda v: -fused[v])[:k]
+        return hybrid_ranking
+
+    raise ValueError(f"Unknown strategy {name}")
+
+
+def train_als(train: TrainingData, args) -> als.AlsModel:
+    user_factors, item_factors = als.train(
+        train.matrix, factors=args.als_factors, iterations=args.als_iterations, workers=args.workers, seed=args.seed
+    )
+    params = {'regularization': als.REGULARIZATION, 'alpha': als.ALPHA}
+    return als.AlsModel(train.users, train.items, user_factors, item_factors, params)
+
+
+def ndcg(recommended: Sequence[str], relevant: set, k: int) -> float:
+    gains = sum(1 / np.log2(i + 2) for i, v in enumerate(recommended[:k]) if v in relevant)
+    ideal = sum(1 / np.log2(i + 2) for i in range(min(len(relevant), k)))
+    return gains / ideal if ideal else 0.0
+
+
+def intra_list_diversity(recommended: Sequence[str], features: Optional[np.ndarray], rows: Dict[str, int]) -> Optional[float]:
+    """1 - mean cosine over the list's distinct pairs; None without attributes or with fewer than two known vehicles"""
+    if features is None:
+        return None
+    known = [rows[v] for v in recommended if v in rows]
+    if len(known) < 2:
+        return None
+    vectors = features[known]
+    similarities = vectors @ vectors.T
+    n = len(known)
+    return float(1 - (similarities.sum() - np.trace(similarities)) / (n * (n - 1)))
+
+
+def evaluate(
+    recommend: Recommender,
+    users: List[str],
+    truth: Dict[str, set],
+    k: int,
+    catalog_size: int,
+    features: Optional[np.ndarray],
+    rows: Dict[str, int]
+) -> Dict:
+    """Quality metrics and per-call latencies of one built strategy"""
+    recalls, ndcgs, diversities, timings = [], [], [], []
+    recommended_any = set()
+    for user_id in users:
+        start = time.perf_counter()
+        recommended = recommend(user_id)
+        timings.append((time.perf_counter() - start) * 1000)
+        relevant = truth[user_id]
+        recalls.append(len(relevant.intersection(recommended[:k])) / min(len(relevant), k))
+        ndcgs.append(ndcg(recommended, relevant, k))
+        recommended_any.update(recommended[:k])
+        diversity = intra_list_diversity(recommended[:k], features, rows)
+        if diversity is not None:
+            diversities.append(diversity)
+    timings = np.array(timings)
+    return {
+        f'recall@{k}': float(np.mean(recalls)),
+        f'ndcg@{k}': float(np.mean(ndcgs)),
+        'coverage': len(recommended_any) / catalog_size if catalog_size else 0.0,
+        'diversity': float(np.mean(diversities)) if diversities else None,
+        'latency_ms': {p: float(np.percentile(timings, int(p[1:]))) for p in ('p50', 'p95', 'p99')},
+    }
+
+
+def peak_mb(fn: Callable):
+    """(fn(), peak traced allocation in MB while it ran)"""
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak / 2**20
+
+
+def markdown_report(report: Dict) -> str:
+    dataset, k = report['dataset'], report['params']['k']
+    lines = [
+        f"# Recommender evaluation ({dataset['source']})",
+        "",
+        f"{dataset['interactions']:,} interactions, {dataset['users']:,} users, {dataset['vehicles']:,} vehicles. "
+        f"Time split at {time.strftime('%Y-%m-%d %H:%M', time.gmtime(dataset['cutoff']))} UTC: "
+        f"{dataset['train_interactions']:,} train / {dataset['test_interactions']:,} test interactions, "
+        f"{dataset['eval_users']:,} evaluated users ({dataset['cold_users']:,} test users without history skipped).",
+        "",
+        f"| strategy | recall@{k} | ndcg@{k} | coverage | diversity | p50 ms | p95 ms | p99 ms | build s | build MB | score MB |",
+        "|---|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    for name, result in report['strategies'].items():
+        if 'skipped' in result:
+            lines.append(f"| {name} | {result['skipped']} |" + " |" * 9)
+            continue
+        diversity = '–' if result['diversity'] is None else f"{result['diversity']:.3f}"
+        latency = result['latency_ms']
+        lines.append(
+            f"| {name} | {result[f'recall@{k}']:.4f} | {result[f'ndcg@{k}']:.4f} | {result['coverage']:.3f} | {diversity} "
+            f"| {latency['p50']:.3f} | {latency['p95']:.3f} | {latency['p99']:.3f} "
+            f"| {result['build_s']:.2f} | {result['build_peak_mb']:.1f} | {result['score_peak_mb']:.1f} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--synthetic', type=int, metavar='USERS', help='evaluate on a synthetic dataset of USERS users')
+    source.add_argument('--data', metavar='DIR', help=f'evaluate on {INTERACTIONS_FILE} (and {VEHICLES_FILE}) in DIR')
+    source.add_argument('--export', metavar='DIR', help='export the database to DIR and exit')
+    parser.add_argument('--vehicles', type=int, default=3000, help='synthetic catalog size')
+    parser.add_argument('--k', type=int, default=settings.TOP_K)
+    parser.add_argument('--test-fraction', type=float, default=0.2, help='latest share of interactions held out')
+    parser.add_argument('--max-users', type=int, default=2000, help='evaluated users, sampled')
+    parser.add_argument('--strategies', default=','.join(STRATEGIES))
+    parser.add_argument('--embeddings', default=None, help='embedding store directory; adds the embedding source to hybrid')
+    parser.add_argument('--als-factors', type=int, default=als.FACTORS)
+    parser.add_argument('--als-iterations', type=int, default=als.ITERATIONS)
+    parser.add_argument('--workers', type=int, default=1, help='ALS solver processes (not traced by the memory peak)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='eval_report', help='writes OUTPUT.json and OUTPUT.md')
+    args = parser.parse_args()
+
+    if args.export:
+        export_dataset(args.export)
+        print(f"✅ Wrote {args.export}/{INTERACTIONS_FILE} and {VEHICLES_FILE}")
+        return
+
+    if args.synthetic:
+        events, vehicles = synthetic_dataset(args.synthetic, args.vehicles, args.seed)
+        source = f"synthetic {args.synthetic} users x {args.vehicles} vehicles, seed {args.seed}"
+    else:
+        events, vehicles = load_dataset(args.data)
+        source = args.data
+    if not events:
+        raise SystemExit("No interactions to evaluate")
+
+    # Time split: the last test_fraction of the time-ordered log is the test
+    # period; split by position, since bulk-loaded logs share timestamps
+    split = min(max(int(len(events) * (1 - args.test_fraction)), 1), len(events) - 1)
+    cutoff = events[split][4]
+    train = TrainingData(events[:split], cutoff)
+    truth: Dict[str, set] = {}
+    for user_id, vehicle_id, *_ in events[split:]:
+        if vehicle_id not in train.histories.get(user_id, {}):
+            truth.setdefault(user_id, set()).add(vehicle_id)
+    users = sorted(u for u in truth if u in train.histories)
+    cold_users = len(truth) - len(users)
+    rng = np.random.default_rng(args.seed)
+    if len(users) > args.max_users:
+        users = sorted(rng.choice(users, args.max_users, replace=False).tolist())
+
+    catalog = {v['vehicle_id'] for v in vehicles} | {e[1] for e in events}
+    features, rows = None, {}
+    if vehicles:
+        features = FeatureEncoder.fit(vehicles).encode(vehicles)
+        rows = {v['vehicle_id']: i for i, v in enumerate(vehicles)}
+
+    report = {
+        'dataset': {
+            'source': source,
+            'interactions': len(events),
+            'users': len({e[0] for e in events}),
+            'vehicles': len(catalog),
+            'cutoff': cutoff,
+            'train_interactions': len(train.events),
+            'test_interactions': len(events) - len(train.events),
+            'eval_users': len(users),
+            'cold_users': cold_users,
+        },
+        'params': {
+            'k': args.k,
+            'test_fraction': args.test_fraction,
+            'max_users': args.max_users,
+            'seed': args.seed,
+            'als_factors': args.als_factors,
+            'als_iterations': args.als_iterations,
+            'embeddings': args.embeddings,
+        },
+        'strategies': {},
+    }
+    print(f"{source}: {len(events):,} interactions, {len(users):,} evaluated users, k={args.k}")
+
+    for name in args.strategies.split(','):
+        start = time.perf_counter()
+        recommend, build_peak = peak_mb(lambda: build_strategy(name, train, vehicles, args.k, args))
+        build_s = time.perf_counter() - start
+        if recommend is None:
+            report['strategies'][name] = {'skipped': 'needs vehicle attributes'}
+            print(f"{name:<10} skipped: needs vehicle attributes")
+            continue
+        # Memory traced on one pass; latencies from an untraced one
+        _, score_peak = peak_mb(lambda: [recommend(user_id) for user_id in users])
+        result = evaluate(recommend, users, truth, args.k, len(catalog), features, rows)
+        result.update(build_s=build_s, build_peak_mb=build_peak, score_peak_mb=score_peak)
+        report['strategies'][name] = result
+        print(f"{name:<10} recall@{args.k} {result[f'recall@{args.k}']:.4f}  ndcg@{args.k} {result[f'ndcg@{args.k}']:.4f}  "
+              f"p95 {result['latency_ms']['p95']:.3f} ms")
+
+    with open(args.output + '.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    with open(args.output + '.md', 'w') as f:
+        f.write(markdown_report(report))
+    print(f"✅ Wrote {args.output}.json and {args.output}.md")
+
+
+if __name__ == "__main__":
+    main()
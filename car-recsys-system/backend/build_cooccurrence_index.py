@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Precompute the item-item co-occurrence neighbor table.
+
+Streams the per-(user, vehicle) interaction weights from
+gold.user_interactions into a sparse user x vehicle matrix, finds the top-N
+co-occurring vehicles of each with blocked sparse products and writes the
+table to MODEL_DIR/cooccurrence.npz, which the API loads at startup and
+keeps current with new interactions. Run nightly, or whenever the live
+updates have drifted far from a fresh build.
+
+Usage (from backend/):
+    python build_cooccurrence_index.py [--k 100] [--output path]
+"""
+import argparse
+import sys
+import time
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services import cooccurrence
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--k', type=int, default=settings.CANDIDATE_SIZE, help='neighbors per vehicle')
+    parser.add_argument('--output', default=cooccurrence.index_path(), help='output .npz path')
+    args = parser.parse_args()
+
+    start_time = time.time()
+    db = SessionLocal()
+    try:
+        index = cooccurrence.CooccurrenceIndex.from_db(db, args.k)
+    finally:
+        db.close()
+    print(f"Computed top-{index.k} co-occurring vehicles of {len(index):,} vehicles "
+          f"in {time.time() - start_time:.2f}s")
+
+    index.save(args.output)
+    print(f"✅ Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Precompute the similar-vehicles neighbor table.
+
+Encodes every listing in raw.used_vehicles and raw.new_vehicles as a
+feature vector, finds the top-K most similar vehicles of each with batched
+matrix products and writes the table to MODEL_DIR/similar_vehicles.npz,
+which the API loads at startup. Run after each data load.
+
+Usage (from backend/):
+    python build_similarity_index.py [--k 50] [--output path]
+"""
+import argparse
+import sys
+import time
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services import similarity
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--k', type=int, default=settings.SIMILAR_NEIGHBORS_K, help='neighbors per vehicle')
+    parser.add_argument('--output', default=similarity.index_path(), help='output .npz path')
+    args = parser.parse_args()
+
+    start_time = time.time()
+    db = SessionLocal()
+    try:
+        index = similarity.SimilarityIndex.from_db(db)
+    finally:
+        db.close()
+    print(f"Encoded {len(index.ids):,} vehicles x {index.features.shape[1]} features "
+          f"in {time.time() - start_time:.2f}s")
+
+    start_time = time.time()
+    index.build_neighbors(args.k)
+    print(f"Computed top-{index.neighbors.shape[1]} neighbors in {time.time() - start_time:.2f}s")
+
+    index.save(args.output)
+    print(f"✅ Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Build the approximate vector index over the vehicle embeddings.
+
+ivfpq trains coarse centroids and PQ codebooks on the embedding store in
+MODEL_DIR/embeddings and writes MODEL_DIR/vector_index_ivfpq.npz; qdrant
+upserts every embedding into the `vehicles` collection at QDRANT_URL. The
+exact backend needs no build. Select the served backend with VECTOR_INDEX.
+
+Usage (from backend/):
+    python build_vector_index.py [--backend ivfpq|qdrant] [--nlist N] [--subspaces M]
+"""
+import argparse
+import sys
+import time
+import numpy as np
+
+from app.services import embedding_store, vector_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--backend', choices=('ivfpq', 'qdrant'), default='ivfpq')
+    parser.add_argument('--nlist', type=int, default=None, help='IVF lists (default 4 * sqrt(n))')
+    parser.add_argument('--subspaces', type=int, default=None, help='PQ subspaces (default dim / 8)')
+    args = parser.parse_args()
+
+    store = embedding_store.EmbeddingStore.load(embedding_store.store_dir())
+    vectors = np.asarray(store.vectors, dtype=np.float32)
+    print(f"Loaded {len(store):,} embeddings x {store.dim}")
+
+    start_time = time.time()
+    if args.backend == 'ivfpq':
+        index = vector_index.IVFPQIndex.train(vectors, nlist=args.nlist, subspaces=args.subspaces)
+        print(f"Trained {len(index.centroids)} lists x {index.subspaces} subspaces in {time.time() - start_time:.2f}s")
+        start_time = time.time()
+        index.add(store.ids, vectors)
+        index.save(vector_index.ivfpq_path())
+        print(f"✅ Encoded and wrote {vector_index.ivfpq_path()} in {time.time() - start_time:.2f}s")
+    else:
+        index = vector_index.QdrantIndex()
+        index.add(store.ids, vectors)
+        print(f"✅ Upserted {len(store):,} vectors into Qdrant in {time.time() - start_time:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
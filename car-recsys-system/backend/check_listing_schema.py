@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Schema check for the listing and search queries against tables built the
+way load_complete_database.py builds them.
+
+Copies a sample of the live raw tables into a scratch database through the
+loader's own create_table_from_dataframe / insert_dataframe /
+add_search_index, so every table has exactly the CSV columns plus `id` and
+`created_at` (no updated_at, unlike database/init/02-create-schema.sql).
+Then runs the listing detail, full, batch, search and facet queries there.
+
+Usage (from backend/, needs pandas like the loader):
+    python check_listing_schema.py
+Exit code 1 on any failure.
+"""
+import io
+import os
+import sys
+
+import pandas as pd
+import psycopg2
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import load_complete_database as loader
+
+from app.core.config import settings
+
+LIVE_URL = make_url(settings.DATABASE_URL).set(drivername='postgresql')
+SCRATCH_URL = LIVE_URL.set(database=f"{LIVE_URL.database}_schema_check")
+
+# Everything below talks to the scratch database, including worker sessions
+settings.DATABASE_URL = SCRATCH_URL.render_as_string(hide_password=False)
+
+from app.core.database import SessionLocal, engine
+from app.schemas.vehicle import VehicleSearchRequest
+from app.services import facets, listings, vehicle_search
+
+# Vehicles copied per vehicle table; related rows follow their vehicle_id
+SAMPLE_SIZE = 20
+
+# Columns the loader adds itself; the rest of a live table is its CSV
+LOADER_COLUMNS = ('id', 'created_at', 'updated_at', 'search_tsv')
+
+# Reviewed vehicles first, so the related tables get real values and the loader
+# infers their column types the way it does from the full CSVs
+SAMPLE_VEHICLES_SQL = """
+    SELECT * FROM {table} v
+    ORDER BY EXISTS (SELECT 1 FROM raw.reviews_ratings r WHERE r.vehicle_id = v.vehicle_id) DESC,
+             v.vehicle_id
+    LIMIT :n
+"""
+
+# (table, sample SQL, primary key, dedupe columns, search index), in the loader's order
+TABLES = [
+    ('raw.used_vehicles', SAMPLE_VEHICLES_SQL.format(table='raw.used_vehicles'),
+     'vehicle_id', 'vehicle_id', 'idx_vehicles_search_tsv'),
+    ('raw.new_vehicles', SAMPLE_VEHICLES_SQL.format(table='raw.new_vehicles'),
+     'vehicle_id', 'vehicle_id', 'idx_new_vehicles_search_tsv'),
+    ('raw.sellers', """SELECT * FROM raw.sellers WHERE seller_key IN (
+         SELECT seller_key FROM raw.seller_vehicle_relationships WHERE vehicle_id = ANY(:ids))""",
+     'seller_key', 'seller_key', None),
+    ('raw.reviews_ratings', "SELECT * FROM raw.reviews_ratings WHERE vehicle_id = ANY(:ids)", None, None, None),
+    ('raw.vehicle_features', "SELECT * FROM raw.vehicle_features WHERE vehicle_id = ANY(:ids)", None, None, None),
+    ('raw.vehicle_images', "SELECT * FROM raw.vehicle_images WHERE vehicle_id = ANY(:ids)", None, None, None),
+    ('raw.seller_vehicle_relationships',
+     "SELECT * FROM raw.seller_vehicle_relationships WHERE vehicle_id = ANY(:ids)",
+     None, ['vehicle_id', 'seller_key'], None),
+]
+
+
+def as_csv_frame(rows, columns) -> pd.DataFrame:
+    """Rows as the loader would read them back from their CSV file"""
+    df = pd.DataFrame(rows, columns=list(columns))
+    df = df.drop(columns=[c for c in LOADER_COLUMNS if c in df.columns])
+    return pd.read_csv(io.StringIO(df.to_csv(index=False)), low_memory=False)
+
+
+def create_scratch_database() -> None:
+    conn = psycopg2.connect(LIVE_URL.render_as_string(hide_password=False))
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute(f'DROP DATABASE IF EXISTS "{SCRATCH_URL.database}"')
+    cur.execute(f'CREATE DATABASE "{SCRATCH_URL.database}"')
+    conn.close()
+
+
+def drop_scratch_database() -> None:
+    engine.dispose()
+    conn = psycopg2.connect(LIVE_URL.render_as_string(hide_password=False))
+    conn.autocommit = True
+    conn.cursor().execute(f'DROP DATABASE IF EXISTS "{SCRATCH_URL.database}"')
+    conn.close()
+
+
+def load_sample() -> dict:
+    """Copy the sample through the loader; returns the sampled vehicle ids per vehicle table"""
+    live = create_engine(LIVE_URL)
+    conn = psycopg2.connect(SCRATCH_URL.render_as_string(hide_password=False))
+    conn.cursor().execute("CREATE SCHEMA raw")
+    conn.commit()
+
+    vehicle_ids = {}
+    try:
+        with live.connect() as live_conn:
+            for table, sample_sql, primary_key, dedupe, search_index in TABLES:
+                ids = [i for table_ids in vehicle_ids.values() for i in table_ids]
+                result = live_conn.execute(text(sample_sql), {'n': SAMPLE_SIZE, 'ids': ids})
+                df = as_csv_frame(result.fetchall(), result.keys())
+                if primary_key == 'vehicle_id':
+                    vehicle_ids[table] = list(df['vehicle_id'])
+                loader.create_table_from_dataframe(conn, table, df, primary_key=primary_key)
+                loader.insert_dataframe(conn, table, df, remove_duplicates_by=dedupe)
+                if search_index:
+                    loader.add_search_index(conn, table, search_index)
+    finally:
+        conn.close()
+        live.dispose()
+    return vehicle_ids
+
+
+def run_checks(vehicle_ids: dict) -> int:
+    used_id, new_id = vehicle_ids['raw.used_vehicles'][0], vehicle_ids['raw.new_vehicles'][0]
+    ids = vehicle_ids['raw.used_vehicles'] + vehicle_ids['raw.new_vehicles']
+    db = SessionLocal()
+    brand = db.execute(text("SELECT brand FROM raw.used_vehicles WHERE brand IS NOT NULL LIMIT 1")).scalar()
+
+    checks = [
+        ("GET /listing/{id} (used)", lambda: listings.get_listing_detail(db, used_id) is not None),
+        ("GET /listing/{id} (new)", lambda: listings.get_listing_detail(db, new_id) is not None),
+        ("GET /listing/{id}/full (used)", lambda: listings.get_listing_full(db, used_id) is not None),
+        ("GET /listing/{id}/full (new)", lambda: listings.get_listing_full(db, new_id) is not None),
+        ("GET /listings/batch", lambda: not listings.get_listings_batch(db, ids)['missing']),
+        ("GET /search?condition=any&query=...", lambda: vehicle_search.search_vehicles_sql(
+            db, VehicleSearchRequest(condition='any', query=brand, count_strategy='exact'))['total'] > 0),
+        ("GET /search/facets", lambda: facets.compute_facets_sql(
+            db, VehicleSearchRequest(condition='any')).total == len(ids)),
+    ]
+
+    failures = 0
+    try:
+        for label, check in checks:
+            try:
+                ok = check()
+                error = None
+            except Exception as e:
+                db.rollback()
+                ok, error = False, str(e).splitlines()[0]
+            print(f"{'✅' if ok else '❌'} {label}" + (f": {error}" if error else ""))
+            failures += not ok
+    finally:
+        db.close()
+    return failures
+
+
+def main():
+    create_scratch_database()
+    try:
+        vehicle_ids = load_sample()
+        print('=' * 80)
+        failures = run_checks(vehicle_ids)
+        print('=' * 80)
+        print(f"Checks against the loader schema, failures: {failures}")
+        return 1 if failures else 0
+    finally:
+        drop_scratch_database()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
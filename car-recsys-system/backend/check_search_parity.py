@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Parity check between the SQL search and the in-memory catalog search.
+
+Runs the same filter/sort/page requests through both engines against the
+live database and compares totals, result rows and next_cursor values,
+including cursors handed from one engine to the other, and facet counts.
+
+Usage (from backend/):
+    python check_search_parity.py
+Exit code 1 on any mismatch.
+"""
+import itertools
+import sys
+
+from app.core.database import SessionLocal
+from app.schemas.vehicle import VehicleSearchRequest
+from app.services import facets, vehicle_search
+from app.services.catalog import load_catalog
+
+FILTER_CASES = [
+    {},
+    {'condition': 'new'},
+    {'condition': 'any'},
+    {'condition': 'any', 'query': 'honda', 'price_max': 50000},
+    {'query': 'honda'},
+    {'query': 'Toyota Tac'},
+    {'query': '2025 awd', 'condition': 'new'},
+    {'brand': 'toyota'},
+    {'brand': 'FORD', 'condition': 'new'},
+    {'model': 'pilot'},
+    {'price_min': 20000, 'price_max': 45000},
+    {'mileage_max': 30000},
+    {'year_min': 2020, 'year_max': 2023},
+    {'fuel_type': 'gasoline', 'transmission': 'automatic'},
+    {'fuel_type': 'Electric', 'condition': 'new'},
+    {'query': 'sport', 'price_max': 60000, 'mileage_max': 50000},
+    {'brand': 'no-such-brand'},
+]
+
+SORTS = list(itertools.product(['id', 'price', 'mileage'], ['asc', 'desc']))
+
+PAGE_SIZE = 7
+CURSOR_PAGES = 3
+
+
+def as_dict(response) -> dict:
+    return response.model_dump() if hasattr(response, 'model_dump') else response
+
+
+def compare(label: str, sql_response, memory_response) -> bool:
+    sql_dump = as_dict(sql_response)
+    memory_dump = as_dict(memory_response)
+    if sql_dump == memory_dump:
+        return True
+
+    print(f"❌ {label}")
+    for key in sql_dump:
+        if sql_dump[key] != memory_dump[key]:
+            if key == 'results':
+                print(f"   results sql:    {[v['id'] for v in sql_dump[key]]}")
+                print(f"   results memory: {[v['id'] for v in memory_dump[key]]}")
+            else:
+                print(f"   {key}: sql={sql_dump[key]!r} memory={memory_dump[key]!r}")
+    return False
+
+
+def without_labels(response):
+    for values in response.facets.values():
+        for value in values:
+            value.label = None
+    return response
+
+
+def main():
+    db = SessionLocal()
+    try:
+        catalog = load_catalog(db)
+        checks = 0
+        failures = 0
+
+        for filters, (sort_by, sort_order) in itertools.product(FILTER_CASES, SORTS):
+            base = dict(filters, sort_by=sort_by, sort_order=sort_order,
+                        page_size=PAGE_SIZE, count_strategy='exact')
+
+            # Offset pages
+            for page in (1, 3):
+                search = VehicleSearchRequest(**base, page=page)
+                ok = compare(f"{base} page={page}",
+                             vehicle_search.search_vehicles_sql(db, search),
+                             catalog.search(search))
+                checks += 1
+                failures += not ok
+
+            # Keyset pages; cursors from SQL are fed to both engines
+            cursor = None
+            for step in range(CURSOR_PAGES):
+                search = VehicleSearchRequest(**base, cursor=cursor)
+                sql_response = vehicle_search.search_vehicles_sql(db, search)
+                ok = compare(f"{base} cursor step={step}", sql_response, catalog.search(search))
+                checks += 1
+                failures += not ok
+                cursor = sql_response['next_cursor']
+                if not cursor:
+                    break
+
+        for filters in FILTER_CASES:
+            search = VehicleSearchRequest(**filters)
+            total, counts, price_counts = catalog.facet_counts(
+                search, facets.FACET_COLUMNS, facets.PRICE_BUCKET_EDGES
+            )
+            # Labels are display spellings picked by collation order, so only values and counts must agree
+            ok = compare(f"facets {filters}",
+                         without_labels(facets.compute_facets_sql(db, search)),
+                         without_labels(facets.build_facets_response(total, counts, price_counts)))
+            checks += 1
+            failures += not ok
+
+        print('=' * 80)
+        print(f"Catalog: {catalog.size:,} vehicles")
+        print(f"Checks:  {checks}, mismatches: {failures}")
+        print('=' * 80)
+        return 1 if failures else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Train the implicit-feedback ALS factors.
+
+Streams the per-(user, vehicle) interaction weights from
+gold.user_interactions into a sparse user x vehicle matrix, runs
+alternating least squares sharded over a process pool and writes the
+factors to MODEL_DIR/als/, which the API maps at startup. Users and
+vehicles the previous model knew start from their previous factors, so a
+nightly run needs few iterations.
+
+Usage (from backend/):
+    python train_als.py [--factors 64] [--iterations 15] [--solver cg|exact]
+                        [--workers N] [--no-warm-start] [--output dir]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import numpy as np
+
+from app.core.database import SessionLocal
+from app.services import als, cooccurrence
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--factors', type=int, default=als.FACTORS)
+    parser.add_argument('--iterations', type=int, default=als.ITERATIONS)
+    parser.add_argument('--regularization', type=float, default=als.REGULARIZATION)
+    parser.add_argument('--alpha', type=float, default=als.ALPHA, help='confidence per unit of damped weight')
+    parser.add_argument('--solver', choices=('cg', 'exact'), default='cg',
+                        help='conjugate gradient from the previous factors, or exact batched solves')
+    parser.add_argument('--cg-steps', type=int, default=als.CG_STEPS)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='solver processes')
+    parser.add_argument('--block-size', type=int, default=als.BLOCK_SIZE, help='rows per solver task')
+    parser.add_argument('--no-warm-start', action='store_true', help='ignore the previous factors')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=als.model_dir(), help='output directory')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    start_time = time.time()
+    db = SessionLocal()
+    try:
+        users, items, matrix = cooccurrence.interaction_matrix(db)
+    finally:
+        db.close()
+    print(f"Loaded {matrix.nnz:,} interactions of {len(users):,} users x {len(items):,} vehicles "
+          f"in {time.time() - start_time:.2f}s")
+
+    user_factors = item_factors = None
+    previous_path = os.path.join(args.output, als.META_FILE)
+    if not args.no_warm_start and os.path.exists(previous_path):
+        previous = als.AlsModel.load(args.output)
+        if previous.factors == args.factors:
+            rng = np.random.default_rng(args.seed)
+            user_factors = als.warm_start(users, previous.users, previous.user_factors,
+                                          als.init_factors(len(users), args.factors, rng))
+            item_factors = als.warm_start(items, previous.items, previous.item_factors,
+                                          als.init_factors(len(items), args.factors, rng))
+            print(f"Warm start from {args.output}: "
+                  f"{len(set(users) & set(previous.users)):,} users, {len(set(items) & set(previous.items)):,} vehicles")
+        else:
+            print(f"Previous factors have {previous.factors} dimensions, not {args.factors}; starting cold")
+
+    start_time = time.time()
+    user_factors, item_factors = als.train(
+        matrix,
+        factors=args.factors,
+        iterations=args.iterations,
+        regularization=args.regularization,
+        alpha=args.alpha,
+        solver=args.solver,
+        cg_steps=args.cg_steps,
+        workers=args.workers,
+        block_size=args.block_size,
+        user_factors=user_factors,
+        item_factors=item_factors,
+        seed=args.seed
+    )
+    print(f"Trained {args.factors} factors, {args.iterations} iterations ({args.solver}, {args.workers} workers) "
+          f"in {time.time() - start_time:.2f}s")
+
+    params = {
+        'factors': args.factors,
+        'iterations': args.iterations,
+        'regularization': args.regularization,
+        'alpha': args.alpha,
+        'solver': args.solver,
+        'trained_at': time.time()
+    }
+    als.AlsModel(users, items, user_factors, item_factors, params).save(args.output)
+    print(f"✅ Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -52,7 +52,11 @@ CREATE TABLE IF NOT EXISTS raw.used_vehicles (
     has_ratings BOOLEAN,
     data_complete BOOLEAN,
     created_at TIMESTAMP DEFAULT NOW(),
-    updated_at TIMESTAMP DEFAULT NOW()
+    updated_at TIMESTAMP DEFAULT NOW(),
+    -- Full-text vector for search (see database/migrations/001-search-text-index.sql)
+    search_tsv tsvector GENERATED ALWAYS AS (
+        to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(brand, '') || ' ' || coalesce(car_model, ''))
+    ) STORED
 );
 
 -- Create indexes for performance
@@ -61,6 +65,7 @@ CREATE INDEX IF NOT EXISTS idx_vehicles_model ON raw.used_vehicles(car_model);
 CREATE INDEX IF NOT EXISTS idx_vehicles_price ON raw.used_vehicles(price);
 CREATE INDEX IF NOT EXISTS idx_vehicles_condition ON raw.used_vehicles(condition);
 CREATE INDEX IF NOT EXISTS idx_vehicles_vin ON raw.used_vehicles(vin);
+CREATE INDEX IF NOT EXISTS idx_vehicles_search_tsv ON raw.used_vehicles USING GIN (search_tsv);
 
 -- ================================================
 -- GOLD LAYER - Application tables
@@ -110,6 +115,17 @@ CREATE TABLE IF NOT EXISTS gold.user_searches (
     created_at TIMESTAMP DEFAULT NOW()
 );
 
+-- Vehicle popularity: exponentially decayed counters maintained by the API
+-- (replaces the gold.popular_vehicles view). Values are as of updated_at.
+CREATE TABLE IF NOT EXISTS gold.vehicle_popularity (
+    vehicle_id TEXT PRIMARY KEY,
+    views DOUBLE PRECISION NOT NULL DEFAULT 0,
+    favorites DOUBLE PRECISION NOT NULL DEFAULT 0,
+    contacts DOUBLE PRECISION NOT NULL DEFAULT 0,
+    score DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
 -- Create indexes for gold layer
 CREATE INDEX IF NOT EXISTS idx_interactions_user ON gold.user_interactions(user_id);
 CREATE INDEX IF NOT EXISTS idx_interactions_vehicle ON gold.user_interactions(vehicle_id);
@@ -122,6 +138,8 @@ CREATE INDEX IF NOT EXISTS idx_favorites_vehicle ON gold.user_favorites(vehicle_
 CREATE INDEX IF NOT EXISTS idx_searches_user ON gold.user_searches(user_id);
 CREATE INDEX IF NOT EXISTS idx_searches_created ON gold.user_searches(created_at);
 
+CREATE INDEX IF NOT EXISTS idx_vehicle_popularity_updated ON gold.vehicle_popularity(updated_at);
+
 -- ================================================
 -- VIEWS for easy querying
 -- ================================================
@@ -138,23 +156,6 @@ LEFT JOIN gold.user_interactions ui ON v.vehicle_id = ui.vehicle_id
 LEFT JOIN gold.user_favorites uf ON v.vehicle_id = uf.vehicle_id
 GROUP BY v.vehicle_id;
 
--- View: Popular vehicles
-CREATE OR REPLACE VIEW gold.popular_vehicles AS
-SELECT 
-    v.vehicle_id,
-    v.title,
-    v.brand,
-    v.car_model,
-    v.price,
-    v.vehicle_url,
-    COUNT(DISTINCT ui.id) as total_interactions,
-    COUNT(DISTINCT CASE WHEN ui.interaction_type = 'favorite' THEN ui.id END) as favorites,
-    COUNT(DISTINCT CASE WHEN ui.interaction_type = 'view' THEN ui.id END) as views
-FROM raw.used_vehicles v
-LEFT JOIN gold.user_interactions ui ON v.vehicle_id = ui.vehicle_id
-GROUP BY v.vehicle_id, v.title, v.brand, v.car_model, v.price, v.vehicle_url
-ORDER BY total_interactions DESC;
-
 -- ================================================
 -- Functions
 -- ================================================
@@ -191,7 +192,6 @@ GRANT ALL PRIVILEGES ON ALL SEQUENCES IN SCHEMA gold TO admin;
 
 -- Grant select on views
 GRANT SELECT ON gold.vehicles_with_ratings TO admin;
-GRANT SELECT ON gold.popular_vehicles TO admin;
 
 -- ================================================
 -- Sample data for testing (optional)
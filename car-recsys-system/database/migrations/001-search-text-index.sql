@@ -0,0 +1,40 @@
+-- ================================================
+-- Search: full-text and normalized facet indexes
+-- ================================================
+-- Run AFTER loading data: load_complete_database.py drops and recreates
+-- the raw tables, which also drops these indexes. It re-adds search_tsv and
+-- its GIN index itself, so search keeps working before this runs.
+--   docker-compose exec -T postgres psql -U admin -d car_recsys < database/migrations/001-search-text-index.sql
+
+-- Full-text vector over title/brand/car_model. The 'simple' config keeps
+-- brand and model names unstemmed so prefix queries (toyo:*) match them.
+ALTER TABLE raw.used_vehicles ADD COLUMN IF NOT EXISTS search_tsv tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(brand, '') || ' ' || coalesce(car_model, ''))
+    ) STORED;
+
+ALTER TABLE raw.new_vehicles ADD COLUMN IF NOT EXISTS search_tsv tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(brand, '') || ' ' || coalesce(car_model, ''))
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_vehicles_search_tsv ON raw.used_vehicles USING GIN (search_tsv);
+CREATE INDEX IF NOT EXISTS idx_new_vehicles_search_tsv ON raw.new_vehicles USING GIN (search_tsv);
+
+-- Exact-valued facets are matched as lower(column) = :value
+CREATE INDEX IF NOT EXISTS idx_vehicles_brand_lower ON raw.used_vehicles (lower(brand));
+CREATE INDEX IF NOT EXISTS idx_vehicles_fuel_type_lower ON raw.used_vehicles (lower(fuel_type));
+CREATE INDEX IF NOT EXISTS idx_vehicles_transmission_lower ON raw.used_vehicles (lower(transmission));
+
+CREATE INDEX IF NOT EXISTS idx_new_vehicles_brand_lower ON raw.new_vehicles (lower(brand));
+CREATE INDEX IF NOT EXISTS idx_new_vehicles_fuel_type_lower ON raw.new_vehicles (lower(fuel_type));
+CREATE INDEX IF NOT EXISTS idx_new_vehicles_transmission_lower ON raw.new_vehicles (lower(transmission));
+
+-- Sort/range columns used by search and keyset pagination
+CREATE INDEX IF NOT EXISTS idx_vehicles_price ON raw.used_vehicles (price);
+CREATE INDEX IF NOT EXISTS idx_new_vehicles_price ON raw.new_vehicles (price);
+CREATE INDEX IF NOT EXISTS idx_vehicles_mileage ON raw.used_vehicles (mileage);
+CREATE INDEX IF NOT EXISTS idx_new_vehicles_mileage ON raw.new_vehicles (mileage);
+
+ANALYZE raw.used_vehicles;
+ANALYZE raw.new_vehicles;
@@ -0,0 +1,19 @@
+-- ================================================
+-- Listing detail: vehicle_id indexes on the related raw tables
+-- ================================================
+-- load_complete_database.py creates these tables from the CSV columns
+-- without any index, so every /listing/{id}/full lookup would scan them.
+-- Run AFTER loading data, like 001:
+--   docker-compose exec -T postgres psql -U admin -d car_recsys < database/migrations/002-listing-detail-indexes.sql
+
+-- Images are read in display order, features grouped by category,
+-- reviews newest first; the second column serves that ORDER BY ... LIMIT
+CREATE INDEX IF NOT EXISTS idx_images_vehicle_order ON raw.vehicle_images (vehicle_id, image_order);
+CREATE INDEX IF NOT EXISTS idx_features_vehicle_category ON raw.vehicle_features (vehicle_id, feature_category);
+CREATE INDEX IF NOT EXISTS idx_reviews_vehicle_id ON raw.reviews_ratings (vehicle_id, id);
+CREATE INDEX IF NOT EXISTS idx_seller_rel_vehicle ON raw.seller_vehicle_relationships (vehicle_id);
+
+ANALYZE raw.vehicle_images;
+ANALYZE raw.vehicle_features;
+ANALYZE raw.reviews_ratings;
+ANALYZE raw.seller_vehicle_relationships;
@@ -0,0 +1,23 @@
+-- ================================================
+-- Popularity: decayed counters replace the gold.popular_vehicles view
+-- ================================================
+-- The view grouped the whole user_interactions table on every read. The API
+-- now keeps exponentially decayed view/favorite/contact counters per vehicle
+-- (app/services/popularity.py) and flushes them here; values are as of
+-- updated_at. The first API start after this migration seeds the table from
+-- user_interactions.
+--   docker-compose exec -T postgres psql -U admin -d car_recsys < database/migrations/003-vehicle-popularity.sql
+
+DROP VIEW IF EXISTS gold.popular_vehicles;
+
+CREATE TABLE IF NOT EXISTS gold.vehicle_popularity (
+    vehicle_id TEXT PRIMARY KEY,
+    views DOUBLE PRECISION NOT NULL DEFAULT 0,
+    favorites DOUBLE PRECISION NOT NULL DEFAULT 0,
+    contacts DOUBLE PRECISION NOT NULL DEFAULT 0,
+    score DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Serves the flush's "rows changed since the last sync" read
+CREATE INDEX IF NOT EXISTS idx_vehicle_popularity_updated ON gold.vehicle_popularity (updated_at);
@@ -69,6 +69,25 @@ def create_table_from_dataframe(conn, table_name, df, primary_key=None):
     conn.commit()
     cur.close()
 
+def add_search_index(conn, table_name, index_name):
+    """Add the search_tsv full-text column and its GIN index that search filters on
+    
+    Same column and index as database/migrations/001-search-text-index.sql;
+    recreating the table drops them, and search needs them right after a reload.
+    """
+    cur = conn.cursor()
+    
+    print(f"  🔎 Adding search_tsv to {table_name}...")
+    cur.execute(f"""
+    ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS search_tsv tsvector
+        GENERATED ALWAYS AS (
+            to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(brand, '') || ' ' || coalesce(car_model, ''))
+        ) STORED
+    """)
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} USING GIN (search_tsv)")
+    conn.commit()
+    cur.close()
+
 def insert_dataframe(conn, table_name, df, remove_duplicates_by=None):
     """Insert DataFrame into table using COPY
     
@@ -132,6 +151,7 @@ def main():
         df = load_csv('used_vehicles.csv')
         create_table_from_dataframe(conn, 'raw.used_vehicles', df, primary_key='vehicle_id')
         count = insert_dataframe(conn, 'raw.used_vehicles', df, remove_duplicates_by='vehicle_id')
+        add_search_index(conn, 'raw.used_vehicles', 'idx_vehicles_search_tsv')
         total_rows += count
         conn.commit()
         print()
@@ -142,6 +162,7 @@ def main():
         df = load_csv('new_vehicles.csv')
         create_table_from_dataframe(conn, 'raw.new_vehicles', df, primary_key='vehicle_id')
         count = insert_dataframe(conn, 'raw.new_vehicles', df, remove_duplicates_by='vehicle_id')
+        add_search_index(conn, 'raw.new_vehicles', 'idx_new_vehicles_search_tsv')
         total_rows += count
         conn.commit()
         print()
@@ -228,6 +249,10 @@ def main():
         print(f"  🎯 TOTAL ROWS LOADED                  : {grand_total:>12,}")
         print("="*80 + "\n")
         
+        # Tell running API processes to drop caches built from the old data
+        cur.execute("NOTIFY data_reload")
+        conn.commit()
+        
         cur.close()
         conn.close()
         